@@ -0,0 +1,133 @@
+"""
+End-to-end load test on one machine: starts the MCP stubs, the fake Ollama
+server and the orchestrator (pointed at the fake Ollama), then runs the
+load driver against it.
+
+Usage:
+    python -m benchmarks.loadtest --users 5,20,50 --requests 3 --decode-tps 30 --ollama-parallel 4
+    python -m benchmarks.loadtest --users 20 --ollama-backends 3
+
+With --ollama-backends N, N fake Ollama servers run on consecutive ports and
+the orchestrator spreads its calls over them (OLLAMA_BACKENDS).
+
+Orchestrator settings (LLM_MAX_CONCURRENCY, SELECTOR_TOKEN_BUDGET, ...) are
+taken from the environment, so deployments can be sized by re-running with
+different values.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.loadtest.driver import drive
+
+STARTUP_TIMEOUT = 60
+
+
+def start(args: list, env: dict = None, log_path: str = None) -> subprocess.Popen:
+    output = open(log_path, "w") if log_path else None
+    return subprocess.Popen(
+        [sys.executable, *args], env={**os.environ, **(env or {})},
+        stdout=output, stderr=subprocess.STDOUT if output else None
+    )
+
+
+def wait_ready(url: str, process: subprocess.Popen):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process for {url} exited with code {process.returncode}")
+        try:
+            if httpx.get(url, timeout=2).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"{url} not ready after {STARTUP_TIMEOUT}s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", default="5,20,50")
+    parser.add_argument("--requests", type=int, default=3, help="requests per user per level")
+    parser.add_argument("--port", type=int, default=8000, help="orchestrator port")
+    parser.add_argument("--ollama-port", type=int, default=11500, help="port of the first fake Ollama")
+    parser.add_argument("--ollama-backends", type=int, default=1, help="fake Ollama servers to run")
+    parser.add_argument("--prefill-tps", type=float, default=800)
+    parser.add_argument("--decode-tps", type=float, default=30)
+    parser.add_argument("--ollama-parallel", type=int, default=4)
+    parser.add_argument("--selectors", type=int, default=300)
+    parser.add_argument("--scenarios", type=int, default=3, help="scenarios per generated feature")
+    parser.add_argument("--jira-latency", type=float, default=0.3)
+    parser.add_argument("--repo-latency", type=float, default=0.1)
+    parser.add_argument("--output", default="loadtest_results.json")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    ollama_urls = [f"http://127.0.0.1:{args.ollama_port + i}" for i in range(args.ollama_backends)]
+    orchestrator_url = f"http://127.0.0.1:{args.port}"
+
+    processes = []
+    try:
+        stubs = start([
+            "-m", "benchmarks.loadtest.stubs", "--selectors", str(args.selectors),
+            "--jira-latency", str(args.jira_latency), "--repo-latency", str(args.repo_latency)
+        ])
+        processes.append(stubs)
+        ollamas = []
+        for i in range(args.ollama_backends):
+            ollama = start([
+                "-m", "benchmarks.loadtest.fake_ollama", "--port", str(args.ollama_port + i),
+                "--prefill-tps", str(args.prefill_tps), "--decode-tps", str(args.decode_tps),
+                "--parallel", str(args.ollama_parallel), "--scenarios", str(args.scenarios)
+            ])
+            processes.append(ollama)
+            ollamas.append(ollama)
+        orchestrator = start(
+            ["-m", "uvicorn", "orchestrator.app:app", "--port", str(args.port), "--log-level", "warning"],
+            {
+                "OLLAMA_BACKENDS": ",".join(f"{url}={args.ollama_parallel}" for url in ollama_urls),
+                "LOG_FILE": os.path.join(workdir, "orchestrator.log"),
+                "LLM_CACHE_PATH": os.path.join(workdir, "llm_cache.sqlite3"),
+                "JOB_DB_PATH": os.path.join(workdir, "jobs.sqlite3"),
+                # the stub repos have no remote to ls-remote
+                "ARTIFACT_STORE_ENABLED": "false",
+            },
+            os.path.join(workdir, "console.log")
+        )
+        processes.append(orchestrator)
+
+        wait_ready("http://127.0.0.1:8001/docs", stubs)
+        for url, ollama in zip(ollama_urls, ollamas):
+            wait_ready(f"{url}/api/tags", ollama)
+        wait_ready(f"{orchestrator_url}/health", orchestrator)
+
+        levels = [int(users) for users in args.users.split(",")]
+        payload = {
+            "jiraUrl": "https://example.atlassian.net/browse/LOAD",
+            "uiRepo": "https://example.com/ui.git",
+            "e2eRepo": "https://example.com/e2e.git"
+        }
+        reports = asyncio.run(drive(orchestrator_url, levels, args.requests, payload))
+
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "levels": reports}, f, indent=2)
+        print(f"Results written to {args.output} (orchestrator log: {workdir})")
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+if __name__ == "__main__":
+    main()
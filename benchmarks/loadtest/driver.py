@@ -0,0 +1,192 @@
+"""
+Closed-loop load driver for the orchestrator.
+
+For each concurrency level, that many simulated users send POST /generate
+back to back until each has completed --requests requests. Reports
+p50/p95/p99 latency, throughput, error rates and LLM queueing time (the
+wait for a free LLM slot, from the orchestrator's /metrics).
+
+Usage:
+    python -m benchmarks.loadtest.driver --url http://localhost:8000 --users 5,20,50
+"""
+import argparse
+import asyncio
+import json
+import re
+import time
+
+import httpx
+
+REQUEST_TIMEOUT = 1800
+QUEUE_METRIC = "llm_queue_duration_seconds"
+SAMPLE_LINE = re.compile(r'^(\w+)(?:\{([^}]*)\})? (\S+)$')
+
+
+async def run_level(client: httpx.AsyncClient, url: str, users: int, requests_per_user: int,
+                    payload: dict) -> dict:
+    """Drive one concurrency level; returns its report."""
+    latencies = []
+    errors = {}
+    counter = iter(range(users * requests_per_user))
+
+    async def user():
+        for _ in range(requests_per_user):
+            n = next(counter)
+            body = {**payload, "jiraUrl": f"{payload['jiraUrl']}-{n}", "noCache": True}
+            start = time.perf_counter()
+            kind = None
+            try:
+                response = await client.post(f"{url}/generate", json=body, timeout=REQUEST_TIMEOUT)
+                if response.status_code != 200:
+                    kind = f"http_{response.status_code}"
+                elif response.json().get("status") != "SUCCESS":
+                    kind = "pipeline_error"
+            except httpx.HTTPError as e:
+                kind = type(e).__name__
+            elapsed = time.perf_counter() - start
+
+            if kind is None:
+                latencies.append(elapsed)
+            else:
+                errors[kind] = errors.get(kind, 0) + 1
+
+    before = await _queue_histogram(client, url)
+    started = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(users)))
+    wall = time.perf_counter() - started
+    after = await _queue_histogram(client, url)
+
+    total = users * requests_per_user
+    failed = sum(errors.values())
+    latencies.sort()
+    return {
+        "users": users,
+        "requests": total,
+        "succeeded": len(latencies),
+        "errors": errors,
+        "errorRate": round(failed / total, 4) if total else 0.0,
+        "wallSeconds": round(wall, 2),
+        "throughputRps": round(len(latencies) / wall, 4) if wall else 0.0,
+        "latency": {
+            "mean": _round(sum(latencies) / len(latencies)) if latencies else None,
+            "p50": _round(_percentile(latencies, 0.50)),
+            "p95": _round(_percentile(latencies, 0.95)),
+            "p99": _round(_percentile(latencies, 0.99)),
+            "max": _round(latencies[-1]) if latencies else None,
+        },
+        "llmQueue": _histogram_delta(before, after),
+    }
+
+
+def print_report(level: dict):
+    latency = level["latency"]
+    queue = level["llmQueue"]
+    print(
+        f"users={level['users']:<4} ok={level['succeeded']}/{level['requests']} "
+        f"errors={level['errorRate']:.1%} throughput={level['throughputRps']:.3f} req/s "
+        f"p50={latency['p50']}s p95={latency['p95']}s p99={latency['p99']}s "
+        f"llm-queue mean={queue['mean']}s p95<={queue['p95']}s"
+    )
+
+
+async def drive(url: str, levels: list, requests_per_user: int, payload: dict) -> list:
+    limits = httpx.Limits(max_connections=max(levels) + 10)
+    async with httpx.AsyncClient(limits=limits) as client:
+        reports = []
+        for users in levels:
+            report = await run_level(client, url, users, requests_per_user, payload)
+            print_report(report)
+            reports.append(report)
+        return reports
+
+
+# ---------------- Helper Functions ----------------
+
+def _percentile(values: list, q: float):
+    """Linear-interpolated percentile of sorted values."""
+    if not values:
+        return None
+    position = (len(values) - 1) * q
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def _round(value):
+    return None if value is None else round(value, 3)
+
+
+async def _queue_histogram(client: httpx.AsyncClient, url: str) -> dict:
+    """{"buckets": {le: count}, "sum": s, "count": n} of the LLM queue metric."""
+    histogram = {"buckets": {}, "sum": 0.0, "count": 0}
+    try:
+        response = await client.get(f"{url}/metrics", timeout=30)
+    except httpx.HTTPError:
+        return histogram
+    if response.status_code != 200:
+        return histogram
+
+    for line in response.text.splitlines():
+        match = SAMPLE_LINE.match(line)
+        if not match or not match.group(1).startswith(QUEUE_METRIC):
+            continue
+        name, labels, value = match.groups()
+        if name == f"{QUEUE_METRIC}_bucket":
+            le = re.search(r'le="([^"]+)"', labels).group(1)
+            histogram["buckets"][float(le)] = float(value)
+        elif name == f"{QUEUE_METRIC}_sum":
+            histogram["sum"] = float(value)
+        elif name == f"{QUEUE_METRIC}_count":
+            histogram["count"] = int(float(value))
+    return histogram
+
+
+def _histogram_delta(before: dict, after: dict) -> dict:
+    """
+    Mean of the observations between two scrapes, and p50/p95 as the upper
+    bound of the histogram bucket they fall in.
+    """
+    count = after["count"] - before["count"]
+    if count <= 0:
+        return {"calls": 0, "mean": None, "p50": None, "p95": None}
+
+    bounds = sorted(after["buckets"])
+    cumulative = [after["buckets"][b] - before["buckets"].get(b, 0) for b in bounds]
+
+    def quantile(q):
+        # upper bound of the first bucket holding the q-th observation
+        for bound, seen in zip(bounds, cumulative):
+            if seen >= q * count:
+                return bound
+        return None
+
+    return {
+        "calls": count,
+        "mean": _round((after["sum"] - before["sum"]) / count),
+        "p50": quantile(0.50),
+        "p95": quantile(0.95),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--users", default="5,20,50", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=3, help="requests per user per level")
+    parser.add_argument("--jira-url", default="https://example.atlassian.net/browse/LOAD")
+    parser.add_argument("--ui-repo", default="https://example.com/ui.git")
+    parser.add_argument("--e2e-repo", default="https://example.com/e2e.git")
+    parser.add_argument("--output", default="loadtest_results.json")
+    args = parser.parse_args()
+
+    levels = [int(users) for users in args.users.split(",")]
+    payload = {"jiraUrl": args.jira_url, "uiRepo": args.ui_repo, "e2eRepo": args.e2e_repo}
+    reports = asyncio.run(drive(args.url, levels, args.requests, payload))
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"url": args.url, "requestsPerUser": args.requests, "levels": reports}, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+Fake Ollama server for load tests.
+
+Emulates Ollama's latency profile without a model: each request waits for
+one of ``parallel`` slots (like OLLAMA_NUM_PARALLEL), spends
+prompt_tokens / prefill_tps seconds in prefill, then produces tokens at
+decode_tps per request. The prompt prefix shared with the conversation's
+previous call is treated as KV-cached and not prefilled again.
+
+Replies are well-formed Gherkin / Selenium Java that only use selectors from
+the conversation's "ALLOWED UI SELECTORS" block, so the orchestrator
+pipeline passes validation without retries. The feature has --scenarios
+scenarios; a Selenium reply covers the steps of the scenario it was asked
+for, and is sized as that share of --selenium-tokens. Timings are reported in
+Ollama's prompt_eval_* / eval_* fields.
+
+Options num_predict and stop are honoured (done_reason "length" / "stop"),
+and a selector fix asked for a JSON ``format`` replies {"line": ...}.
+
+Requests for a model not in --models get Ollama's 404, so several fakes
+with different models can stand in for a mixed backend pool.
+
+Usage:
+    python -m benchmarks.loadtest.fake_ollama --port 11434 --prefill-tps 800 --decode-tps 30
+"""
+import argparse
+import ast
+import asyncio
+import json
+import random
+import re
+import time
+from collections import OrderedDict
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from mcp_bdd.matcher import gherkin_steps
+
+# seconds between streamed chunks; tokens produced in between are batched
+STREAM_INTERVAL = 0.05
+PREFIX_CACHE_SIZE = 256
+MODELS = ("deepseek-coder:6.7b",)
+
+SELECTOR_BLOCK = re.compile(r'ALLOWED UI SELECTORS:\s*(\{.*?\})\s*$', re.MULTILINE)
+ONLY_STEPS = re.compile(r'^- (.+)$', re.MULTILINE)
+STEP_TEMPLATES = ("user opens product {n}", "user clicks the buy button for product {n}", "user sees order {n} confirmed")
+
+
+class FakeModel:
+
+    def __init__(
+        self,
+        prefill_tps: float = 800,
+        decode_tps: float = 30,
+        parallel: int = 4,
+        gherkin_tokens: int = 250,
+        selenium_tokens: int = 600,
+        jitter: float = 0.1,
+        prefix_cache: bool = True,
+        seed: int = 0,
+        scenarios: int = 3
+    ):
+        self.prefill_tps = prefill_tps
+        self.decode_tps = decode_tps
+        self.gherkin_tokens = gherkin_tokens
+        self.selenium_tokens = selenium_tokens
+        self.scenarios = scenarios
+        self.jitter = jitter
+        self.prefix_cache = prefix_cache
+        self.slots = asyncio.Semaphore(parallel)
+        self.random = random.Random(seed)
+        self._prompts = OrderedDict()  # conversation key -> last prompt text
+
+    async def generate(self, body: dict):
+        """Async iterator of (text chunk, final stats or None)."""
+        if "messages" in body:
+            messages = body["messages"]
+            key = messages[0]["content"] if messages else ""
+            prompt = "".join(m["role"] + m["content"] for m in messages)
+            request = messages[-1]["content"] if messages else ""
+        else:
+            key = prompt = request = body.get("prompt", "")
+
+        options = body.get("options") or {}
+        reply = _apply_stops(self._reply(request, prompt, body.get("format")), options.get("stop") or ())
+        tokens = _split_tokens(reply)
+        done_reason = "stop"
+        if options.get("num_predict", -1) >= 0 and len(tokens) > options["num_predict"]:
+            tokens = tokens[:options["num_predict"]]
+            done_reason = "length"
+
+        queued = time.perf_counter()
+        async with self.slots:
+            prompt_tokens = max(1, (len(prompt) - self._cached_prefix(key, prompt)) // 4)
+            prefill = prompt_tokens / self.prefill_tps * self._noise()
+            await asyncio.sleep(prefill)
+
+            decode_start = time.perf_counter()
+            sent = 0
+            while sent < len(tokens):
+                await asyncio.sleep(min(STREAM_INTERVAL, (len(tokens) - sent) / self.decode_tps))
+                produced = int((time.perf_counter() - decode_start) * self.decode_tps)
+                due = min(len(tokens), max(sent + 1, produced))
+                yield "".join(tokens[sent:due]), None
+                sent = due
+            decode = time.perf_counter() - decode_start
+
+        yield "", {
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prefill * 1e9),
+            "eval_count": len(tokens),
+            "eval_duration": int(decode * 1e9),
+            "total_duration": int((time.perf_counter() - queued) * 1e9),
+            "done_reason": done_reason,
+        }
+
+    # ---------------- Helper Functions ----------------
+
+    def _cached_prefix(self, key: str, prompt: str) -> int:
+        if not self.prefix_cache:
+            return 0
+        previous = self._prompts.pop(key, "")
+        self._prompts[key] = prompt
+        while len(self._prompts) > PREFIX_CACHE_SIZE:
+            self._prompts.popitem(last=False)
+
+        n = 0
+        limit = min(len(previous), len(prompt))
+        while n < limit and previous[n] == prompt[n]:
+            n += 1
+        return n
+
+    def _noise(self) -> float:
+        return 1 + self.random.uniform(-self.jitter, self.jitter)
+
+    def _reply(self, request: str, prompt: str, output_format=None) -> str:
+        selectors = _allowed_selectors(prompt) or ["#submit"]
+        if "Gherkin feature file" in request:
+            return _pad(_gherkin(self.scenarios), "# ", self.gherkin_tokens)
+        if "Step Definitions" in request or "regenerate" in request:
+            steps = _requested_steps(request)
+            share = len(steps) / (len(STEP_TEMPLATES) * self.scenarios)
+            return _pad(_selenium(selectors, steps), "// ", int(self.selenium_tokens * share))
+        # single-line fixes
+        line = f'driver.findElement(By.cssSelector("{_java_string(selectors[0])}")).click();'
+        return json.dumps({"line": line}) if output_format else line
+
+
+def create_app(model: FakeModel, models: tuple = MODELS) -> FastAPI:
+    app = FastAPI(title="Fake Ollama")
+
+    @app.get("/api/tags")
+    def tags():
+        return {"models": [{"name": name} for name in models]}
+
+    @app.post("/api/generate")
+    async def api_generate(request: Request):
+        return await _respond(model, models, await request.json(), "response")
+
+    @app.post("/api/chat")
+    async def api_chat(request: Request):
+        return await _respond(model, models, await request.json(), "message")
+
+    return app
+
+
+async def _respond(model: FakeModel, models: tuple, body: dict, field: str):
+    if body.get("model") not in models:
+        return JSONResponse(status_code=404, content={"error": f"model '{body.get('model')}' not found"})
+
+    def chunk(text: str, stats: dict = None) -> dict:
+        value = {"role": "assistant", "content": text} if field == "message" else text
+        return {"model": body.get("model"), field: value, "done": stats is not None, **(stats or {})}
+
+    if body.get("stream", True):
+        # like Ollama, send headers only with the first chunk (after prefill)
+        chunks = model.generate(body)
+        first = await chunks.__anext__()
+
+        async def stream():
+            yield json.dumps(chunk(*first)) + "\n"
+            async for text, stats in chunks:
+                yield json.dumps(chunk(text, stats)) + "\n"
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    parts = []
+    final = {}
+    async for text, stats in model.generate(body):
+        parts.append(text)
+        final = stats or final
+    return JSONResponse(chunk("".join(parts), final))
+
+
+def _allowed_selectors(prompt: str) -> list:
+    match = SELECTOR_BLOCK.search(prompt)
+    if not match:
+        return []
+    try:
+        return list(ast.literal_eval(match.group(1)).values())
+    except (ValueError, SyntaxError):
+        return []
+
+
+def _gherkin(scenarios: int) -> str:
+    lines = ["Feature: Checkout", ""]
+    for n in range(scenarios):
+        lines.append(f"  Scenario: User buys product {n}")
+        for keyword, template in zip(("Given", "When", "Then"), STEP_TEMPLATES):
+            lines.append(f"    {keyword} {template.format(n=n)}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def _requested_steps(request: str) -> list:
+    """Steps a Selenium request asks for: its "ONLY for" list, else its scenario's steps."""
+    if "ONLY for:" in request:
+        return ONLY_STEPS.findall(request.split("ONLY for:", 1)[1])
+    return gherkin_steps(request) or [template.format(n=0) for template in STEP_TEMPLATES]
+
+
+def _selenium(selectors: list, steps: list) -> str:
+    lines = ["public class CheckoutSteps {"]
+    for i, step in enumerate(steps):
+        keyword = ("Given", "When", "Then")[i % 3]
+        method = re.sub(r"\W+", "_", step).strip("_")
+        lines.extend([
+            f'    @{keyword}("{step}")',
+            f"    public void {method}() {{",
+            f'        driver.findElement(By.cssSelector("{_java_string(selectors[i % len(selectors)])}")).click();',
+            "    }",
+        ])
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def _apply_stops(text: str, stops) -> str:
+    """Text up to the first stop sequence, which Ollama leaves out."""
+    ends = [text.find(stop) for stop in stops if stop and stop in text]
+    return text[:min(ends)] if ends else text
+
+
+def _java_string(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _pad(text: str, comment: str, tokens: int) -> str:
+    """Append comment lines until text is about tokens tokens long."""
+    lines = [text]
+    size = len(text) // 4
+    n = 0
+    while size < tokens:
+        line = f"{comment}generated note {n}: keeps the reply at a realistic length\n"
+        lines.append(line)
+        size += len(line) // 4
+        n += 1
+    return "".join(lines)
+
+
+def _split_tokens(text: str) -> list:
+    # ~4 characters per token, like the estimate used everywhere else
+    return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--prefill-tps", type=float, default=800, help="prompt tokens/s per request")
+    parser.add_argument("--decode-tps", type=float, default=30, help="generated tokens/s per request")
+    parser.add_argument("--parallel", type=int, default=4, help="concurrent requests (OLLAMA_NUM_PARALLEL)")
+    parser.add_argument("--gherkin-tokens", type=int, default=250)
+    parser.add_argument("--selenium-tokens", type=int, default=600, help="Selenium tokens for the whole feature")
+    parser.add_argument("--scenarios", type=int, default=3, help="scenarios per generated feature")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--no-prefix-cache", action="store_true")
+    parser.add_argument("--models", default=",".join(MODELS), help="comma-separated models to serve")
+    args = parser.parse_args()
+
+    model = FakeModel(
+        args.prefill_tps, args.decode_tps, args.parallel, args.gherkin_tokens,
+        args.selenium_tokens, args.jitter, not args.no_prefix_cache, scenarios=args.scenarios
+    )
+    models = tuple(name.strip() for name in args.models.split(",") if name.strip())
+    uvicorn.run(create_app(model, models), host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Stand-ins for the MCP services, on their usual ports, for load tests.
+
+    jira  :8002  /context, /context/batch  (story per issue key)
+    ui    :8001  /context                  (N generated selectors)
+    bdd   :8003  /context
+    git   :8004  /context                  (existing step definitions)
+
+Each stub answers after a configurable latency (mean +/- jitter) so the
+orchestrator's context fan-out sees realistic MCP response times.
+
+Usage:
+    python -m benchmarks.loadtest.stubs --selectors 500 --jira-latency 0.3
+"""
+import argparse
+import asyncio
+import random
+from typing import List
+
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+PORTS = {"ui": 8001, "jira": 8002, "bdd": 8003, "git": 8004}
+
+WORDS = ("cart", "checkout", "login", "profile", "search", "order", "payment", "address")
+
+
+class BatchRequest(BaseModel):
+    jiraUrls: List[str]
+
+
+class Latency:
+
+    def __init__(self, mean: float, jitter: float = 0.2, seed: int = 0):
+        self.mean = mean
+        self.jitter = jitter
+        self.random = random.Random(seed)
+
+    async def wait(self):
+        if self.mean > 0:
+            await asyncio.sleep(self.mean * (1 + self.random.uniform(-self.jitter, self.jitter)))
+
+
+def jira_app(latency: Latency) -> FastAPI:
+    app = FastAPI(title="Stub MCP-JIRA")
+
+    @app.get("/context")
+    async def context(jira_url: str):
+        await latency.wait()
+        return _story(jira_url)
+
+    @app.post("/context/batch")
+    async def context_batch(req: BatchRequest):
+        await latency.wait()
+        return {"results": [{"jiraUrl": url, **_story(url)} for url in req.jiraUrls]}
+
+    return app
+
+
+def ui_app(latency: Latency, selectors: int) -> FastAPI:
+    app = FastAPI(title="Stub MCP-UI")
+    elements, sources = _selectors(selectors)
+
+    @app.get("/context")
+    async def context(repo_url: str, ref: str = "HEAD"):
+        await latency.wait()
+        return {
+            "repo": repo_url,
+            "commit": "0" * 40,
+            "selectorCount": len(elements),
+            "elements": elements,
+            "sources": sources
+        }
+
+    return app
+
+
+def bdd_app(latency: Latency) -> FastAPI:
+    app = FastAPI(title="Stub MCP BDD")
+
+    @app.get("/context")
+    async def context(repo_url: str):
+        await latency.wait()
+        return {"framework": "Cucumber + Selenium", "existingSteps": ["user is logged in"]}
+
+    return app
+
+
+def git_app(latency: Latency, steps: int) -> FastAPI:
+    app = FastAPI(title="Stub MCP-GIT")
+    existing = [f"user opens the {WORDS[i % len(WORDS)]} page {i}" for i in range(steps)]
+
+    @app.get("/context")
+    async def context(repo_url: str, ref: str = "HEAD"):
+        await latency.wait()
+        return {
+            "repo": repo_url,
+            "commit": "0" * 40,
+            "framework": "Cucumber + Selenium",
+            "featureFiles": ["checkout.feature"],
+            "existingSteps": existing
+        }
+
+    return app
+
+
+async def serve(apps: dict, host: str = "127.0.0.1"):
+    """Run {name: app} on PORTS[name] until cancelled."""
+    import uvicorn
+
+    servers = [
+        uvicorn.Server(uvicorn.Config(app, host=host, port=PORTS[name], log_level="warning"))
+        for name, app in apps.items()
+    ]
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+def build_apps(
+    selectors: int = 300,
+    steps: int = 50,
+    jira_latency: float = 0.3,
+    repo_latency: float = 0.1,
+    jitter: float = 0.2
+) -> dict:
+    return {
+        "jira": jira_app(Latency(jira_latency, jitter, seed=1)),
+        "ui": ui_app(Latency(repo_latency, jitter, seed=2), selectors),
+        "bdd": bdd_app(Latency(repo_latency, jitter, seed=3)),
+        "git": git_app(Latency(repo_latency, jitter, seed=4), steps),
+    }
+
+
+# ---------------- Helper Functions ----------------
+
+def _story(jira_url: str) -> dict:
+    key = jira_url.rstrip("/").split("/")[-1]
+    return {
+        "storyId": key,
+        "summary": f"{key}: user buys an item from the product page",
+        "description": (
+            "As a shopper I want to add an item to my cart and check out, "
+            "so that I receive an order confirmation."
+        )
+    }
+
+
+def _selectors(count: int):
+    elements, sources = {}, {}
+    for i in range(count):
+        word = WORDS[i % len(WORDS)]
+        for key, selector in (
+            (f"data-testid:{word}-{i}", f'[data-testid="{word}-{i}"]'),
+            (f"id:{word}-btn-{i}", f"#{word}-btn-{i}"),
+        ):
+            if len(elements) < count:
+                elements[key] = selector
+                sources[key] = f"src/{word}/{word.title()}{i}.tsx"
+    return elements, sources
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--selectors", type=int, default=300)
+    parser.add_argument("--steps", type=int, default=50, help="existing step definitions in the E2E stub")
+    parser.add_argument("--jira-latency", type=float, default=0.3, help="mean seconds per Jira call")
+    parser.add_argument("--repo-latency", type=float, default=0.1, help="mean seconds per UI/BDD/git call")
+    parser.add_argument("--jitter", type=float, default=0.2)
+    args = parser.parse_args()
+
+    apps = build_apps(args.selectors, args.steps, args.jira_latency, args.repo_latency, args.jitter)
+    asyncio.run(serve(apps))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Worker scaling benchmark for the shared scanning engine.
+
+Generates a synthetic UI + step-definition repo (benchmarks.synthetic), then times
+mcp_ui.extract_selectors and mcp_git.extract_step_definitions for
+1, 2, 4, ... workers up to the core count.
+
+Usage:
+    python -m benchmarks.scan_scaling --files 30000
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.synthetic import make_steps_repo, make_ui_repo
+from mcp_git.app import extract_step_definitions
+from mcp_ui.app import extract_selectors
+
+# share of --files written as step definitions, the rest are components
+STEP_FILE_SHARE = 0.2
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=30000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="scan-bench-")
+    try:
+        steps = int(args.files * STEP_FILE_SHARE)
+        make_ui_repo(root, args.files - steps)
+        make_steps_repo(root, steps)
+
+        counts = sorted({min(2 ** i, args.max_workers) for i in range(args.max_workers.bit_length() + 1)})
+        baseline = None
+        for workers in counts:
+            ui_time, selectors = timed(extract_selectors, root, workers=workers)
+            git_time, steps = timed(extract_step_definitions, root, workers=workers)
+            total = ui_time + git_time
+            baseline = baseline or total
+
+            print(
+                f"workers={workers:<3} selectors={ui_time:7.2f}s steps={git_time:7.2f}s "
+                f"speedup={baseline / total:5.2f}x "
+                f"({len(selectors)} selectors, {len(steps)} steps)"
+            )
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
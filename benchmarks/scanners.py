@@ -0,0 +1,281 @@
+"""
+Scanner benchmark suite.
+
+Generates deterministic synthetic repos (see benchmarks.synthetic) and
+measures files/s, MB/s, peak RSS and result counts for:
+
+    mcp_ui.extract_selectors          serial / parallel
+    mcp_ui SelectorIndex (cold build) index
+    mcp_git.extract_step_definitions  serial / parallel
+    mcp_git.scan_git_objects          index
+
+plus per-call timings of extract_from_file, build_css_selector and
+extract_steps_from_content. Each scan case runs in a fresh process so its
+peak RSS is its own. Results are written as JSON; with --baseline the run
+fails (exit code 1) if any case is slower than the baseline by more than
+--max-regression.
+
+Usage:
+    python -m benchmarks.scanners --sizes 1000,10000 --output bench.json
+    python -m benchmarks.scanners --baseline bench.json --max-regression 0.2
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+from benchmarks.synthetic import PROFILES, make_steps_repo, make_ui_repo, sample_component, sample_step_class
+
+MODES = ("serial", "parallel", "index")
+SCANNERS = {
+    "ui": "mcp_ui.extract_selectors",
+    "steps": "mcp_git.extract_step_definitions",
+}
+INDEX_SCANNERS = {
+    "ui": "mcp_ui.SelectorIndex",
+    "steps": "mcp_git.scan_git_objects",
+}
+
+
+def run_case(kind: str, mode: str, root: str, repeat: int) -> dict:
+    """Time one scanner over root in this process; best of repeat runs."""
+    from mcp_common import scanner
+
+    workers = 1 if mode == "serial" else scanner.SCAN_WORKERS
+    best = None
+    count = 0
+
+    for _ in range(repeat):
+        scan_once = _scan_function(kind, mode, root, workers)
+        start = time.perf_counter()
+        count = scan_once()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    # worker processes only report their RSS once they have exited
+    scanner.shutdown_pools()
+    return {
+        "workers": workers,
+        "seconds": best,
+        "count": count,
+        "peakRssMb": _max_rss_mb(resource.RUSAGE_SELF),
+        "workerPeakRssMb": _max_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+
+def run_micro() -> list:
+    """Per-call cost of the extraction primitives on a typical file."""
+    from mcp_git.app import extract_steps_from_content
+    from mcp_ui.app import build_css_selector, extract_from_file
+
+    component = sample_component()
+    bundle = sample_component(minified=True) * 50
+    step_class = sample_step_class()
+
+    cases = [
+        ("mcp_ui.extract_from_file", lambda: extract_from_file(component, {}), len(component)),
+        ("mcp_ui.extract_from_file[minified]", lambda: extract_from_file(bundle, {}), len(bundle)),
+        ("mcp_ui.build_css_selector", lambda: build_css_selector("aria-label", "Checkout field 1"), 0),
+        ("mcp_git.extract_steps_from_content", lambda: extract_steps_from_content(step_class), len(step_class)),
+    ]
+
+    results = []
+    for name, call, size in cases:
+        timer = timeit.Timer(call)
+        loops, _ = timer.autorange()
+        seconds = min(timer.repeat(repeat=3, number=loops)) / loops
+        result = {"name": name, "nsPerCall": round(seconds * 1e9, 1), "callsPerSec": round(1 / seconds, 1)}
+        if size:
+            result["mbPerSec"] = round(size / seconds / 1024 ** 2, 2)
+        results.append(result)
+    return results
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> list:
+    """Descriptions of the cases slower than baseline by more than max_regression."""
+    previous = {_key(entry): entry for entry in baseline.get("results", []) + baseline.get("micro", [])}
+    regressions = []
+
+    for entry in results["results"] + results["micro"]:
+        old = previous.get(_key(entry))
+        if old is None or not _throughput(old):
+            continue
+        ratio = _throughput(entry) / _throughput(old)
+        if ratio < 1 - max_regression:
+            regressions.append(f"{'/'.join(map(str, _key(entry)))}: {ratio:.2f}x of baseline")
+
+    return regressions
+
+
+# ---------------- Helper Functions ----------------
+
+def _scan_function(kind: str, mode: str, root: str, workers: int):
+    if mode == "index":
+        if kind == "ui":
+            from mcp_ui.app import SCAN_EXTENSIONS, extract_selectors_from_content
+            from mcp_ui.index import SelectorIndex
+
+            def build_index():
+                # a fresh index directory, so every run is a cold build
+                index_root = tempfile.mkdtemp(prefix="bench-index-")
+                try:
+                    index = SelectorIndex(extract_selectors_from_content, SCAN_EXTENSIONS, root=index_root)
+                    return len(index.lookup(os.path.join(root, ".git"))[1])
+                finally:
+                    shutil.rmtree(index_root, ignore_errors=True)
+            return build_index
+
+        from mcp_git.app import scan_git_objects
+        return lambda: len(scan_git_objects(os.path.join(root, ".git"))[2])
+
+    if kind == "ui":
+        from mcp_ui.app import extract_selectors
+        return lambda: len(extract_selectors(root, workers=workers))
+
+    from mcp_git.app import extract_step_definitions
+    return lambda: len(extract_step_definitions(root, workers=workers))
+
+
+def _case_process(queue, kind: str, mode: str, root: str, repeat: int):
+    try:
+        queue.put(run_case(kind, mode, root, repeat))
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def _run_isolated(kind: str, mode: str, root: str, repeat: int) -> dict:
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_case_process, args=(queue, kind, mode, root, repeat))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def _commit_repo(root: str):
+    env = {
+        **os.environ,
+        "GIT_AUTHOR_NAME": "bench", "GIT_AUTHOR_EMAIL": "bench@example.com",
+        "GIT_COMMITTER_NAME": "bench", "GIT_COMMITTER_EMAIL": "bench@example.com",
+    }
+    for args in (["init", "-q"], ["add", "-A"], ["commit", "-q", "-m", "synthetic"]):
+        subprocess.run(["git", *args], cwd=root, env=env, check=True)
+
+
+def _max_rss_mb(who) -> float:
+    rss = resource.getrusage(who).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return round(rss / (1024 ** 2 if sys.platform == "darwin" else 1024), 1)
+
+
+def _key(entry: dict) -> tuple:
+    if "files" in entry:
+        return entry["name"], entry["mode"], entry["profile"], entry["files"]
+    return (entry["name"],)
+
+
+def _throughput(entry: dict) -> float:
+    return entry.get("filesPerSec") or entry.get("callsPerSec") or 0.0
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000", help="comma-separated file counts")
+    parser.add_argument("--profiles", default=",".join(PROFILES))
+    parser.add_argument("--modes", default=",".join(MODES), help=f"any of {','.join(MODES)}")
+    parser.add_argument("--kinds", default="ui,steps")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="previous --output to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    profiles = args.profiles.split(",")
+    modes = args.modes.split(",")
+    kinds = args.kinds.split(",")
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpuCount": os.cpu_count(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": [],
+        "micro": run_micro(),
+    }
+
+    for entry in results["micro"]:
+        print(f"{entry['name']:<40} {entry['nsPerCall']:>12.1f} ns/call")
+
+    for kind in kinds:
+        make_repo = make_ui_repo if kind == "ui" else make_steps_repo
+        for profile in profiles:
+            for size in sizes:
+                root = tempfile.mkdtemp(prefix=f"bench-{kind}-")
+                try:
+                    repo = make_repo(root, size, profile, args.seed)
+                    if "index" in modes:
+                        _commit_repo(root)
+
+                    for mode in modes:
+                        case = _run_isolated(kind, mode, root, args.repeat)
+                        if "error" in case:
+                            print(f"{SCANNERS[kind]} {mode} {profile} {size} failed: {case['error']}")
+                            continue
+
+                        name = (INDEX_SCANNERS if mode == "index" else SCANNERS)[kind]
+                        entry = {
+                            "name": name, "mode": mode, "profile": profile,
+                            "files": repo["files"], "bytes": repo["bytes"], **case,
+                            "filesPerSec": round(repo["files"] / case["seconds"], 1),
+                            "mbPerSec": round(repo["bytes"] / case["seconds"] / 1024 ** 2, 2),
+                        }
+                        results["results"].append(entry)
+                        print(
+                            f"{entry['name']:<34} {mode:<8} {profile:<10} files={size:<7} "
+                            f"{entry['filesPerSec']:>10.0f} files/s {entry['mbPerSec']:>8.1f} MB/s "
+                            f"rss={entry['peakRssMb']:.0f}MB count={entry['count']}"
+                        )
+                finally:
+                    shutil.rmtree(root, ignore_errors=True)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
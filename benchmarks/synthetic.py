@@ -0,0 +1,183 @@
+"""
+Deterministic synthetic repos for the scanner benchmarks.
+
+The same (files, profile, seed) always produces byte-identical trees, so
+results from different runs and machines are comparable.
+
+Profiles:
+    components  one React component per .tsx/.jsx file, a few KB each
+    minified    mostly components, plus large single-line .js bundles
+    deep        components nested 24 directories deep
+
+Usage:
+    python -m benchmarks.synthetic /tmp/ui-repo --kind ui --files 10000 --profile minified
+"""
+import argparse
+import os
+import random
+
+PROFILES = ("components", "minified", "deep")
+
+# one bundle per this many files in the "minified" profile
+BUNDLE_EVERY = 50
+BUNDLE_COMPONENTS = 400
+DEEP_LEVELS = 24
+
+WORDS = (
+    "cart", "checkout", "login", "profile", "search", "order", "payment", "address",
+    "product", "review", "invoice", "settings", "account", "wishlist", "coupon", "shipping"
+)
+STEP_KEYWORDS = ("Given", "When", "Then", "And", "But")
+
+
+def make_ui_repo(root: str, files: int, profile: str = "components", seed: int = 0) -> dict:
+    """Write a React/TSX repo; returns {"files": n, "bytes": total size}."""
+    rng = random.Random(seed)
+    total = 0
+
+    for i in range(files):
+        folder = _folder(root, i, profile)
+        if profile == "minified" and i % BUNDLE_EVERY == 0:
+            name = f"bundle{i}.min.js"
+            content = ";".join(_component(rng, i * 1000 + j, minified=True) for j in range(BUNDLE_COMPONENTS))
+        else:
+            name = f"Component{i}.{'tsx' if i % 3 else 'jsx'}"
+            content = _component(rng, i)
+        total += _write(folder, name, content)
+
+    return {"files": files, "bytes": total}
+
+
+def make_steps_repo(root: str, files: int, profile: str = "components", seed: int = 0) -> dict:
+    """Write a Cucumber/Selenium Java repo (plus .feature files); returns {"files", "bytes"}."""
+    rng = random.Random(seed)
+    total = 0
+
+    for i in range(files):
+        folder = _folder(root, i, profile)
+        if i % 10 == 0:
+            total += _write(folder, f"story{i}.feature", _feature(rng, i))
+        else:
+            total += _write(folder, f"Steps{i}.java", _step_class(rng, i))
+
+    return {"files": files, "bytes": total}
+
+
+def sample_component(seed: int = 0, minified: bool = False) -> str:
+    """One generated component's source, for per-call benchmarks."""
+    return _component(random.Random(seed), seed, minified)
+
+
+def sample_step_class(seed: int = 0) -> str:
+    """One generated step-definition class's source."""
+    return _step_class(random.Random(seed), seed)
+
+
+# ---------------- Helper Functions ----------------
+
+def _folder(root: str, i: int, profile: str) -> str:
+    if profile == "deep":
+        parts = [f"level{(i // 7 + depth) % 5}" for depth in range(DEEP_LEVELS)]
+        return os.path.join(root, "src", *parts, f"feature{i % 50}")
+    return os.path.join(root, "src", f"module{i % 100}")
+
+
+def _write(folder: str, name: str, content: str) -> int:
+    os.makedirs(folder, exist_ok=True)
+    data = content.encode("utf-8")
+    with open(os.path.join(folder, name), "wb") as f:
+        f.write(data)
+    return len(data)
+
+
+def _component(rng: random.Random, i: int, minified: bool = False) -> str:
+    word = rng.choice(WORDS)
+    fields = rng.randint(2, 8)
+    lines = [
+        f'export function {word.title()}{i}({{ items }}) {{',
+        '  return (',
+        f'    <div className="{word}-card-{i} shadow" data-testid="{word}-card-{i}">',
+    ]
+    for f in range(fields):
+        lines.append(
+            f'      <input id="{word}-field-{i}-{f}" name="{word}Field{f}" '
+            f'aria-label="{word.title()} field {f}" onChange={{handle{f}}} />'
+        )
+    lines.append(f'      <button id="{word}-submit-{i}" className="btn primary">Submit {word} {i}</button>')
+    lines.append('      {items.map((item) => <li key={item.id} className="row">{item.label}</li>)}')
+    lines.append('    </div>')
+    lines.append('  );')
+    lines.append('}')
+    # plain code with no selectors, as most of a real component is
+    lines.extend(
+        f'const compute{i}_{n} = (a, b) => a.reduce((acc, x) => acc + x * b, {n});'
+        for n in range(rng.randint(20, 60))
+    )
+    separator = "" if minified else "\n"
+    return separator.join(line.strip() if minified else line for line in lines) + separator
+
+
+def _step_text(rng: random.Random, i: int, n: int) -> str:
+    word = rng.choice(WORDS)
+    kind = n % 4
+    if kind == 0:
+        return f"user opens the {word} page {i}-{n}"
+    if kind == 1:
+        return f"user adds {{int}} {word} item(s) {i}-{n}"
+    if kind == 2:
+        return f'user enters {{string}} in the \\"{word}\\" field {i}-{n}'
+    return f"^user sees (.*) on {word} screen {i}-{n}$"
+
+
+def _step_class(rng: random.Random, i: int) -> str:
+    lines = [
+        "package steps;",
+        "",
+        "import io.cucumber.java.en.*;",
+        "import org.openqa.selenium.By;",
+        "",
+        f"public class Steps{i} {{",
+    ]
+    for n in range(rng.randint(3, 12)):
+        keyword = STEP_KEYWORDS[n % len(STEP_KEYWORDS)]
+        lines.extend([
+            f'    @{keyword}("{_step_text(rng, i, n)}")',
+            f"    public void step{n}() {{",
+            f'        driver.findElement(By.cssSelector("#{rng.choice(WORDS)}-{n}")).click();',
+            "    }",
+            "",
+        ])
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def _feature(rng: random.Random, i: int) -> str:
+    word = rng.choice(WORDS)
+    lines = [f"Feature: {word} {i}", ""]
+    for n in range(rng.randint(2, 5)):
+        lines.extend([
+            f"  Scenario: {word} scenario {n}",
+            f"    Given user opens the {word} page {i}-{n}",
+            f"    When user adds {n} {word} items",
+            f"    Then user sees confirmation on {word} screen",
+            "",
+        ])
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("root")
+    parser.add_argument("--kind", choices=("ui", "steps"), default="ui")
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--profile", choices=PROFILES, default="components")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    make = make_ui_repo if args.kind == "ui" else make_steps_repo
+    stats = make(args.root, args.files, args.profile, args.seed)
+    print(f"Wrote {stats['files']} files ({stats['bytes'] / 1024 ** 2:.1f} MB) to {args.root}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
 from fastapi import FastAPI
 
+from mcp_common.metrics import install_metrics
+
 app = FastAPI(title="MCP BDD Server")
+install_metrics(app)
 
 @app.get("/context")
 def context(repo_url: str):
@@ -0,0 +1,139 @@
+"""
+Matches Gherkin step text against existing step definitions.
+
+Definitions may be Cucumber expressions ("user adds {int} items to the
+{string} list", optional text "item(s)", alternatives "click/tap") or
+regular expressions ("^user is on the (.*) page$"). All of them are compiled
+once; a word trie over each pattern's literal prefix narrows every lookup to
+the few definitions that could match before any regex runs.
+"""
+import re
+from functools import lru_cache
+
+GHERKIN_STEP = re.compile(r'^\s*(?:Given|When|Then|And|But|\*)\s+(.+?)\s*$', re.MULTILINE)
+
+PARAMETER_TYPES = {
+    "int": r'-?\d+',
+    "float": r'-?\d*\.?\d+',
+    "word": r'[^\s]+',
+    "string": r'"[^"]*"|\'[^\']*\'',
+    "": r'.*',
+    "byte": r'-?\d+',
+    "short": r'-?\d+',
+    "long": r'-?\d+',
+    "biginteger": r'-?\d+',
+    "double": r'-?\d*\.?\d+',
+    "bigdecimal": r'-?\d*\.?\d+',
+}
+
+# tokens of a Cucumber expression: parameter, optional text, alternation, text
+EXPRESSION_TOKEN = re.compile(r'\{(\w*)\}|\(([^()]*)\)|([^\s{}()/]+(?:/[^\s{}()/]+)+)|(\\.|[^{(\s/]+|\s+|.)')
+EXPRESSION_SYNTAX = re.compile(r'[{(/]')
+REGEX_HINT = re.compile(r'^\^|\$$|\\[dswDSW.]|\(\.\*\)|\(\.\+\)|\[\^')
+WORD = re.compile(r'\S+')
+
+
+def gherkin_steps(feature: str) -> list:
+    """Step texts (keyword stripped) in a feature file, in order, without duplicates."""
+    return list(dict.fromkeys(GHERKIN_STEP.findall(feature)))
+
+
+def compile_pattern(pattern: str):
+    """(compiled regex, literal word prefix) for one step definition."""
+    if REGEX_HINT.search(pattern):
+        body = pattern
+        if body.startswith("^"):
+            body = body[1:]
+        if body.endswith("$") and not body.endswith("\\$"):
+            body = body[:-1]
+        return re.compile(body), _literal_prefix_regex(body)
+
+    parts = []
+    literal = []
+    literal_done = False
+    for param, optional, alternation, text in EXPRESSION_TOKEN.findall(pattern):
+        if text:
+            parts.append(re.escape(text.replace("\\", "")) if not text.isspace() else r'\s+')
+            if not literal_done:
+                literal.append(text)
+            continue
+
+        literal_done = True
+        if optional:
+            parts.append(f"(?:{re.escape(optional)})?")
+        elif alternation:
+            parts.append("(?:" + "|".join(re.escape(a) for a in alternation.split("/")) + ")")
+        else:
+            parts.append(f"(?:{PARAMETER_TYPES.get(param.lower(), r'.*')})")
+
+    # an unfinished word before a parameter is not a whole literal word
+    prefix = "".join(literal)
+    words = WORD.findall(prefix)
+    if literal_done and words and not prefix[-1:].isspace():
+        words = words[:-1]
+    return re.compile("".join(parts)), [w.lower() for w in words]
+
+
+def _literal_prefix_regex(body: str) -> list:
+    match = re.match(r'[\w\s]*', body)
+    prefix = match.group(0)
+    words = WORD.findall(prefix)
+    if words and len(prefix) < len(body) and not prefix[-1:].isspace():
+        words = words[:-1]
+    return [w.lower() for w in words]
+
+
+class StepMatcher:
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self._exact = {}
+        self._trie = {}  # word -> child node; "" -> pattern indexes ending here
+
+        for i, pattern in enumerate(self.patterns):
+            try:
+                regex, prefix = compile_pattern(pattern)
+            except re.error:
+                continue
+            if not REGEX_HINT.search(pattern) and not EXPRESSION_SYNTAX.search(pattern):
+                self._exact.setdefault(pattern, i)
+            node = self._trie
+            for word in prefix:
+                node = node.setdefault(word, {})
+            node.setdefault("", []).append((i, regex))
+
+    def match(self, step: str):
+        """The definition implementing step, or None."""
+        if step in self._exact:
+            return self.patterns[self._exact[step]]
+
+        node = self._trie
+        candidates = list(node.get("", []))
+        for word in WORD.findall(step.lower()):
+            node = node.get(word)
+            if node is None:
+                break
+            candidates.extend(node.get("", []))
+
+        # most specific (longest literal prefix) first
+        for i, regex in reversed(candidates):
+            if regex.fullmatch(step):
+                return self.patterns[i]
+        return None
+
+    def split(self, steps: list):
+        """(implemented {step: definition}, missing [step])."""
+        implemented, missing = {}, []
+        for step in steps:
+            definition = self.match(step)
+            if definition is None:
+                missing.append(step)
+            else:
+                implemented[step] = definition
+        return implemented, missing
+
+
+@lru_cache(maxsize=8)
+def compile_steps(patterns: tuple) -> StepMatcher:
+    """StepMatcher for a repo's step definitions, reused while they don't change."""
+    return StepMatcher(patterns)
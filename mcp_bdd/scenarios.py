@@ -0,0 +1,267 @@
+"""
+Scenario-level handling of generated BDD artifacts.
+
+ScenarioSplitter cuts a Gherkin feature into scenario blocks while it is
+still streaming in, so each scenario's step definitions can be generated as
+soon as the scenario is complete. merge_step_classes joins the Java step
+definition classes generated per scenario into one class, keeping each
+import, field and step definition once.
+"""
+import re
+import textwrap
+
+from mcp_bdd.matcher import gherkin_steps
+
+SCENARIO_HEADER = re.compile(r'^\s*(Scenario Outline|Scenario Template|Scenario|Example|Background)\s*:\s*(.*?)\s*$')
+RULE_HEADER = re.compile(r'^\s*Rule\s*:')
+TAG_LINE = re.compile(r'^\s*@\S')
+FENCE = re.compile(r'^\s*```')
+
+PACKAGE = re.compile(r'^\s*package\s+[\w.]+\s*;', re.MULTILINE)
+IMPORT = re.compile(r'^\s*import\s+(?:static\s+)?[\w.]+(?:\.\*)?\s*;', re.MULTILINE)
+CLASS_DECLARATION = re.compile(r'\b(?:public\s+)?(?:final\s+)?class\s+(\w+)[^{;]*\{')
+STEP_ANNOTATION = re.compile(r'@(?:Given|When|Then|And|But)\s*\(\s*"((?:[^"\\]|\\.)*)"')
+METHOD_SIGNATURE = re.compile(r'(\w+)\s*\(([^()]*)\)\s*(?:throws\s[^{]*)?$')
+FIELD_NAME = re.compile(r'(\w+)\s*(?:=|;)')
+COMMENT = re.compile(r'//[^\n]*|/\*.*?\*/', re.DOTALL)
+STRING_LITERAL = re.compile(r'"(?:[^"\\]|\\.)*"')
+DEFAULT_CLASS_NAME = "StepDefinitions"
+
+
+class ScenarioSplitter:
+    """
+    Incremental Gherkin scenario splitter.
+
+    feed(text) returns the scenarios completed by that text; a scenario is
+    complete once the next one (or its tags) starts, so the last one is only
+    returned by close(). A Background is returned as a block of its own.
+    Each scenario is {"index", "keyword", "name", "text", "steps"}.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._partial = ""
+        self._current = None
+        self._tags = []
+
+    def feed(self, text: str) -> list:
+        self._partial += text
+        *lines, self._partial = self._partial.split("\n")
+        return [block for block in map(self._line, lines) if block]
+
+    def close(self) -> list:
+        done = []
+        if self._partial:
+            done.append(self._line(self._partial))
+            self._partial = ""
+        done.append(self._finish())
+        return [block for block in done if block]
+
+    def _line(self, line: str):
+        if FENCE.match(line):
+            return None
+
+        header = SCENARIO_HEADER.match(line)
+        if header or RULE_HEADER.match(line):
+            block = self._finish()
+            if header:
+                self._current = {"keyword": header.group(1), "name": header.group(2), "lines": self._tags + [line]}
+            self._tags = []
+            return block
+
+        if TAG_LINE.match(line):
+            # tags belong to the header that follows them
+            self._tags.append(line)
+            return None
+
+        if self._current is not None:
+            self._current["lines"].extend(self._tags + [line])
+        self._tags = []
+        return None
+
+    def _finish(self):
+        block, self._current = self._current, None
+        if block is None:
+            return None
+
+        text = "\n".join(block["lines"]).strip()
+        scenario = {
+            "index": self.count,
+            "keyword": block["keyword"],
+            "name": block["name"],
+            "text": text,
+            "steps": gherkin_steps(text)
+        }
+        self.count += 1
+        return scenario
+
+
+def merge_step_classes(sources: list, class_name: str = None) -> str:
+    """
+    One Java class from several generated step definition classes.
+
+    The first package and class name win, imports are deduplicated, and so
+    are members: step definitions by their step pattern (Cucumber rejects
+    duplicates), fields by name, other methods by signature. A step method
+    whose name clashes with an earlier one of the same parameters is
+    renamed.
+    """
+    package = None
+    imports = []
+    members = []
+    seen = set()
+    signatures = set()
+
+    for source in sources:
+        source = "\n".join(line for line in source.split("\n") if not FENCE.match(line))
+
+        if package is None:
+            match = PACKAGE.search(source)
+            package = match.group(0).strip() if match else None
+        for match in IMPORT.finditer(source):
+            statement = re.sub(r'\s+', " ", match.group(0).strip())
+            if statement not in imports:
+                imports.append(statement)
+
+        declaration = CLASS_DECLARATION.search(source)
+        if declaration:
+            class_name = class_name or declaration.group(1)
+            body = source[declaration.end():_closing_brace(source, declaration.end())]
+        else:
+            body = IMPORT.sub("", PACKAGE.sub("", source))
+
+        for member in _split_members(body):
+            key, signature = _member_key(member)
+            if key in seen:
+                continue
+            seen.add(key)
+            if signature is not None:
+                member, signature = _unique_method(member, signature, signatures)
+                signatures.add(signature)
+            members.append(member)
+
+    lines = []
+    if package:
+        lines += [package, ""]
+    if imports:
+        lines += imports + [""]
+    lines.append(f"public class {class_name or DEFAULT_CLASS_NAME} {{")
+    for member in members:
+        lines += ["", textwrap.indent(member, "    ")]
+    lines.append("}")
+    return "\n".join(lines)
+
+
+# ---------------- Helper Functions ----------------
+
+def _scan(code: str, start: int = 0):
+    """(index, char) of code outside comments, strings and char literals."""
+    i = start
+    while i < len(code):
+        two = code[i:i + 2]
+        if two == "//":
+            end = code.find("\n", i)
+            i = len(code) if end < 0 else end
+            continue
+        if two == "/*":
+            end = code.find("*/", i + 2)
+            i = len(code) if end < 0 else end + 2
+            continue
+        if code[i] in "\"'":
+            quote = code[i]
+            i += 1
+            while i < len(code) and code[i] != quote:
+                i += 2 if code[i] == "\\" else 1
+            i += 1
+            continue
+        yield i, code[i]
+        i += 1
+
+
+def _closing_brace(code: str, start: int) -> int:
+    """Index of the brace closing the block opened just before start."""
+    depth = 1
+    for i, char in _scan(code, start):
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return i
+    return len(code)
+
+
+def _split_members(body: str) -> list:
+    """Top-level members of a class body, with their comments and annotations."""
+    members = []
+    start = 0
+    depth = 0
+    for i, char in _scan(body):
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                members.append(body[start:i + 1])
+                start = i + 1
+        elif char == ";" and depth == 0:
+            members.append(body[start:i + 1])
+            start = i + 1
+    # e.g. a trailing "// Step skipped" comment
+    members.append(body[start:])
+
+    cleaned = []
+    for member in members:
+        member = textwrap.dedent(member.strip("\n")).strip()
+        if member:
+            cleaned.append(member)
+    return cleaned
+
+
+def _member_key(member: str):
+    """(dedup key, method signature or None) of a member."""
+    step = STEP_ANNOTATION.search(member)
+    code = COMMENT.sub("", member).strip()
+    if not code:
+        return ("comment", member), None
+
+    # step patterns may contain "{int}" and the like
+    code = STRING_LITERAL.sub('""', code)
+    head = re.sub(r'\s+', " ", re.split(r'[{;=]', code, 1)[0]).strip()
+    method = METHOD_SIGNATURE.search(head)
+    if method:
+        types = tuple(_parameter_type(p) for p in method.group(2).split(",") if p.strip())
+        signature = (method.group(1), types)
+        return (("step", step.group(1)) if step else ("method", signature)), signature
+
+    field = FIELD_NAME.search(code) if code.endswith(";") else None
+    if field:
+        return ("field", field.group(1)), None
+    return ("other", re.sub(r'\s+', " ", code)), None
+
+
+def _parameter_type(parameter: str) -> str:
+    words = re.sub(r'@\w+(\([^)]*\))?|\bfinal\b', "", parameter).split()
+    return " ".join(words[:-1])
+
+
+def _unique_method(member: str, signature: tuple, taken: set):
+    name, types = signature
+    if signature not in taken:
+        return member, signature
+
+    n = 2
+    while (f"{name}{n}", types) in taken:
+        n += 1
+    renamed = f"{name}{n}"
+    # the declaration is the last "name(" before the body
+    body = _body_start(member)
+    matches = list(re.finditer(rf'\b{re.escape(name)}(?=\s*\()', member[:body]))
+    if not matches:
+        return member, signature
+    last = matches[-1]
+    return member[:last.start()] + renamed + member[last.end():], (renamed, types)
+
+
+def _body_start(member: str) -> int:
+    return next((i for i, char in _scan(member) if char == "{"), len(member))
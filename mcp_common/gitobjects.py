@@ -0,0 +1,77 @@
+"""
+Read repository files straight from git object storage.
+
+Files are listed with ``ls-tree`` and their contents streamed through the
+repo's long-lived ``git cat-file --batch`` process, so scans never need a
+working tree. On partial (``--filter=blob:none``) mirrors, the blobs a scan
+needs are fetched up front in a single request instead of one lazy fetch
+per object.
+"""
+import logging
+import subprocess
+
+from git import Repo
+
+logger = logging.getLogger(__name__)
+
+# files per read/scan round, bounds memory on very large trees
+BLOB_BATCH_SIZE = 2000
+
+
+def resolve_commit(repo: Repo, ref: str = "HEAD") -> str:
+    return repo.git.rev_parse(f"{ref or 'HEAD'}^{{commit}}")
+
+
+def list_blobs(repo: Repo, commit: str, extensions: tuple) -> dict:
+    """{path: blob_sha} for every file in commit ending in extensions."""
+    out = repo.git.ls_tree("-r", "-z", "--full-tree", commit)
+    blobs = {}
+
+    for entry in filter(None, out.split("\0")):
+        meta, path = entry.split("\t", 1)
+        _, obj_type, sha = meta.split(" ")
+        if obj_type == "blob" and path.endswith(extensions):
+            blobs[path] = sha
+
+    return blobs
+
+
+def prefetch_blobs(repo: Repo, commit: str, shas):
+    """Fetch the given blobs in one round trip if this is a partial clone."""
+    if not repo.git.config("--get", "remote.origin.promisor", with_exceptions=False):
+        return
+
+    out = repo.git.rev_list("--objects", "--no-walk", "--missing=print", commit)
+    missing = {line[1:] for line in out.splitlines() if line.startswith("?")}
+    wanted = missing.intersection(shas)
+    if not wanted:
+        return
+
+    logger.info(f"Prefetching {len(wanted)} blobs for {commit}")
+    # same invocation git itself uses for lazy promisor fetches, batched
+    subprocess.run(
+        [
+            "git", "--git-dir", repo.git_dir,
+            "-c", "fetch.negotiationAlgorithm=noop",
+            "fetch", "origin", "--no-tags", "--no-write-fetch-head",
+            "--recurse-submodules=no", "--filter=blob:none", "--stdin",
+        ],
+        input="\n".join(sorted(wanted)) + "\n",
+        text=True,
+        capture_output=True,
+        check=True,
+    )
+
+
+def iter_blob_batches(repo: Repo, blobs: list, batch_size: int = BLOB_BATCH_SIZE):
+    """
+    Yield lists of (path, text) for blobs, a list of (path, sha) pairs.
+
+    Contents are read through a single persistent cat-file --batch process.
+    """
+    for start in range(0, len(blobs), batch_size):
+        batch = []
+        for path, sha in blobs[start:start + batch_size]:
+            _, _, _, data = repo.git.get_object_data(sha)
+            batch.append((path, data.decode("utf-8", errors="ignore")))
+        yield batch
@@ -0,0 +1,217 @@
+"""
+Persistent on-disk store of bare git mirrors, keyed by repo URL.
+
+The first request for a URL clones a bare mirror; every later request only
+runs an incremental ``git fetch``. Mirrors are evicted least-recently-used
+once the store grows past ``MCP_MIRROR_MAX_BYTES``.
+
+By default mirrors are partial (``--filter=blob:none``) and shallow
+(``--depth 1``): scanners read the few blobs they need straight from object
+storage (see ``mcp_common.gitobjects``) instead of a checked-out tree.
+"""
+import hashlib
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from git import Repo
+from git.exc import InvalidGitRepositoryError, NoSuchPathError
+
+from mcp_common.metrics import Counter, Histogram
+from mcp_common.singleflight import SingleFlight
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MIRROR_ROOT = os.getenv(
+    "MCP_MIRROR_DIR", os.path.join(tempfile.gettempdir(), "mcp-mirrors")
+)
+MIRROR_MAX_BYTES = int(os.getenv("MCP_MIRROR_MAX_BYTES", str(5 * 1024 ** 3)))
+# empty filter / depth 0 turn partial and shallow mirrors off
+MIRROR_FILTER = os.getenv("MCP_MIRROR_FILTER", "blob:none")
+MIRROR_DEPTH = int(os.getenv("MCP_MIRROR_DEPTH", "1"))
+
+MIRROR_SYNC = Histogram("mirror_sync_duration_seconds", "Repo mirror clone / fetch latency", ("op",))
+MIRROR_EVICTIONS = Counter("mirror_evictions_total", "Mirrors evicted to stay under MCP_MIRROR_MAX_BYTES")
+
+
+class MirrorStore:
+
+    def __init__(
+        self,
+        root: str = MIRROR_ROOT,
+        max_bytes: int = MIRROR_MAX_BYTES,
+        blob_filter: str = MIRROR_FILTER,
+        depth: int = MIRROR_DEPTH
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.blob_filter = blob_filter
+        self.depth = depth
+        self._guard = threading.Lock()
+        self._locks = {}
+        self._in_use = {}
+        # concurrent syncs of one URL share a single clone / fetch
+        self._syncs = SingleFlight("mirror_sync")
+        os.makedirs(self.root, exist_ok=True)
+
+    # ---------------- Public API ----------------
+
+    def mirror_path(self, repo_url: str) -> str:
+        return os.path.join(self.root, self._key(repo_url))
+
+    def sync(self, repo_url: str) -> str:
+        """Clone or fetch the mirror for repo_url and return its git dir."""
+        return self._syncs.do(repo_url, self._sync, repo_url)
+
+    @contextmanager
+    def resolve(self, repo_url: str, ref: str = None):
+        """
+        Yield the git dir to read repo_url from, or None to scan it as a
+        plain directory.
+
+        Local repos yield their own git dir and plain local directories yield
+        None. When the caller reads ref "HEAD" of a local checkout with
+        uncommitted or untracked changes, None is yielded too, so the working
+        tree - what the user is editing - is scanned rather than the last
+        commit. Remote URLs are synced and protected from eviction while in use.
+        """
+        if os.path.exists(repo_url):
+            try:
+                with Repo(repo_url) as repo:
+                    git_dir = repo.git_dir
+                    if ref == "HEAD" and not repo.bare and repo.git.status("--porcelain"):
+                        logger.info(f"{repo_url} has uncommitted changes - scanning its working tree")
+                        git_dir = None
+            except (InvalidGitRepositoryError, NoSuchPathError):
+                git_dir = None
+            yield git_dir
+            return
+
+        key = self._key(repo_url)
+        self._acquire(key)
+        try:
+            yield self.sync(repo_url)
+        finally:
+            self._release(key)
+
+    # ---------------- Helper Functions ----------------
+
+    def _sync(self, repo_url: str) -> str:
+        key = self._key(repo_url)
+        path = os.path.join(self.root, key)
+
+        self._acquire(key)
+        try:
+            with self._lock(key):
+                if os.path.isdir(path):
+                    logger.info(f"Fetching mirror for {repo_url}")
+                    fetch_args = ["--prune", "origin"]
+                    if self.depth:
+                        fetch_args.insert(0, f"--depth={self.depth}")
+                    with MIRROR_SYNC.time(op="fetch"):
+                        Repo(path).git.fetch(*fetch_args)
+                else:
+                    logger.info(f"Cloning new mirror for {repo_url}")
+                    with MIRROR_SYNC.time(op="clone"):
+                        self._clone(repo_url, path)
+                os.utime(path)
+        finally:
+            self._release(key)
+
+        self._evict(keep=key)
+        return path
+
+    def _key(self, repo_url: str) -> str:
+        digest = hashlib.sha1(repo_url.encode("utf-8")).hexdigest()[:16]
+        name = re.sub(r"\.git$", "", repo_url.rstrip("/").split("/")[-1])
+        name = re.sub(r"[^A-Za-z0-9_.-]", "_", name) or "repo"
+        return f"{name}-{digest}.git"
+
+    def _clone(self, repo_url: str, path: str):
+        tmp_dir = tempfile.mkdtemp(dir=self.root, prefix=".clone-")
+        try:
+            options = {"mirror": True}
+            if self.blob_filter:
+                options["filter"] = self.blob_filter
+            if self.depth:
+                options["depth"] = self.depth
+            Repo.clone_from(repo_url, tmp_dir, **options)
+            os.replace(tmp_dir, path)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+    @contextmanager
+    def _lock(self, key: str):
+        with self._guard:
+            lock = self._locks.setdefault(key, threading.Lock())
+
+        with lock:
+            if fcntl is None:
+                yield
+                return
+
+            # also serialise against other service processes sharing the root
+            with open(os.path.join(self.root, f".{key}.lock"), "w") as fh:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def _acquire(self, key: str):
+        with self._guard:
+            self._in_use[key] = self._in_use.get(key, 0) + 1
+
+    def _release(self, key: str):
+        with self._guard:
+            self._in_use[key] -= 1
+            if not self._in_use[key]:
+                del self._in_use[key]
+
+    def _evict(self, keep: str):
+        entries = []
+        total = 0
+
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith(".") or not os.path.isdir(path):
+                continue
+            size = _dir_size(path)
+            total += size
+            entries.append((os.stat(path).st_mtime, name, size))
+
+        # oldest first
+        for _, name, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            with self._guard:
+                busy = name == keep or name in self._in_use
+            if busy:
+                continue
+
+            with self._lock(name):
+                logger.info(f"Evicting mirror {name} ({size} bytes)")
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+            MIRROR_EVICTIONS.inc()
+            total -= size
+
+
+def _dir_size(path: str) -> int:
+    size = 0
+    for root, _, files in os.walk(path):
+        for file in files:
+            try:
+                size += os.path.getsize(os.path.join(root, file))
+            except OSError:
+                pass
+    return size
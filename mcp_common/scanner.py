@@ -0,0 +1,81 @@
+"""
+Shared multi-core file scanning engine for mcp_ui and mcp_git.
+
+Work is sharded across a process pool that lives for the life of the
+service. Extractors must be module-level functions (so they pickle) and
+should compile their patterns at import time, which happens once per worker.
+Results always come back in input order, so callers that feed sorted paths
+get deterministic merges regardless of worker count.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from mcp_common.metrics import COUNT_BUCKETS, Histogram
+
+logger = logging.getLogger(__name__)
+
+SCAN_WORKERS = int(os.getenv("MCP_SCAN_WORKERS", "0")) or os.cpu_count() or 1
+
+# below this many items the pool round-trip costs more than it saves
+MIN_PARALLEL_ITEMS = 64
+
+SCAN_DURATION = Histogram("scan_duration_seconds", "File scan latency per scan() call")
+SCAN_ITEMS = Histogram("scan_items", "Files scanned per scan() call", buckets=COUNT_BUCKETS)
+
+_pools = {}
+_pools_guard = threading.Lock()
+
+
+def list_files(repo_path: str, extensions: tuple) -> list:
+    """All files under repo_path ending in extensions, sorted by path."""
+    paths = []
+
+    for root, dirs, files in os.walk(repo_path):
+        dirs[:] = [d for d in dirs if d != ".git"]
+        for file in files:
+            if file.endswith(extensions):
+                paths.append(os.path.join(root, file))
+
+    return sorted(paths)
+
+
+def scan(func, items: list, workers: int = None) -> list:
+    """Return [func(item) for item in items], sharded across workers."""
+    workers = workers or SCAN_WORKERS
+    start = time.perf_counter()
+
+    if workers <= 1 or len(items) < MIN_PARALLEL_ITEMS:
+        results = [func(item) for item in items]
+    else:
+        # a few chunks per worker keeps the pool busy when file sizes are skewed
+        chunksize = max(1, len(items) // (workers * 4))
+        logger.debug(f"Scanning {len(items)} items on {workers} workers (chunksize={chunksize})")
+        results = list(_pool(workers).map(func, items, chunksize=chunksize))
+
+    SCAN_DURATION.observe(time.perf_counter() - start)
+    SCAN_ITEMS.observe(len(items))
+    return results
+
+
+def read_text(path: str) -> str:
+    with open(path, encoding="utf-8", errors="ignore") as f:
+        return f.read()
+
+
+def shutdown_pools():
+    """Stop the worker processes; the next parallel scan starts a new pool."""
+    with _pools_guard:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown()
+
+
+def _pool(workers: int) -> ProcessPoolExecutor:
+    with _pools_guard:
+        if workers not in _pools:
+            _pools[workers] = ProcessPoolExecutor(max_workers=workers)
+        return _pools[workers]
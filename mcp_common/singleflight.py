@@ -0,0 +1,54 @@
+"""
+Single-flight call coalescing.
+
+While a call for a key is running, identical calls from other threads wait
+for it and share its result (or exception) instead of repeating the work.
+Nothing is cached: once the call returns, the next one runs again.
+"""
+import threading
+
+from mcp_common.metrics import Counter
+
+COALESCED = Counter("coalesced_calls_total", "Calls that joined an identical in-flight call", ("flight",))
+
+
+class _Call:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, *args, **kwargs):
+        """func(*args, **kwargs), unless a call for key is in flight; then its result."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            COALESCED.inc(flight=self.name)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
@@ -0,0 +1,146 @@
+import os
+import re
+
+# By.cssSelector("...") calls; the selector may contain escaped quotes
+CSS_SELECTOR_CALL = re.compile(r'By\.cssSelector\("((?:[^"\\]|\\.)*)"\)')
+
+# minimum normalized similarity (1 - edit distance / length) to rewrite a selector
+REPAIR_MIN_SIMILARITY = float(os.getenv("SELECTOR_REPAIR_MIN_SIMILARITY", "0.8"))
+# the best match must beat the runner-up by this much to count as confident
+REPAIR_MIN_MARGIN = 0.1
+# a selector of another kind (#id vs [data-testid]) is a slightly weaker match
+KIND_MISMATCH_PENALTY = 0.05
+NGRAM = 3
+
+SELECTOR_FORMS = [
+    ("id", re.compile(r'^#([\w-]+)$')),
+    ("class", re.compile(r'^\.([\w-]+)$')),
+    ("attr", re.compile(r'^\[([\w-]+)=["\']?([^"\']+)["\']?\]$')),
+    ("text", re.compile(r'^\w*:contains\(["\']?([^"\']+)["\']?\)$')),
+]
+
+
+def selectors_used(code: str) -> list:
+    """CSS selectors passed to By.cssSelector in code, unescaped."""
+    return [_unescape(match) for match in CSS_SELECTOR_CALL.findall(code)]
+
+
+def normalize(selector: str):
+    """
+    (kind, value) with the value reduced to lowercase alphanumerics, so
+    "#buy-btn", "#buyBtn" and "#buy_btn" all normalize to ("id", "buybtn").
+    Attribute selectors keep their attribute in the kind:
+    '[data-testid="buy-btn"]' is ("attr:data-testid", "buybtn").
+    """
+    for kind, pattern in SELECTOR_FORMS:
+        match = pattern.match(selector.strip())
+        if match:
+            if kind == "attr":
+                kind = f"attr:{match.group(1).lower()}"
+            return kind, re.sub(r"[^a-z0-9]", "", match.group(match.lastindex).lower())
+    return "other", re.sub(r"[^a-z0-9]", "", selector.lower())
+
+
+class SelectorRepairer:
+    """
+    Maps invalid selectors onto the allowed ones without an LLM call:
+    exact match of kind and value after normalization, else the closest
+    allowed selector by edit distance among those sharing character
+    trigrams, when unambiguous. UIs often expose one element several ways
+    (#buy-btn and [data-testid="buy-btn"]); such twins share a normalized
+    value and don't count against each other.
+    """
+
+    def __init__(self, allowed):
+        self.allowed = sorted(set(allowed))
+        self.normalized = [normalize(selector) for selector in self.allowed]
+        self.grams = {}  # trigram -> indexes into self.allowed
+
+        for i, (_, value) in enumerate(self.normalized):
+            for gram in _ngrams(value):
+                self.grams.setdefault(gram, set()).add(i)
+
+    def match(self, selector: str):
+        """The allowed selector to use instead of selector, or None if unsure."""
+        kind, value = normalize(selector)
+        if not value:
+            return None
+
+        exact = [self.allowed[i] for i, normalized in enumerate(self.normalized) if normalized == (kind, value)]
+        if len(exact) == 1:
+            return exact[0]
+
+        candidates = set()
+        for gram in _ngrams(value):
+            candidates |= self.grams.get(gram, set())
+
+        scored = []
+        for i in candidates:
+            other_kind, other_value = self.normalized[i]
+            score = 1 - _levenshtein(value, other_value) / max(len(value), len(other_value))
+            if other_kind != kind:
+                score -= KIND_MISMATCH_PENALTY
+            scored.append((score, self.allowed[i], other_value))
+
+        if not scored:
+            return None
+
+        scored.sort(reverse=True)
+        best_score, best, best_value = scored[0]
+        # the margin is to the best match for a different value, not to twins of the best
+        runner_up = next((score for score, _, other_value in scored if other_value != best_value), 0.0)
+
+        if best_score >= REPAIR_MIN_SIMILARITY and best_score - runner_up >= REPAIR_MIN_MARGIN:
+            return best
+        return None
+
+    def repair(self, code: str, invalid: list):
+        """
+        Rewrite the invalid selectors in code that have a confident match.
+        Returns (code, repaired {invalid: allowed}, unresolved [invalid]).
+        """
+        repaired = {}
+        unresolved = []
+
+        for selector in invalid:
+            replacement = self.match(selector)
+            if replacement is None:
+                unresolved.append(selector)
+            else:
+                repaired[selector] = replacement
+
+        def substitute(match):
+            selector = _unescape(match.group(1))
+            if selector not in repaired:
+                return match.group(0)
+            return f'By.cssSelector("{_escape(repaired[selector])}")'
+
+        return CSS_SELECTOR_CALL.sub(substitute, code), repaired, unresolved
+
+
+def _ngrams(value: str) -> set:
+    if len(value) <= NGRAM:
+        return {value}
+    return {value[i:i + NGRAM] for i in range(len(value) - NGRAM + 1)}
+
+
+def _levenshtein(a: str, b: str) -> int:
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb)
+            ))
+        previous = current
+    return previous[-1]
+
+
+def _unescape(java_string: str) -> str:
+    return re.sub(r'\\(.)', r'\1', java_string)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
@@ -1,43 +1,81 @@
 from fastapi import FastAPI, Query
 import os
 import re
-import tempfile
-import shutil
 from git import Repo
 
+from mcp_common.gitobjects import (
+    iter_blob_batches, list_blobs, prefetch_blobs, resolve_commit
+)
+from mcp_common.metrics import COUNT_BUCKETS, Histogram, install_metrics
+from mcp_common.mirror import MirrorStore
+from mcp_common.scanner import list_files, read_text, scan
+from mcp_common.singleflight import SingleFlight
+
 app = FastAPI(title="MCP-GIT (E2E Automation Context)")
+install_metrics(app)
+
+mirrors = MirrorStore()
+# concurrent /context calls for one repo and ref share a single sync + scan
+contexts = SingleFlight("git_context")
+
+# compiled at import, i.e. once per scan worker process
+STEP_PATTERN = re.compile(r'@(Given|When|Then|And|But)\("((?:[^"\\]|\\.)+)"\)')
+JAVA_ESCAPE = re.compile(r'\\(.)')
+
+STEP_COUNT = Histogram("e2e_step_count", "Step definitions returned per /context call", buckets=COUNT_BUCKETS)
 
 @app.get("/context")
-def get_git_context(repo_url: str = Query(...)):
+def get_git_context(repo_url: str = Query(...), ref: str = Query("HEAD")):
     """
     repo_url:
     - Local path OR
     - Git HTTPS URL
+
+    Git repos are read from object storage at ref (remote ones through a
+    cached partial mirror); plain directories are walked.
     """
 
-    repo_path = clone_repo(repo_url)
+    context = contexts.do((repo_url, ref), build_git_context, repo_url, ref)
+    STEP_COUNT.observe(len(context["existingSteps"]))
+    return context
 
-    features = extract_features(repo_path)
-    steps = extract_step_definitions(repo_path)
+# ---------------- Helper Functions ----------------
 
-    shutil.rmtree(repo_path, ignore_errors=True)
+def build_git_context(repo_url: str, ref: str = "HEAD") -> dict:
+    # uncommitted changes of a local checkout are scanned from its working tree
+    with mirrors.resolve(repo_url, ref) as git_dir:
+        if git_dir:
+            commit, features, steps = scan_git_objects(git_dir, ref)
+        else:
+            commit = None
+            features = extract_features(repo_url)
+            steps = extract_step_definitions(repo_url)
 
     return {
         "repo": repo_url,
+        "commit": commit,
         "framework": "Cucumber + Selenium",
         "featureFiles": features,
         "existingSteps": steps
     }
 
-# ---------------- Helper Functions ----------------
 
-def clone_repo(repo_url: str) -> str:
-    if os.path.exists(repo_url):
-        return repo_url
+def scan_git_objects(git_dir: str, ref: str = "HEAD"):
+    """Feature file names and step texts at ref, without a working tree."""
+    steps = set()
+
+    with Repo(git_dir) as repo:
+        commit = resolve_commit(repo, ref)
+        feature_blobs = list_blobs(repo, commit, (".feature",))
+        java_blobs = list_blobs(repo, commit, (".java",))
 
-    tmp_dir = tempfile.mkdtemp()
-    Repo.clone_from(repo_url, tmp_dir)
-    return tmp_dir
+        prefetch_blobs(repo, commit, java_blobs.values())
+        for batch in iter_blob_batches(repo, sorted(java_blobs.items())):
+            for partial in scan(extract_steps_from_content, [content for _, content in batch]):
+                steps.update(partial)
+
+    features = [os.path.basename(path) for path in feature_blobs]
+    return commit, features, sorted(list(steps))
 
 
 def extract_features(repo_path: str):
@@ -51,18 +89,20 @@ def extract_features(repo_path: str):
     return feature_files
 
 
-def extract_step_definitions(repo_path: str):
+def extract_step_definitions(repo_path: str, workers: int = None):
     steps = set()
 
-    step_pattern = re.compile(r'@(Given|When|Then|And)\("([^"]+)"\)')
-
-    for root, _, files in os.walk(repo_path):
-        for file in files:
-            if file.endswith(".java"):
-                with open(os.path.join(root, file), encoding="utf-8", errors="ignore") as f:
-                    content = f.read()
-                    matches = step_pattern.findall(content)
-                    for _, step in matches:
-                        steps.add(step)
+    files = list_files(repo_path, (".java",))
+    for partial in scan(extract_steps_from_path, files, workers):
+        steps.update(partial)
 
     return sorted(list(steps))
+
+
+def extract_steps_from_path(file_path: str) -> list:
+    return extract_steps_from_content(read_text(file_path))
+
+
+def extract_steps_from_content(content: str) -> list:
+    # unescape the Java literal: \"  -> "  and  \\d -> \d
+    return [JAVA_ESCAPE.sub(r'\1', step) for _, step in STEP_PATTERN.findall(content)]
@@ -1,12 +1,21 @@
 from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+from typing import List
 import requests
 import os
+import threading
+import time
+from collections import OrderedDict
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 
+from mcp_common.metrics import Counter, Histogram, install_metrics
+
 load_dotenv()
 
 app = FastAPI(title="MCP-JIRA (Enterprise)")
+install_metrics(app)
 
 JIRA_EMAIL = os.getenv("JIRA_EMAIL")
 JIRA_API_TOKEN = os.getenv("JIRA_API_TOKEN")
@@ -14,8 +23,73 @@ JIRA_API_TOKEN = os.getenv("JIRA_API_TOKEN")
 if not JIRA_EMAIL or not JIRA_API_TOKEN:
     raise RuntimeError("JIRA_EMAIL or JIRA_API_TOKEN missing")
 
+JIRA_TIMEOUT = int(os.getenv("JIRA_TIMEOUT", "30"))
+JIRA_CACHE_SIZE = int(os.getenv("JIRA_CACHE_SIZE", "512"))
+# how long a cached issue is served without asking Jira at all
+JIRA_CACHE_FRESH_SECONDS = int(os.getenv("JIRA_CACHE_FRESH_SECONDS", "30"))
+JQL_BATCH_SIZE = 100
+
+ISSUE_FIELDS = "summary,description,updated"
+
+JIRA_LATENCY = Histogram("jira_request_duration_seconds", "Jira REST call latency", ("kind",))
+JIRA_ERRORS = Counter("jira_errors_total", "Failed Jira REST calls", ("kind",))
+JIRA_CACHE = Counter("jira_cache_lookups_total", "Issue cache lookups (fresh, revalidated, miss)", ("result",))
+
 auth = HTTPBasicAuth(JIRA_EMAIL, JIRA_API_TOKEN)
 
+# one keep-alive pool for all Jira calls
+session = requests.Session()
+session.auth = auth
+session.headers["Accept"] = "application/json"
+session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+
+class IssueCache:
+    """LRU of raw issue payloads plus the validators needed to revalidate them."""
+
+    def __init__(self, max_entries: int = JIRA_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, data: dict, etag: str = None, last_modified: str = None):
+        with self._lock:
+            self._entries[key] = {
+                "data": data,
+                "etag": etag,
+                "lastModified": last_modified,
+                "updated": data.get("fields", {}).get("updated"),
+                "checked": time.time()
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def touch(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._entries[key]["checked"] = time.time()
+
+    def discard(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+issue_cache = IssueCache()
+
+
+class BatchRequest(BaseModel):
+    jiraUrls: List[str]
+
+
 @app.get("/context")
 def get_jira_context(jira_url: str):
     """
@@ -27,19 +101,98 @@ def get_jira_context(jira_url: str):
     if not jira_url:
         raise HTTPException(status_code=400, detail="jira_url is required")
 
+    base_url, issue_key = parse_jira_url(jira_url)
+
+    return to_context(fetch_issue(base_url, issue_key))
+
+
+@app.post("/context/batch")
+def get_jira_context_batch(req: BatchRequest):
+    """
+    Resolve many issue URLs with one JQL search per Jira site instead of one
+    issue GET each. Results keep the request order; unresolved issues carry
+    an "error" instead of context.
+    """
+    parsed = [(url, *parse_jira_url(url)) for url in req.jiraUrls]
+
+    sites = {}
+    for _, base_url, issue_key in parsed:
+        sites.setdefault(base_url, []).append(issue_key)
+
+    found = {}
+    for base_url, keys in sites.items():
+        found.update(search_issues(base_url, keys))
+
+    results = []
+    for url, base_url, issue_key in parsed:
+        data = found.get((base_url, issue_key.upper()))
+        if data is None:
+            results.append({"jiraUrl": url, "error": f"Issue {issue_key} not found"})
+        else:
+            results.append({"jiraUrl": url, **to_context(data)})
+
+    return {"results": results}
+
+
+@app.get("/updated")
+def get_jira_updated(jira_url: str):
+    """
+    The issue's "updated" timestamp, always read from Jira (a fields=updated
+    probe, never the cache), so callers can fingerprint a story cheaply.
+    """
+    if not jira_url:
+        raise HTTPException(status_code=400, detail="jira_url is required")
+
+    base_url, issue_key = parse_jira_url(jira_url)
+
+    return {"storyId": issue_key.upper(), "updated": probe_updated(base_url, issue_key)}
+
+# -------- Helper --------
+def parse_jira_url(jira_url: str):
     try:
         base_url = jira_url.split("/browse/")[0]
         issue_key = jira_url.split("/")[-1]
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid Jira URL format")
+    return base_url, issue_key
 
+
+def fetch_issue(base_url: str, issue_key: str) -> dict:
+    """
+    Issue payload, served from the LRU while fresh. Stale entries are
+    revalidated with If-None-Match / If-Modified-Since when Jira sent
+    validators, otherwise by comparing the issue's "updated" field.
+    """
+    cache_key = f"{base_url}|{issue_key.upper()}"
     api_url = f"{base_url}/rest/api/3/issue/{issue_key}"
+    entry = issue_cache.get(cache_key)
 
-    response = requests.get(
-        api_url,
-        auth=auth,
-        headers={"Accept": "application/json"}
-    )
+    if entry and time.time() - entry["checked"] < JIRA_CACHE_FRESH_SECONDS:
+        JIRA_CACHE.inc(result="fresh")
+        return entry["data"]
+
+    headers = {}
+    if entry:
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["lastModified"]:
+            headers["If-Modified-Since"] = entry["lastModified"]
+
+        if not headers and entry["updated"]:
+            probe = _request("GET", api_url, "probe", params={"fields": "updated"})
+            if probe.status_code == 200 and probe.json()["fields"].get("updated") == entry["updated"]:
+                issue_cache.touch(cache_key)
+                JIRA_CACHE.inc(result="revalidated")
+                return entry["data"]
+
+    response = _request("GET", api_url, "issue", params={"fields": ISSUE_FIELDS}, headers=headers)
+
+    if response.status_code == 304 and entry:
+        issue_cache.touch(cache_key)
+        JIRA_CACHE.inc(result="revalidated")
+        return entry["data"]
+
+    JIRA_CACHE.inc(result="miss")
 
     if response.status_code != 200:
         raise HTTPException(
@@ -48,14 +201,112 @@ def get_jira_context(jira_url: str):
         )
 
     data = response.json()
+    issue_cache.put(
+        cache_key,
+        data,
+        etag=response.headers.get("ETag"),
+        last_modified=response.headers.get("Last-Modified")
+    )
+    return data
+
+
+def probe_updated(base_url: str, issue_key: str) -> str:
+    """
+    Current "updated" field of the issue. A cached copy older than that is
+    dropped, so the next /context call cannot serve the previous revision.
+    """
+    cache_key = f"{base_url}|{issue_key.upper()}"
+    response = _request(
+        "GET", f"{base_url}/rest/api/3/issue/{issue_key}", "probe", params={"fields": "updated"}
+    )
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail=response.text)
+
+    updated = response.json()["fields"].get("updated")
+    entry = issue_cache.get(cache_key)
+    if entry and entry["updated"] != updated:
+        issue_cache.discard(cache_key)
+    return updated
+
 
+def search_issues(base_url: str, issue_keys: list) -> dict:
+    """{(base_url, KEY): payload} for issue_keys, via JQL, skipping fresh cache entries."""
+    found = {}
+    missing = []
+
+    for key in dict.fromkeys(k.upper() for k in issue_keys):
+        entry = issue_cache.get(f"{base_url}|{key}")
+        if entry and time.time() - entry["checked"] < JIRA_CACHE_FRESH_SECONDS:
+            JIRA_CACHE.inc(result="fresh")
+            found[(base_url, key)] = entry["data"]
+        else:
+            missing.append(key)
+
+    for start in range(0, len(missing), JQL_BATCH_SIZE):
+        chunk = missing[start:start + JQL_BATCH_SIZE]
+
+        try:
+            issues = _search(base_url, f"key in ({', '.join(chunk)})")
+            JIRA_CACHE.inc(len(chunk), result="miss")
+            for data in issues:
+                issue_cache.put(f"{base_url}|{data['key'].upper()}", data)
+        except HTTPException:
+            # Jira rejects the whole JQL if any key is unknown; resolve one by one
+            issues = []
+            for key in chunk:
+                try:
+                    issues.append(fetch_issue(base_url, key))
+                except HTTPException:
+                    pass
+
+        for data in issues:
+            found[(base_url, data["key"].upper())] = data
+
+    return found
+
+
+def _search(base_url: str, jql: str) -> list:
+    issues = []
+    body = {"jql": jql, "fields": ISSUE_FIELDS.split(","), "maxResults": JQL_BATCH_SIZE}
+
+    while True:
+        response = _request("POST", f"{base_url}/rest/api/3/search/jql", "search", json=body)
+        if response.status_code != 200:
+            raise HTTPException(status_code=response.status_code, detail=response.text)
+
+        data = response.json()
+        issues.extend(data.get("issues", []))
+
+        if data.get("isLast", True) or not data.get("nextPageToken"):
+            return issues
+        body["nextPageToken"] = data["nextPageToken"]
+
+
+def _request(method: str, url: str, kind: str, **kwargs) -> requests.Response:
+    """kind labels the call's metrics: "issue", "probe" or "search"."""
+    try:
+        with JIRA_LATENCY.time(kind=kind):
+            response = session.request(method, url, timeout=JIRA_TIMEOUT, **kwargs)
+    except requests.exceptions.Timeout:
+        JIRA_ERRORS.inc(kind=kind)
+        raise HTTPException(status_code=504, detail=f"Timeout calling Jira at {url}")
+    except requests.exceptions.RequestException as e:
+        JIRA_ERRORS.inc(kind=kind)
+        raise HTTPException(status_code=502, detail=f"Error calling Jira at {url}: {str(e)}")
+
+    if response.status_code >= 400:
+        JIRA_ERRORS.inc(kind=kind)
+    return response
+
+
+def to_context(data: dict) -> dict:
     return {
         "storyId": data["key"],
         "summary": data["fields"]["summary"],
         "description": extract_text(data["fields"]["description"])
     }
 
-# -------- Helper --------
+
 def extract_text(description):
     """Extract plain text from Jira ADF"""
     if not description:
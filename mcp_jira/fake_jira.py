@@ -0,0 +1,105 @@
+"""
+Local stand-in for the Jira Cloud REST API, for exercising mcp_jira without
+a real site.
+
+Run:
+    uvicorn mcp_jira.fake_jira:app --port 8090
+
+then point mcp_jira at http://localhost:8090/browse/PROJ-1 (any credentials).
+Every PROJ-<n> key exists; KEY-0 and keys starting with MISSING do not.
+Issue GETs send an ETag and Last-Modified and honour conditional requests.
+GET /_stats reports how many requests of each kind were served.
+"""
+import hashlib
+import json
+import re
+from collections import Counter
+from email.utils import formatdate
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="Fake Jira")
+
+UPDATED = "2026-01-29T10:15:23.000+0000"
+UPDATED_EPOCH = 1769681723
+
+stats = Counter()
+# keys whose "updated" timestamp was bumped via POST /_touch/{key}
+revisions = Counter()
+
+
+def make_issue(key: str):
+    if key.upper().startswith("MISSING") or key.endswith("-0"):
+        return None
+
+    revision = revisions[key.upper()]
+    return {
+        "key": key.upper(),
+        "fields": {
+            "summary": f"Story {key.upper()}",
+            "description": {
+                "type": "doc",
+                "content": [{
+                    "type": "paragraph",
+                    "content": [{
+                        "type": "text",
+                        "text": f"As a user I want {key.upper()} implemented (rev {revision})."
+                    }]
+                }]
+            },
+            "updated": f"{UPDATED}#{revision}" if revision else UPDATED
+        }
+    }
+
+
+@app.get("/rest/api/3/issue/{key}")
+def get_issue(key: str, request: Request, fields: str = ""):
+    issue = make_issue(key)
+    if issue is None:
+        stats["issue_404"] += 1
+        return JSONResponse(status_code=404, content={"errorMessages": ["Issue does not exist"]})
+
+    if fields == "updated":
+        stats["issue_probe"] += 1
+        return {"key": issue["key"], "fields": {"updated": issue["fields"]["updated"]}}
+
+    etag = '"' + hashlib.sha1(json.dumps(issue, sort_keys=True).encode()).hexdigest() + '"'
+    last_modified = formatdate(UPDATED_EPOCH + revisions[key.upper()], usegmt=True)
+
+    if request.headers.get("If-None-Match") == etag:
+        stats["issue_304"] += 1
+        return Response(status_code=304, headers={"ETag": etag})
+
+    stats["issue_200"] += 1
+    return JSONResponse(content=issue, headers={"ETag": etag, "Last-Modified": last_modified})
+
+
+@app.post("/rest/api/3/search/jql")
+async def search(request: Request):
+    body = await request.json()
+    stats["search"] += 1
+
+    match = re.fullmatch(r"\s*key\s+in\s*\((.*)\)\s*", body.get("jql", ""), re.IGNORECASE)
+    if not match:
+        return JSONResponse(status_code=400, content={"errorMessages": ["Unsupported JQL"]})
+
+    keys = [k.strip() for k in match.group(1).split(",") if k.strip()]
+    issues = [make_issue(k) for k in keys]
+    if any(issue is None for issue in issues):
+        # real Jira rejects the whole query for unknown keys
+        return JSONResponse(status_code=400, content={"errorMessages": ["An issue key is invalid"]})
+
+    return {"issues": issues, "isLast": True}
+
+
+@app.post("/_touch/{key}")
+def touch(key: str):
+    """Simulate an edit: bumps the issue's "updated" field and ETag."""
+    revisions[key.upper()] += 1
+    return {"key": key.upper(), "revision": revisions[key.upper()]}
+
+
+@app.get("/_stats")
+def get_stats():
+    return dict(stats)
@@ -1,11 +1,19 @@
 from fastapi import FastAPI, Query
 import os
 import re
-import tempfile
-import shutil
-from git import Repo
+
+from mcp_common.metrics import COUNT_BUCKETS, Histogram, install_metrics
+from mcp_common.mirror import MirrorStore
+from mcp_common.scanner import list_files, read_text, scan
+from mcp_common.singleflight import SingleFlight
+from mcp_ui.index import SelectorIndex
 
 app = FastAPI(title="MCP-UI (React Repo Parser)")
+install_metrics(app)
+
+mirrors = MirrorStore()
+# concurrent /context calls for one repo and ref share a single sync + scan
+contexts = SingleFlight("ui_context")
 
 SELECTOR_PATTERNS = {
     "data-testid": r'data-testid=["\']([^"\']+)["\']',
@@ -14,70 +22,95 @@ SELECTOR_PATTERNS = {
     "aria-label": r'aria-label=["\']([^"\']+)["\']'
 }
 
+SCAN_EXTENSIONS = (".jsx", ".tsx", ".js", ".ts", ".html")
+
+# compiled at import, i.e. once per scan worker process
+COMPILED_PATTERNS = {attr: re.compile(pattern) for attr, pattern in SELECTOR_PATTERNS.items()}
+CLASS_PATTERN = re.compile(r'class(Name)?=["\']([^"\']+)["\']')
+BUTTON_TEXT_PATTERN = re.compile(r'<button[^>]*>([^<]+)</button>')
+
+SELECTOR_COUNT = Histogram("ui_selector_count", "Selectors returned per /context call", buckets=COUNT_BUCKETS)
+
 @app.get("/context")
-def get_ui_context(repo_url: str = Query(...)):
+def get_ui_context(repo_url: str = Query(...), ref: str = Query("HEAD")):
     """
     repo_url can be:
     - Local path
     - GitHub / Bitbucket HTTPS URL
+
+    Git repos are served from the selector index at ref; "commit" reports
+    the commit the index reflects. Plain directories are scanned directly.
+    "sources" maps each selector key to the file that defines it.
     """
 
-    repo_path = clone_repo(repo_url)
+    context = contexts.do((repo_url, ref), build_ui_context, repo_url, ref)
+    SELECTOR_COUNT.observe(context["selectorCount"])
+    return context
 
-    selectors = extract_selectors(repo_path)
 
-    shutil.rmtree(repo_path, ignore_errors=True)
+# ---------------- Helper Functions ----------------
+
+def build_ui_context(repo_url: str, ref: str = "HEAD") -> dict:
+    with mirrors.resolve(repo_url, ref) as git_dir:
+        if git_dir:
+            commit, selectors, sources = index.lookup(git_dir, ref)
+        else:
+            commit = None
+            selectors, sources = scan_selectors(repo_url)
 
     return {
         "repo": repo_url,
+        "commit": commit,
         "selectorCount": len(selectors),
-        "elements": selectors
+        "elements": selectors,
+        "sources": sources
     }
 
 
-# ---------------- Helper Functions ----------------
+def extract_selectors(repo_path: str, workers: int = None) -> dict:
+    return scan_selectors(repo_path, workers)[0]
 
-def clone_repo(repo_url: str) -> str:
-    if os.path.exists(repo_url):
-        return repo_url
 
-    tmp_dir = tempfile.mkdtemp()
-    Repo.clone_from(repo_url, tmp_dir)
-    return tmp_dir
+def scan_selectors(repo_path: str, workers: int = None):
+    """(selectors, sources) for a plain directory; sources maps key -> relative path."""
+    selectors, sources = {}, {}
 
+    files = list_files(repo_path, SCAN_EXTENSIONS)
+    for path, partial in zip(files, scan(extract_selectors_from_path, files, workers)):
+        selectors.update(partial)
+        sources.update(dict.fromkeys(partial, os.path.relpath(path, repo_path)))
 
-def extract_selectors(repo_path: str) -> dict:
-    selectors = {}
+    return selectors, sources
 
-    for root, _, files in os.walk(repo_path):
-        for file in files:
-            if file.endswith((".jsx", ".tsx", ".js", ".ts", ".html")):
-                file_path = os.path.join(root, file)
 
-                with open(file_path, encoding="utf-8", errors="ignore") as f:
-                    content = f.read()
+def extract_selectors_from_path(file_path: str) -> dict:
+    return extract_selectors_from_content(read_text(file_path))
 
-                    extract_from_file(content, selectors)
 
-                    # also detect className selectors
-                    class_matches = re.findall(r'class(Name)?=["\']([^"\']+)["\']', content)
-                    for _, cls in class_matches:
-                        cls_val = cls.split(" ")[0]   # first class only
-                        selectors[f"class:{cls_val}"] = f".{cls_val}"
+def extract_selectors_from_content(content: str) -> dict:
+    selectors = {}
+
+    extract_from_file(content, selectors)
 
-                    # detect button text
-                    btn_texts = re.findall(r'<button[^>]*>([^<]+)</button>', content)
-                    for txt in btn_texts:
-                        cleaned = txt.strip()
-                        if cleaned:
-                            selectors[f"text:{cleaned}"] = f'button:contains("{cleaned}")'
+    # also detect className selectors
+    class_matches = CLASS_PATTERN.findall(content)
+    for _, cls in class_matches:
+        cls_val = cls.split(" ")[0]   # first class only
+        selectors[f"class:{cls_val}"] = f".{cls_val}"
+
+    # detect button text
+    btn_texts = BUTTON_TEXT_PATTERN.findall(content)
+    for txt in btn_texts:
+        cleaned = txt.strip()
+        if cleaned:
+            selectors[f"text:{cleaned}"] = f'button:contains("{cleaned}")'
 
     return selectors
 
 
 def extract_from_file(content: str, selectors: dict):
-    for attr, pattern in SELECTOR_PATTERNS.items():
-        matches = re.findall(pattern, content)
+    for attr, pattern in COMPILED_PATTERNS.items():
+        matches = pattern.findall(content)
         for match in matches:
             css_selector = build_css_selector(attr, match)
             selectors[f"{attr}:{match}"] = css_selector
@@ -93,3 +126,6 @@ def build_css_selector(attr: str, value: str) -> str:
     if attr == "aria-label":
         return f'[aria-label="{value}"]'
     return value
+
+
+index = SelectorIndex(extract_selectors_from_content, SCAN_EXTENSIONS)
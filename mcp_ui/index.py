@@ -0,0 +1,178 @@
+"""
+Persisted, commit-aware selector index.
+
+For every scanned file the index records its blob hash and the selectors it
+contributed. When HEAD moves, only the files in the ``git diff`` between the
+indexed commit and the new one are re-parsed; everything else is served from
+the stored entries.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from git import Repo
+from git.exc import GitCommandError
+
+from mcp_common.gitobjects import (
+    iter_blob_batches, list_blobs, prefetch_blobs, resolve_commit
+)
+from mcp_common.metrics import COUNT_BUCKETS, Counter, Histogram
+from mcp_common.scanner import scan
+
+logger = logging.getLogger(__name__)
+
+INDEX_ROOT = os.getenv(
+    "MCP_INDEX_DIR", os.path.join(tempfile.gettempdir(), "mcp-ui-index")
+)
+INDEX_VERSION = 1
+
+INDEX_LOOKUPS = Counter("ui_index_lookups_total", "Selector index lookups", ("result",))
+INDEX_UPDATE = Histogram("ui_index_update_duration_seconds", "Selector index update latency")
+INDEX_CHANGED_FILES = Histogram(
+    "ui_index_changed_files", "Files re-parsed per selector index update", buckets=COUNT_BUCKETS
+)
+
+
+class SelectorIndex:
+
+    def __init__(self, extract, extensions: tuple, root: str = INDEX_ROOT):
+        """
+        extract: callable(content: str) -> {selector_key: css_selector}
+        extensions: file suffixes to index
+        """
+        self.extract = extract
+        self.extensions = extensions
+        self.root = root
+        self._guard = threading.Lock()
+        self._locks = {}
+        self._states = {}
+        os.makedirs(self.root, exist_ok=True)
+
+    def lookup(self, git_dir: str, ref: str = "HEAD"):
+        """
+        Return (commit, selectors, sources) for ref, updating the index if
+        needed. sources maps each selector key to the file it came from.
+        """
+        key = hashlib.sha1(os.path.abspath(git_dir).encode("utf-8")).hexdigest()
+
+        with Repo(git_dir) as repo, self._lock(key):
+            commit = resolve_commit(repo, ref)
+            state = self._states.get(key) or self._load(key)
+
+            if state["commit"] != commit:
+                INDEX_LOOKUPS.inc(result="update")
+                start = time.perf_counter()
+                self._update(repo, state, commit)
+                self._save(key, state)
+                INDEX_UPDATE.observe(time.perf_counter() - start)
+            else:
+                INDEX_LOOKUPS.inc(result="current")
+
+            self._states[key] = state
+            return commit, state["selectors"], state["sources"]
+
+    # ---------------- Helper Functions ----------------
+
+    def _update(self, repo: Repo, state: dict, commit: str):
+        changes = None
+
+        if state["commit"]:
+            try:
+                changes = self._diff(repo, state["commit"], commit)
+            except GitCommandError:
+                # indexed commit is gone (force push / evicted mirror)
+                logger.info(f"Indexed commit {state['commit']} unavailable, rescanning tree")
+
+        if changes is None:
+            changes = self._tree_changes(repo, commit, state["files"])
+
+        logger.info(
+            f"Updating selector index {state['commit']} -> {commit} "
+            f"({len(changes)} changed files)"
+        )
+
+        INDEX_CHANGED_FILES.observe(len(changes))
+
+        files = state["files"]
+        changed = []
+        for path, blob in changes:
+            if blob is None:
+                files.pop(path, None)
+            else:
+                changed.append((path, blob))
+
+        prefetch_blobs(repo, commit, {blob for _, blob in changed})
+        blob_by_path = dict(changed)
+
+        for batch in iter_blob_batches(repo, changed):
+            results = scan(self.extract, [content for _, content in batch])
+            for (path, _), selectors in zip(batch, results):
+                files[path] = {"blob": blob_by_path[path], "selectors": selectors}
+
+        state["commit"] = commit
+        state["selectors"], state["sources"] = _merge(files)
+
+    def _diff(self, repo: Repo, old: str, new: str) -> list:
+        out = repo.git.diff("--raw", "-z", "--no-renames", "--no-abbrev", old, new)
+        tokens = out.split("\0")
+        changes = []
+
+        # -z --raw output: ":<mode> <mode> <sha> <sha> <status>\0<path>\0"
+        for meta, path in zip(tokens[0::2], tokens[1::2]):
+            if not path.endswith(self.extensions):
+                continue
+            _, new_mode, _, new_sha, status = meta.lstrip(":").split(" ")
+            if status == "D" or new_mode == "160000":
+                changes.append((path, None))
+            else:
+                changes.append((path, new_sha))
+
+        return changes
+
+    def _tree_changes(self, repo: Repo, commit: str, files: dict) -> list:
+        current = list_blobs(repo, commit, self.extensions)
+        changes = [
+            (path, sha) for path, sha in current.items()
+            if files.get(path, {}).get("blob") != sha
+        ]
+        changes.extend((path, None) for path in files if path not in current)
+        return changes
+
+    def _load(self, key: str) -> dict:
+        state = {"commit": None, "files": {}}
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                stored = json.load(f)
+            if stored.get("version") == INDEX_VERSION:
+                state = {"commit": stored["commit"], "files": stored["files"]}
+        except (OSError, ValueError, KeyError):
+            pass
+
+        state["selectors"], state["sources"] = _merge(state["files"])
+        return state
+
+    def _save(self, key: str, state: dict):
+        data = {"version": INDEX_VERSION, "commit": state["commit"], "files": state["files"]}
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".index-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self._path(key))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.json")
+
+    def _lock(self, key: str) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+
+def _merge(files: dict):
+    selectors, sources = {}, {}
+    for path in sorted(files):
+        selectors.update(files[path]["selectors"])
+        sources.update(dict.fromkeys(files[path]["selectors"], path))
+    return selectors, sources
@@ -1,8 +1,10 @@
-import requests
+from orchestrator.ollama import get_client
+from orchestrator.profiles import LLM_MAX_TOKENS, PROSE_STOPS
 
-def call_ollama(prompt, model="deepseek-coder:6.7b"):
-    response = requests.post(
-        "http://localhost:11434/api/generate",
+def call_ollama(prompt, model="deepseek-coder:6.7b", num_predict=LLM_MAX_TOKENS):
+    # shares the orchestrator's pooled, circuit-broken client
+    response = get_client().post(
+        "/api/generate",
         json={
             "model": model,
             "prompt": prompt,
@@ -10,7 +12,8 @@ def call_ollama(prompt, model="deepseek-coder:6.7b"):
             "options": {
                 "temperature": 0.2,
                 "top_p": 0.9,
-                "num_predict": 512
+                "num_predict": num_predict,
+                "stop": list(PROSE_STOPS)
             }
         },
         timeout=300
@@ -1,47 +1,140 @@
-import requests
-import re
+import asyncio
+import httpx
+import os
 import logging
+import threading
 import time
+from mcp_bdd.matcher import compile_steps, gherkin_steps
+from mcp_bdd.scenarios import ScenarioSplitter, merge_step_classes
 from mcp_critic.app import CriticAgent
-from orchestrator.llm import call_llm
+from mcp_critic.repair import SelectorRepairer, selectors_used
+from orchestrator.artifacts import get_store, input_fingerprint, remote_head
+from orchestrator.llm import MODEL, ChatSession, GenerationCancelled
+from orchestrator.logging_setup import log_artifact
+from orchestrator.metrics import (
+    ARTIFACT_LOOKUPS, CRITIC_RETRIES, LLM_QUEUE_SECONDS, MCP_ERRORS, MCP_LATENCY, PIPELINES,
+    PIPELINES_IN_FLIGHT, PROMPT_SELECTOR_COUNT, SELECTOR_COUNT, SELECTOR_REPAIRS, STAGE_LATENCY, VALIDATIONS
+)
+from orchestrator.ollama import get_client
+from orchestrator.profiles import (
+    LLM_MAX_TOKENS, LLM_TOKEN_BUDGET_SCALE, RUNAWAY_LINES, STRUCTURED_REPAIR, GenerationProfile, gherkin_profile,
+    repair_profile, reply_line, selenium_profile
+)
+from orchestrator.retrieval import SELECTOR_TOKEN_BUDGET, SELECTOR_TOP_K, pruning_stats, retriever
 
 logger = logging.getLogger(__name__)
 
+MCP_JIRA_URL = "http://localhost:8002/context"
+MCP_JIRA_BATCH_URL = "http://localhost:8002/context/batch"
+MCP_JIRA_UPDATED_URL = "http://localhost:8002/updated"
+MCP_UI_URL = "http://localhost:8001/context"
+MCP_E2E_URL = "http://localhost:8004/context"
+# metric label per MCP endpoint
+MCP_SERVICES = {
+    MCP_JIRA_URL: "jira", MCP_JIRA_BATCH_URL: "jira", MCP_JIRA_UPDATED_URL: "jira",
+    MCP_UI_URL: "ui", MCP_E2E_URL: "e2e"
+}
+
+# per-call timeouts (seconds)
+MCP_JIRA_TIMEOUT = 30
+MCP_UI_TIMEOUT = 30
+MCP_E2E_TIMEOUT = 30
+
+# concurrent LLM calls across all pipelines, extra calls queue here;
+# defaults to the Ollama pool's capacity (sum of the per-backend caps)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "0")) or get_client().capacity
+llm_slots = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+# best-of-N Selenium sampling: concurrent candidates per story (1 = off);
+# candidate i runs with seed i and a temperature raised by i steps
+SELENIUM_CANDIDATES = int(os.getenv("SELENIUM_CANDIDATES", "1"))
+CANDIDATE_TEMPERATURE = 0.2
+CANDIDATE_TEMPERATURE_STEP = 0.15
+
+# bump whenever a prompt template below changes: it is part of the input
+# fingerprint, so results memoized under the old prompts stop matching
+PROMPT_VERSION = "3"
+
+_http_client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared keep-alive client for all MCP calls."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+        )
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
 
 class TestGenerationAgent:
 
+    def __init__(self, on_event=None):
+        """
+        on_event: optional callable(event: dict) receiving stage events
+        (context, gherkin/selenium tokens, retry, validation) as they are
+        produced. It may be called from LLM worker threads.
+        """
+        self.on_event = on_event
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """Abort the pipeline; a streaming LLM call stops at its next token."""
+        self._cancelled.set()
+
     # ======================================================
     # MAIN ENTRY
     # ======================================================
-    def run(self, payload: dict):
+    async def run(self, payload: dict):
+        with PIPELINES_IN_FLIGHT.track_inprogress():
+            result = await self._run(payload)
+        PIPELINES.inc(status=result["status"])
+        return result
+
+    async def _run(self, payload: dict):
+        start_time = time.time()
         try:
             logger.info("Starting test generation pipeline")
-            logger.debug(f"Payload: {payload}")
-            
+            logger.debug("Payload: %s", payload)
+            use_cache = not payload.get("noCache")
+            candidates = payload.get("candidates") or SELENIUM_CANDIDATES
+
             # ------------------------------
-            # JIRA context
+            # MEMOIZED RESULT (same inputs -> same artifacts)
             # ------------------------------
-            logger.info(f"Fetching JIRA context for: {payload['jiraUrl']}")
-            jira_ctx = self._safe_get(
-                "http://localhost:8002/context",
-                {"jira_url": payload["jiraUrl"]}
-            )
-            logger.info(f"JIRA context retrieved successfully. Story ID: {jira_ctx.get('storyId')}")
-            logger.debug(f"JIRA Context: {jira_ctx}")
+            with STAGE_LATENCY.time(stage="fingerprint"):
+                fingerprint, heads = await self._fingerprint(payload, candidates)
+            if fingerprint and use_cache:
+                memoized = get_store().get(fingerprint)
+                ARTIFACT_LOOKUPS.inc(result="hit" if memoized else "miss")
+                if memoized:
+                    logger.info("Inputs unchanged (fingerprint %s) - returning stored artifacts", fingerprint[:12])
+                    self._emit("memoized", fingerprint=fingerprint)
+                    return memoized
 
             # ------------------------------
-            # UI selectors context
+            # JIRA / UI / (optional) E2E context, fetched concurrently
             # ------------------------------
-            logger.info(f"Fetching UI context from repo: {payload['uiRepo']}")
-            ui_ctx = self._safe_get(
-                "http://localhost:8001/context",
-                {"repo_url": payload["uiRepo"]}
-            )
-            logger.info(f"UI context retrieved successfully")
-            logger.debug(f"UI Context: {ui_ctx}")
+            with STAGE_LATENCY.time(stage="context"):
+                jira_ctx, ui_ctx, e2e_ctx = await self._gather_context(payload)
+            logger.info("JIRA context retrieved successfully. Story ID: %s", jira_ctx.get("storyId"))
+            log_artifact("jira_context", jira_ctx)
+            logger.info("UI context retrieved successfully")
+            log_artifact("ui_context", ui_ctx)
+            if e2e_ctx is not None:
+                log_artifact("e2e_context", e2e_ctx)
 
             ui_elements = ui_ctx.get("elements") or {}
-            logger.info(f"Total UI elements found: {len(ui_elements)}")
+            logger.info("Total UI elements found: %s", len(ui_elements))
+            self._emit("context", storyId=jira_ctx.get("storyId"), selectorCount=len(ui_elements))
 
             # HARD STOP if no selectors
             if not ui_elements:
@@ -51,111 +144,578 @@ class TestGenerationAgent:
                     "message": "UI selectors unavailable. Cannot safely generate test automation."
                 }
 
-            # ------------------------------
-            # (Optional) E2E repo context
-            # ------------------------------
-            if payload.get("e2eRepo"):
-                logger.info(f"Fetching E2E context from repo: {payload['e2eRepo']}")
-                _ = self._safe_get(
-                    "http://localhost:8004/context",
-                    {"repo_url": payload["e2eRepo"]}
-                )
-                logger.info("E2E context retrieved successfully")
-            else:
-                logger.info("No E2E repo provided - skipping")
+            result = await self._generate(jira_ctx, ui_ctx, use_cache, candidates, e2e_ctx)
+            # a push between ls-remote and the scan would file the result
+            # under the wrong revision
+            scanned = {"ui": ui_ctx.get("commit"), "e2e": (e2e_ctx or {}).get("commit")}
+            if fingerprint and scanned == heads:
+                get_store().put(fingerprint, result)
+            elif fingerprint:
+                logger.info("Repos moved while generating (%s -> %s) - result not memoized", heads, scanned)
+            return result
+
+        except Exception as e:
+            elapsed = time.time() - start_time
+            logger.exception("Exception occurred in test generation pipeline: %s", e)
+            logger.error("Pipeline failed after %.2fs", elapsed)
+            return {
+                "status": "ERROR",
+                "message": str(e),
+                "details": f"Check orchestrator.log for detailed error traceback"
+            }
+
+    # ======================================================
+    # BATCH ENTRY (whole sprint)
+    # ======================================================
+    async def run_batch(self, payload: dict):
+        """
+        Generate tests for every URL in payload["jiraUrls"] against one UI/E2E
+        repo. UI and E2E context are fetched once and Jira in bulk; results
+        are yielded as each story completes.
+        """
+        jira_urls = payload["jiraUrls"]
+        use_cache = not payload.get("noCache")
+        candidates = payload.get("candidates") or SELENIUM_CANDIDATES
+        logger.info("Starting batch generation for %s stories", len(jira_urls))
+
+        try:
+            with STAGE_LATENCY.time(stage="context"):
+                jira_results, ui_ctx, e2e_ctx = await self._gather_batch_context(payload)
+        except Exception as e:
+            logger.exception("Batch context retrieval failed: %s", e)
+            for url in jira_urls:
+                yield {"jiraUrl": url, "status": "ERROR", "message": str(e)}
+            return
+
+        if not ui_ctx.get("elements"):
+            logger.error("No UI elements/selectors available - cannot generate tests")
+            for url in jira_urls:
+                yield {
+                    "jiraUrl": url,
+                    "status": "ERROR",
+                    "message": "UI selectors unavailable. Cannot safely generate test automation."
+                }
+            return
+
+        async def generate_story(jira: dict):
+            jira_url = jira.pop("jiraUrl")
+            if "error" in jira:
+                return {"jiraUrl": jira_url, "status": "ERROR", "message": jira["error"]}
+            try:
+                with PIPELINES_IN_FLIGHT.track_inprogress():
+                    result = await self._generate(jira, ui_ctx, use_cache, candidates, e2e_ctx)
+            except Exception as e:
+                logger.exception("Generation failed for %s: %s", jira_url, e)
+                result = {"status": "ERROR", "message": str(e)}
+            PIPELINES.inc(status=result["status"])
+            return {"jiraUrl": jira_url, **result}
+
+        tasks = [asyncio.create_task(generate_story(jira)) for jira in jira_results]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _gather_batch_context(self, payload: dict):
+        calls = [
+            self._safe_post(MCP_JIRA_BATCH_URL, {"jiraUrls": payload["jiraUrls"]}, MCP_JIRA_TIMEOUT),
+            self._safe_get(MCP_UI_URL, {"repo_url": payload["uiRepo"]}, MCP_UI_TIMEOUT),
+        ]
+        if payload.get("e2eRepo"):
+            calls.append(self._safe_get(MCP_E2E_URL, {"repo_url": payload["e2eRepo"]}, MCP_E2E_TIMEOUT))
+
+        tasks = [asyncio.create_task(call) for call in calls]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        e2e_ctx = results[2] if len(results) > 2 else None
+        return results[0]["results"], results[1], e2e_ctx
+
+    # ======================================================
+    # LLM STAGES (per story)
+    # ======================================================
+    async def _generate(self, jira_ctx: dict, ui_ctx: dict, use_cache: bool = True, candidates: int = 1,
+                        e2e_ctx: dict = None):
+        """
+        Gherkin, then Selenium per scenario, for one story. Each scenario's
+        step definitions are generated as soon as the streaming Gherkin
+        completes it, concurrently with the rest, and validated, repaired
+        and retried on their own; the results are merged into one class.
+        With candidates > 1 each scenario samples that many in parallel.
+        Steps already defined in the E2E repo (e2e_ctx) are not regenerated.
+        """
+        # ==================================================
+        # SELECTOR RETRIEVAL (prompt pruning)
+        # ==================================================
+        selected, pruning = retriever.select(jira_ctx, ui_ctx)
+        prompt_ui = {**ui_ctx, "elements": selected}
+        logger.info(
+            "Selector pruning: kept %s/%s selectors (~%s -> ~%s tokens)",
+            pruning["keptSelectors"], pruning["totalSelectors"], pruning["fullTokens"], pruning["prunedTokens"]
+        )
+        SELECTOR_COUNT.observe(pruning["totalSelectors"])
+        PROMPT_SELECTOR_COUNT.observe(pruning["keptSelectors"])
+
+        # one conversation per story: the selector block is prefilled once
+        # and its KV cache reused by every scenario branch and retry
+        session = ChatSession(self._build_context_prompt(prompt_ui))
+        # scenario branches start from the selector block alone, since they
+        # begin before the Gherkin turn is finished
+        base = session.fork()
+
+        matcher = compile_steps(tuple((e2e_ctx or {}).get("existingSteps") or ()))
+        claimed = set()
+        tasks = []
+
+        def schedule(scenario: dict):
+            # runs on the event loop, in stream order
+            _, missing = matcher.split(scenario["steps"])
+            todo = [step for step in missing if step not in claimed]
+            claimed.update(todo)
+            if not todo:
+                logger.info("Scenario %s (%s): every step already implemented", scenario["index"], scenario["name"])
+                self._emit("scenario", scenario=scenario["index"], name=scenario["name"], status="SKIPPED")
+                return
+            logger.info("Scenario %s (%s): generating %s steps", scenario["index"], scenario["name"], len(todo))
+            self._emit("scenario", scenario=scenario["index"], name=scenario["name"], status="GENERATING")
+            profile = selenium_profile(len(todo), len(selected))
+            tasks.append(asyncio.create_task(
+                self._generate_scenario(base, scenario, todo, ui_ctx, use_cache, candidates, profile)
+            ))
+
+        loop = asyncio.get_running_loop()
+        splitter = ScenarioSplitter()
+        gherkin_sink = self._token_sink("gherkin")
+
+        def on_gherkin(token):
+            if gherkin_sink is not None:
+                gherkin_sink(token)
+            elif self._cancelled.is_set():
+                raise GenerationCancelled("Generation cancelled by client")
+            for scenario in splitter.feed(token):
+                loop.call_soon_threadsafe(schedule, scenario)
 
+        try:
             # ==================================================
-            # STEP 1: GHERKIN GENERATION (LLM)
+            # STEP 1: GHERKIN GENERATION (LLM, streamed)
             # ==================================================
             logger.info("STEP 1: Generating Gherkin feature file")
-            gherkin_prompt = self._build_gherkin_prompt(jira_ctx, ui_ctx)
-            logger.debug(f"Gherkin prompt length: {len(gherkin_prompt)} characters")
-            
+            gherkin_prompt = self._build_gherkin_prompt(jira_ctx)
+            logger.debug("Gherkin prompt length: %d characters", len(gherkin_prompt))
+            log_artifact("gherkin_prompt", gherkin_prompt, context=session.messages[0]["content"])
+
             logger.info("  >>> Calling LLM for Gherkin generation...")
             gherkin_start = time.time()
-            gherkin = call_llm(gherkin_prompt)
+            gherkin = await self._call_llm(
+                session, gherkin_prompt, "gherkin", use_cache, on_token=on_gherkin,
+                profile=gherkin_profile(jira_ctx, len(selected))
+            )
             gherkin_elapsed = time.time() - gherkin_start
-            logger.info(f"✓ Gherkin generated in {gherkin_elapsed:.2f}s ({len(gherkin)} characters)")
-            logger.debug(f"Gherkin output:\n{gherkin}")
-            print("\n===== GHERKIN OUTPUT =====\n", gherkin)
+            STAGE_LATENCY.observe(gherkin_elapsed, stage="gherkin")
+            logger.info("✓ Gherkin generated in %.2fs (%s characters)", gherkin_elapsed, len(gherkin))
+            log_artifact("gherkin", gherkin)
 
             # ==================================================
-            # STEP 2: SELENIUM GENERATION (LLM)
+            # STEP 2: SELENIUM GENERATION (LLM, per scenario)
             # ==================================================
-            logger.info("STEP 2: Generating Selenium step definitions")
-            selenium_prompt = self._build_selenium_prompt(gherkin, ui_ctx)
-            logger.debug(f"Selenium prompt length: {len(selenium_prompt)} characters")
-            
-            logger.info("  >>> Calling LLM for Selenium generation (this may take 1-5 minutes)...")
-            logger.info("  >>> Please wait, LLM is processing complex code generation...")
-            selenium_start = time.time()
-            selenium = call_llm(selenium_prompt)
-            selenium_elapsed = time.time() - selenium_start
-            logger.info(f"✓ Selenium generated in {selenium_elapsed:.2f}s ({len(selenium)} characters)")
-            logger.debug(f"Selenium output:\n{selenium}")
-            print("\n===== SELENIUM OUTPUT =====\n", selenium)
+            remaining = splitter.close()
+            if not splitter.count:
+                # no Scenario headers: treat the whole feature as one
+                remaining = [{"index": 0, "keyword": "Feature", "name": jira_ctx.get("storyId") or "feature",
+                              "text": gherkin, "steps": gherkin_steps(gherkin)}]
+            for scenario in remaining:
+                schedule(scenario)
+
+            logger.info("STEP 2: Waiting for Selenium step definitions of %s scenarios", len(tasks))
+            scenarios = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        # ==================================================
+        # STEP REUSE (existing E2E step definitions)
+        # ==================================================
+        steps = gherkin_steps(gherkin)
+        implemented, missing = matcher.split(steps)
+        step_reuse = {"steps": len(steps), "implemented": implemented, "missing": missing}
+        logger.info("Step reuse: %s/%s steps already implemented in the E2E repo", len(implemented), len(steps))
+
+        # ==================================================
+        # STEP 3: MERGE + VALIDATION (whole class)
+        # ==================================================
+        if scenarios:
+            selenium = merge_step_classes([scenario.pop("code") for scenario in scenarios])
+        else:
+            logger.info("STEP 2: Skipped - every step is already implemented")
+            selenium = "// All steps are already implemented in the E2E repo"
+        log_artifact("selenium", selenium)
+
+        logger.info("STEP 3: Validating merged step definitions against UI context")
+        with STAGE_LATENCY.time(stage="validation"):
+            validation = self._validate_against_ui(selenium, ui_ctx)
+        logger.info("Validation result: %s", validation["status"])
+        self._emit("validation", report=validation)
+        logger.debug("Validation details: %s", validation)
+
+        repair = {"repaired": {}, "unresolved": [], "llmFixed": 0}
+        for scenario in scenarios:
+            scenario_repair = scenario.pop("repair")
+            repair["repaired"].update(scenario_repair["repaired"])
+            repair["unresolved"].extend(s for s in scenario_repair["unresolved"] if s not in repair["unresolved"])
+            repair["llmFixed"] += scenario_repair["llmFixed"]
+
+        pruning_stats.record(pruning, validation["status"])
+        VALIDATIONS.inc(status=validation["status"])
+
+        logger.info("Test generation pipeline completed successfully")
+        return {
+            "status": "SUCCESS",
+            "story": jira_ctx.get("storyId"),
+            "generatedArtifacts": {
+                "feature": gherkin.strip(),
+                "steps": selenium.strip()
+            },
+            "validationReport": validation,
+            "selectorRepair": repair,
+            "stepReuse": step_reuse,
+            "scenarios": scenarios,
+            "selectorPruning": pruning,
+            "llmStats": session.stats
+        }
+
+    async def _generate_scenario(self, base: ChatSession, scenario: dict, steps: list, ui_ctx: dict,
+                                 use_cache: bool, candidates: int, profile: GenerationProfile):
+        """
+        Selenium step definitions for one scenario's steps, on a branch of
+        the conversation: validation -> selector repair -> critic retry,
+        all for this scenario alone. profile (token budget for these steps)
+        applies to every attempt. Returns its report with the code.
+        """
+        index = scenario["index"]
+        stage = f"selenium[{index}]"
+        branch = base.fork()
+        prompt = self._build_selenium_prompt(scenario["text"], steps if steps != scenario["steps"] else None)
+        logger.debug("Selenium prompt length for scenario %d: %d characters", index, len(prompt))
+        log_artifact("selenium_prompt", prompt, scenario=scenario["name"])
+
+        selenium_start = time.time()
+        if candidates > 1:
+            code, branch = await self._best_of_n(branch, prompt, ui_ctx, candidates, use_cache, index, profile)
+        else:
+            code = await self._call_llm(
+                branch, prompt, stage, use_cache, on_token=self._token_sink("selenium", scenario=index),
+                profile=profile
+            )
+        selenium_elapsed = time.time() - selenium_start
+        STAGE_LATENCY.observe(selenium_elapsed, stage="selenium")
+        logger.info(
+            "✓ Scenario %s step definitions generated in %.2fs (%s characters)", index, selenium_elapsed, len(code)
+        )
+        log_artifact("selenium_scenario", code, scenario=scenario["name"])
+
+        # ==================================================
+        # VALIDATION (Selectors)
+        # ==================================================
+        validation = self._validate_against_ui(code, ui_ctx)
+        self._emit("validation", report=validation, scenario=index)
+
+        repair = {"repaired": {}, "unresolved": [], "llmFixed": 0}
+        retried = None
+        if validation['status'] == 'FAIL':
+            logger.warning("Scenario %s: invalid selectors %s", index, validation["invalidSelectors"])
 
             # ==================================================
-            # VALIDATION (Selectors)
+            # SELECTOR REPAIR (deterministic, no LLM)
             # ==================================================
-            logger.info("STEP 3: Validating selectors against UI context")
-            validation = self._validate_against_ui(selenium, ui_ctx)
-            logger.info(f"Validation result: {validation['status']}")
-            logger.debug(f"Validation details: {validation}")
-
-            if validation['status'] == 'FAIL':
-                logger.warning(f"Invalid selectors found: {validation['invalidSelectors']}")
-
-            logger.info("STEP 4: Running critic review")
-            critic = CriticAgent()
-            review = critic.review(selenium, validation)
-            logger.info(f"Critic review: can_retry={review.get('can_retry')}")
-            logger.debug(f"Critic review details: {review}")
-
-            # Retry once if critic allows
-            if review.get("can_retry"):
-                logger.info("Retrying Selenium generation with critic feedback")
-                refined_prompt = selenium_prompt + (
-                    "\n\nIMPORTANT: Fix selector issues and regenerate. "
-                    "Do NOT invent selectors."
+            with STAGE_LATENCY.time(stage="repair"):
+                repairer = SelectorRepairer(validation["allowedSelectors"])
+                code, repair["repaired"], repair["unresolved"] = repairer.repair(
+                    code, validation["invalidSelectors"]
                 )
-                selenium = call_llm(refined_prompt)
-                logger.info(f"Refined Selenium generated ({len(selenium)} characters)")
-                logger.debug(f"Refined Selenium output:\n{selenium}")
+            SELECTOR_REPAIRS.inc(len(repair["repaired"]), method="deterministic")
+            if repair["repaired"]:
+                logger.info("Scenario %s: repaired selectors %s", index, repair["repaired"])
+                validation = self._validate_against_ui(code, ui_ctx)
+                self._emit("repair", steps=code, scenario=index, **repair)
+                self._emit("validation", report=validation, scenario=index)
+
+        critic = CriticAgent()
+        with STAGE_LATENCY.time(stage="critic"):
+            review = critic.review(code, validation)
+        logger.debug("Critic review for scenario %d: %s", index, review)
+
+        if review.get("can_retry") and review.get("issues") == ["Invalid selectors used"]:
+            # only selectors are wrong: fix the offending lines, not the whole scenario
+            logger.info("Scenario %s: fixing %s selectors with the LLM", index, len(validation["invalidSelectors"]))
+            CRITIC_RETRIES.inc(kind="snippet")
+            retried = "snippet"
+            code, repair["llmFixed"] = await self._fix_snippets(
+                branch, code, validation["invalidSelectors"], use_cache
+            )
+            SELECTOR_REPAIRS.inc(repair["llmFixed"], method="llm")
+            validation = self._validate_against_ui(code, ui_ctx)
+            self._emit("repair", steps=code, scenario=index, **repair)
+            self._emit("validation", report=validation, scenario=index)
+
+        # Retry this scenario once if critic allows
+        elif review.get("can_retry"):
+            logger.info("Scenario %s: retrying with critic feedback", index)
+            CRITIC_RETRIES.inc(kind="scenario")
+            retried = "scenario"
+            self._emit("retry", issues=review.get("issues"), scenario=index)
+            refined_prompt = (
+                "IMPORTANT: Fix selector issues and regenerate the complete step definitions "
+                "for this scenario. Do NOT invent selectors. "
+                f"These selectors are not in the allowed list: {validation['invalidSelectors']}"
+            )
+            code = await self._call_llm(
+                branch, refined_prompt, stage, use_cache, on_token=self._token_sink("selenium", scenario=index),
+                profile=profile
+            )
+            log_artifact("selenium_retry", code, scenario=scenario["name"])
+            validation = self._validate_against_ui(code, ui_ctx)
+            self._emit("validation", report=validation, scenario=index)
 
-                validation = self._validate_against_ui(selenium, ui_ctx)
-                logger.info(f"Validation after retry: {validation['status']}")
-                logger.debug(f"Validation details after retry: {validation}")
+        logger.info("Scenario %s validation: %s", index, validation["status"])
+        return {
+            "index": index,
+            "name": scenario["name"],
+            "steps": steps,
+            "status": validation["status"],
+            "invalidSelectors": validation["invalidSelectors"],
+            "retried": retried,
+            "repair": repair,
+            "code": code
+        }
 
-            logger.info("Test generation pipeline completed successfully")
-            return {
-                "status": "SUCCESS",
-                "story": jira_ctx.get("storyId"),
-                "generatedArtifacts": {
-                    "feature": gherkin.strip(),
-                    "steps": selenium.strip()
-                },
-                "validationReport": validation
+    async def _best_of_n(self, session: ChatSession, prompt: str, ui_ctx: dict, n: int, use_cache: bool,
+                         scenario: int, profile: GenerationProfile = None):
+        """
+        Sample n Selenium candidates for a scenario concurrently, each on its
+        own branch of the conversation. Candidates are validated and reviewed as they
+        arrive; the first that passes wins and the rest are cancelled, which
+        closes their streams so Ollama stops generating them. If none passes,
+        the one with the fewest invalid selectors is kept.
+        Returns (selenium, winning session branch).
+        """
+        critic = CriticAgent()
+        stop = threading.Event()
+
+        def sink(token):
+            if stop.is_set():
+                raise GenerationCancelled("Candidate no longer needed")
+            if self._cancelled.is_set():
+                raise GenerationCancelled("Generation cancelled by client")
+
+        async def sample(i: int):
+            branch = session.fork()
+            options = {
+                "seed": i,
+                "temperature": round(CANDIDATE_TEMPERATURE + i * CANDIDATE_TEMPERATURE_STEP, 2)
             }
+            text = await self._call_llm(
+                branch, prompt, f"selenium[{scenario}.{i}]", use_cache, options, sink, profile
+            )
+            return i, branch, text
+
+        logger.info("Sampling %s Selenium candidates concurrently for scenario %s", n, scenario)
+        tasks = [asyncio.create_task(sample(i)) for i in range(n)]
+        best, error = None, None
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    i, branch, text = await next_done
+                except Exception as e:
+                    if self._cancelled.is_set():
+                        raise
+                    logger.warning("Selenium candidate failed: %s", e)
+                    error = e
+                    continue
+
+                validation = self._validate_against_ui(text, ui_ctx)
+                review = critic.review(text, validation)
+                self._emit(
+                    "candidate", index=i, scenario=scenario, status=validation["status"], issues=review.get("issues")
+                )
+
+                if not review.get("can_retry"):
+                    logger.info("Candidate %s passed review; cancelling the others", i)
+                    return text, branch
+
+                invalid = len(validation["invalidSelectors"])
+                if best is None or invalid < best[0]:
+                    best = (invalid, text, branch)
+        finally:
+            stop.set()
+            for task in tasks:
+                task.cancel()
+
+        if best is None:
+            raise error
+        logger.info("No candidate passed review; keeping the one with %s invalid selectors", best[0])
+        return best[1], best[2]
+
+    async def _fix_snippets(self, session: ChatSession, code: str, invalid: list, use_cache: bool):
+        """
+        Ask the LLM to rewrite each line that uses an invalid selector.
+        Returns (code, number of lines fixed).
+        """
+        lines = code.split("\n")
+        fixed = 0
+
+        for number, line in enumerate(lines):
+            if not set(selectors_used(line)) & set(invalid):
+                continue
+
+            reply = await self._call_llm(
+                session, self._build_snippet_fix_prompt(line.strip()), "repair", use_cache, profile=repair_profile()
+            )
+            replacement = reply_line(reply)
+            if replacement:
+                indent = line[:len(line) - len(line.lstrip())]
+                lines[number] = indent + replacement
+                fixed += 1
+
+        return "\n".join(lines), fixed
+
+    # ======================================================
+    # STAGE EVENTS
+    # ======================================================
+    def _emit(self, stage: str, **data):
+        if self._cancelled.is_set():
+            raise GenerationCancelled("Generation cancelled by client")
+        if self.on_event:
+            self.on_event({"stage": stage, **data})
+
+    async def _call_llm(self, session: ChatSession, prompt: str, stage: str, use_cache: bool = True,
+                        options: dict = None, on_token=None, profile: GenerationProfile = None) -> str:
+        """
+        Blocking session turn in a worker thread, gated by the shared LLM
+        slots. on_token defaults to streaming the tokens as stage events;
+        profile is the stage's generation profile (see orchestrator.profiles).
+        """
+        if on_token is None:
+            on_token = self._token_sink(stage)
+        queued = time.perf_counter()
+        async with llm_slots:
+            LLM_QUEUE_SECONDS.observe(time.perf_counter() - queued)
+            return await asyncio.to_thread(
+                session.ask, prompt, on_token, use_cache, stage, options, profile
+            )
 
+    def _token_sink(self, stage: str, **data):
+        """Per-token callback for the LLM call, or None to skip streaming."""
+        if self.on_event is None:
+            return None
+        return lambda token: self._emit(stage, token=token, **data)
+
+    # ======================================================
+    # CONTEXT FAN-OUT
+    # ======================================================
+    async def _gather_context(self, payload: dict):
+        """Fetch Jira, UI and (optional) E2E context concurrently."""
+        calls = [
+            ("JIRA", MCP_JIRA_URL, {"jira_url": payload["jiraUrl"]}, MCP_JIRA_TIMEOUT),
+            ("UI", MCP_UI_URL, {"repo_url": payload["uiRepo"]}, MCP_UI_TIMEOUT),
+        ]
+        if payload.get("e2eRepo"):
+            calls.append(("E2E", MCP_E2E_URL, {"repo_url": payload["e2eRepo"]}, MCP_E2E_TIMEOUT))
+        else:
+            logger.info("No E2E repo provided - skipping")
+
+        for name, url, params, _ in calls:
+            logger.info("Fetching %s context from %s with %s", name, url, params)
+
+        tasks = [
+            asyncio.create_task(self._safe_get(url, params, timeout))
+            for _, url, params, timeout in calls
+        ]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            # one failure fails the pipeline; don't leave siblings running
+            for task in tasks:
+                task.cancel()
+            raise
+
+        jira_ctx, ui_ctx = results[0], results[1]
+        e2e_ctx = results[2] if len(results) > 2 else None
+        if e2e_ctx is not None:
+            logger.info("E2E context retrieved successfully")
+        return jira_ctx, ui_ctx, e2e_ctx
+
+    # ======================================================
+    # INPUT FINGERPRINT
+    # ======================================================
+    async def _fingerprint(self, payload: dict, candidates: int):
+        """
+        (fingerprint, heads): hash of every input that determines the result,
+        read without cloning or scanning - Jira "updated", remote HEADs of the
+        UI and E2E repos, model, prompt version and options - and the HEADs
+        it pinned. (None, None) when memoization is off or an input can't be
+        pinned (local repo paths, unreachable remotes).
+        """
+        if get_store() is None or not payload.get("uiRepo"):
+            return None, None
+
+        e2e_repo = payload.get("e2eRepo")
+        try:
+            jira, ui_head, e2e_head = await asyncio.gather(
+                self._safe_get(MCP_JIRA_UPDATED_URL, {"jira_url": payload["jiraUrl"]}, MCP_JIRA_TIMEOUT),
+                remote_head(payload["uiRepo"]),
+                remote_head(e2e_repo) if e2e_repo else asyncio.sleep(0)
+            )
         except Exception as e:
-            elapsed = time.time() - time.time()  # This will show total pipeline time
-            logger.exception(f"Exception occurred in test generation pipeline: {str(e)}")
-            logger.error(f"Pipeline failed after attempting all steps")
-            return {
-                "status": "ERROR",
-                "message": str(e),
-                "details": f"Check orchestrator.log for detailed error traceback"
-            }
+            logger.warning("Could not fingerprint inputs - generating without memoization: %s", e)
+            return None, None
+
+        if not jira.get("updated") or not ui_head or (e2e_repo and not e2e_head):
+            logger.info("Inputs can't be pinned to revisions - generating without memoization")
+            return None, None
+
+        fingerprint = input_fingerprint(
+            jira=[payload["jiraUrl"].strip(), jira["updated"]],
+            ui=[payload["uiRepo"].strip(), ui_head],
+            e2e=[e2e_repo.strip(), e2e_head] if e2e_repo else None,
+            model=MODEL,
+            prompt=PROMPT_VERSION,
+            candidates=candidates,
+            pruning=[SELECTOR_TOKEN_BUDGET, SELECTOR_TOP_K],
+            generation=[LLM_MAX_TOKENS, LLM_TOKEN_BUDGET_SCALE, STRUCTURED_REPAIR, RUNAWAY_LINES]
+        )
+        return fingerprint, {"ui": ui_head, "e2e": e2e_head if e2e_repo else None}
 
     # ======================================================
-    # SAFE HTTP GET
+    # SAFE HTTP GET / POST
     # ======================================================
-    def _safe_get(self, url: str, params: dict):
-        logger.debug(f"Making HTTP GET request to {url} with params: {params}")
+    async def _safe_get(self, url: str, params: dict, timeout: float = 30):
+        logger.debug("Making HTTP GET request to %s with params: %s", url, params)
+        return await self._safe_request("GET", url, timeout, params=params)
+
+    async def _safe_post(self, url: str, body: dict, timeout: float = 30):
+        logger.debug("Making HTTP POST request to %s", url)
+        return await self._safe_request("POST", url, timeout, json=body)
+
+    async def _safe_request(self, method: str, url: str, timeout: float, **kwargs):
+        service = MCP_SERVICES.get(url, url)
+        try:
+            with MCP_LATENCY.time(service=service):
+                return await self._mcp_request(method, url, timeout, **kwargs)
+        except Exception:
+            MCP_ERRORS.inc(service=service)
+            raise
+
+    async def _mcp_request(self, method: str, url: str, timeout: float, **kwargs):
         try:
-            resp = requests.get(url, params=params, timeout=30)
-            logger.debug(f"Response status code: {resp.status_code}")
+            resp = await get_http_client().request(method, url, timeout=timeout, **kwargs)
+            logger.debug("Response status code: %s", resp.status_code)
 
             if resp.status_code != 200:
                 error_msg = f"MCP error at {url} | Status {resp.status_code} | {resp.text}"
@@ -167,21 +727,31 @@ class TestGenerationAgent:
                 logger.error(error_msg)
                 raise Exception(error_msg)
 
-            logger.debug(f"Successfully retrieved response from {url}")
+            logger.debug("Successfully retrieved response from %s", url)
             return resp.json()
-        except requests.exceptions.Timeout:
+        except httpx.TimeoutException:
             error_msg = f"Timeout error connecting to {url}"
             logger.error(error_msg)
             raise Exception(error_msg)
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             error_msg = f"Request error connecting to {url}: {str(e)}"
             logger.error(error_msg)
             raise Exception(error_msg)
 
+    # ======================================================
+    # PROMPT: SHARED CONTEXT (conversation prefix)
+    # ======================================================
+    def _build_context_prompt(self, ui: dict):
+        # identical for every turn of the story, so it goes first
+        return f"""
+ALLOWED UI SELECTORS:
+{ui.get("elements")}
+"""
+
     # ======================================================
     # PROMPT: GHERKIN ONLY
     # ======================================================
-    def _build_gherkin_prompt(self, jira: dict, ui: dict):
+    def _build_gherkin_prompt(self, jira: dict):
         return f"""
 Generate ONLY a Gherkin feature file.
 
@@ -190,39 +760,58 @@ STRICT RULES:
 - No step definitions
 - No explanations
 - Only visible UI actions
-- Every step MUST reference a selector from UI context
+- Every step MUST reference a selector from the ALLOWED UI SELECTORS
 
 JIRA STORY:
 {jira}
 
-ALLOWED UI SELECTORS:
-{ui.get("elements")}
-
 If a selector is missing, SKIP the step.
 """
 
     # ======================================================
     # PROMPT: SELENIUM ONLY
     # ======================================================
-    def _build_selenium_prompt(self, gherkin: str, ui: dict):
-        return f"""
-Generate Selenium Java Step Definitions for the following Gherkin.
+    def _build_selenium_prompt(self, scenario: str, only_steps: list = None):
+        # one scenario per call; the selector block is the shared prefix
+        prompt = f"""
+Generate Selenium Java Step Definitions for this Gherkin scenario:
+
+{scenario}
 
 STRICT RULES:
 - Output ONLY Java code
 - Selenium + Cucumber
 - Use By.cssSelector ONLY
-- Use ONLY selectors from UI context
+- Use ONLY selectors from the ALLOWED UI SELECTORS
 - Do NOT invent selectors
 - If selector missing, add comment:
   // Step skipped — selector not available
+"""
+        if only_steps:
+            # the rest already have step definitions in the E2E repo
+            prompt += "\nThe other steps are ALREADY IMPLEMENTED. Generate step definitions ONLY for:\n"
+            prompt += "\n".join(f"- {step}" for step in only_steps) + "\n"
+        return prompt
 
-Gherkin:
-{gherkin}
+    # ======================================================
+    # PROMPT: SINGLE-LINE SELECTOR FIX
+    # ======================================================
+    def _build_snippet_fix_prompt(self, line: str):
+        prompt = f"""
+This line uses a selector that is NOT in the ALLOWED UI SELECTORS:
+{line}
+
+Rewrite ONLY this line so it uses an allowed selector.
+If no allowed selector fits, output exactly:
+// Step skipped — selector not available
 
-ALLOWED UI SELECTORS:
-{ui.get("elements")}
 """
+        if STRUCTURED_REPAIR:
+            # the reply is constrained to this schema (profiles.REPAIR_FORMAT)
+            prompt += 'Reply as JSON: {"line": "<the corrected line>"}\n'
+        else:
+            prompt += "Output ONLY the corrected line.\n"
+        return prompt
 
     # ======================================================
     # VALIDATION
@@ -230,18 +819,16 @@ ALLOWED UI SELECTORS:
     def _validate_against_ui(self, llm_output: str, ui_ctx: dict):
         logger.debug("Starting selector validation")
         allowed = set(ui_ctx.get("elements", {}).values())
-        logger.debug(f"Allowed selectors count: {len(allowed)}")
+        logger.debug("Allowed selectors count: %d", len(allowed))
 
-        used = set(
-            re.findall(r'By\.cssSelector\("([^"]+)"\)', llm_output)
-        )
-        logger.debug(f"Used selectors count: {len(used)}")
-        logger.debug(f"Used selectors: {used}")
+        used = set(selectors_used(llm_output))
+        logger.debug("Used selectors count: %d", len(used))
+        logger.debug("Used selectors: %s", used)
 
         invalid = list(used - allowed)
         
         if invalid:
-            logger.warning(f"Invalid selectors detected: {invalid}")
+            logger.warning("Invalid selectors detected: %s", invalid)
         else:
             logger.info("All selectors validated successfully")
 
@@ -1,24 +1,28 @@
+import asyncio
+import json
 import logging
 from datetime import datetime
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Dict, Any
+from typing import Dict, Any, List
 
-from orchestrator.agent import TestGenerationAgent
+from orchestrator.agent import TestGenerationAgent, close_http_client
+from orchestrator.artifacts import get_store
+from orchestrator.cache import get_cache
+from orchestrator.coalesce import flights
+from orchestrator.jobs import JobRunner, JobStore
+from orchestrator.logging_setup import RequestIdMiddleware, setup_logging
+from orchestrator.ollama import get_client
+from mcp_common.metrics import install_metrics
+from orchestrator.retrieval import pruning_stats
 
 # ======================================================
 # LOGGING CONFIGURATION
 # ======================================================
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s',
-    handlers=[
-        logging.FileHandler('orchestrator.log'),
-        logging.StreamHandler()
-    ]
-)
+# queued, rotating, JSON-structured; see LOGGING_SETUP.md
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # ======================================================
@@ -26,6 +30,19 @@ logger = logging.getLogger(__name__)
 # ======================================================
 app = FastAPI(title="Agentic AI Test Generator")
 
+job_runner = JobRunner(JobStore())
+
+
+@app.on_event("startup")
+async def startup():
+    await job_runner.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await job_runner.stop()
+    await close_http_client()
+
 # ======================================================
 # CORS (FIXED)
 # ======================================================
@@ -40,8 +57,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
 
+app.add_middleware(RequestIdMiddleware)
+install_metrics(app)
+
 # ======================================================
 # REQUEST MODEL
 # ======================================================
@@ -49,6 +70,16 @@ class GenerateRequest(BaseModel):
     jiraUrl: str
     uiRepo: str = ""
     e2eRepo: str = ""
+    noCache: bool = False  # bypass the LLM response cache and memoized results
+    candidates: int = 0    # concurrent Selenium samples; 0 = SELENIUM_CANDIDATES
+
+
+class BatchGenerateRequest(BaseModel):
+    jiraUrls: List[str]
+    uiRepo: str = ""
+    e2eRepo: str = ""
+    noCache: bool = False
+    candidates: int = 0
 
 # ======================================================
 # HEALTH CHECK
@@ -56,33 +87,161 @@ class GenerateRequest(BaseModel):
 @app.get("/health")
 def health():
     logger.info("Health check request received")
-    return {"status": "UP"}
+    return {"status": "UP", "ollama": get_client().status()}
+
+# ======================================================
+# LLM CACHE STATS
+# ======================================================
+@app.get("/llm/cache")
+def llm_cache_stats():
+    cache = get_cache()
+    return cache.stats() if cache else {"enabled": False}
+
+# ======================================================
+# MEMOIZED ARTIFACT STATS
+# ======================================================
+@app.get("/artifacts")
+def artifact_store_stats():
+    store = get_store()
+    return store.stats() if store else {"enabled": False}
+
+# ======================================================
+# SELECTOR PRUNING STATS
+# ======================================================
+@app.get("/selectors/pruning")
+def selector_pruning_stats():
+    return pruning_stats.snapshot()
 
 # ======================================================
 # GENERATE TEST CASES (FIXED RESPONSE FLUSH)
 # ======================================================
 @app.post("/generate")
-def generate(req: GenerateRequest) -> JSONResponse:
+async def generate(req: GenerateRequest) -> JSONResponse:
     """
     End-to-end generation pipeline:
     Jira → Gherkin (LLM) → Selenium (LLM) → Validation
+
+    Identical requests arriving while one is running share its pipeline.
     """
     logger.info("=" * 80)
-    logger.info(f"NEW TEST GENERATION REQUEST | Timestamp: {datetime.now().isoformat()}")
-    logger.info(f"  JIRA URL: {req.jiraUrl}")
-    logger.info(f"  UI Repo: {req.uiRepo if req.uiRepo else 'NOT PROVIDED'}")
-    logger.info(f"  E2E Repo: {req.e2eRepo if req.e2eRepo else 'NOT PROVIDED'}")
+    logger.info("NEW TEST GENERATION REQUEST | Timestamp: %s", datetime.now().isoformat())
+    logger.info("  JIRA URL: %s", req.jiraUrl)
+    logger.info("  UI Repo: %s", req.uiRepo if req.uiRepo else "NOT PROVIDED")
+    logger.info("  E2E Repo: %s", req.e2eRepo if req.e2eRepo else "NOT PROVIDED")
     logger.info("=" * 80)
 
-    result = TestGenerationAgent().run(req.dict())
+    result = await flights.run(req.dict())
 
-    logger.info(f"Generation completed with status: {result.get('status')}")
+    logger.info("Generation completed with status: %s", result.get("status"))
     if result.get("status") == "ERROR":
-        logger.error(f"Error message: {result.get('message')}")
+        logger.error("Error message: %s", result.get("message"))
 
     # IMPORTANT: force immediate JSON flush to browser
     return JSONResponse(content=result)
 
+# ======================================================
+# GENERATE TEST CASES (SERVER-SENT EVENTS)
+# ======================================================
+@app.post("/generate/stream")
+async def generate_stream(req: GenerateRequest) -> StreamingResponse:
+    """
+    Same pipeline as /generate, streamed as Server-Sent Events:
+    context, gherkin/selenium tokens, retry, validation, then the final result.
+    Disconnecting cancels the pipeline and the in-flight LLM call, unless
+    another request shares the pipeline.
+    """
+    logger.info("NEW STREAMING GENERATION REQUEST | JIRA URL: %s", req.jiraUrl)
+
+    queue = asyncio.Queue()
+    task = asyncio.create_task(flights.run(req.dict(), on_event=queue.put_nowait))
+    task.add_done_callback(lambda _: queue.put_nowait(None))
+
+    async def events():
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                yield _sse(event)
+
+            result = task.result()
+            logger.info("Streaming generation completed with status: %s", result.get("status"))
+            yield _sse({"stage": "result", "result": result})
+        finally:
+            if not task.done():
+                logger.info("Stream client disconnected - leaving generation")
+                task.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# ======================================================
+# ASYNC JOBS
+# ======================================================
+@app.post("/jobs", status_code=202)
+def create_job(req: GenerateRequest):
+    """Queue a generation pipeline and return its job id immediately."""
+    job_id = job_runner.submit(req.dict())
+    logger.info("Queued job %s | JIRA URL: %s", job_id, req.jiraUrl)
+    return {"jobId": job_id, "status": "QUEUED"}
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = job_runner.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str):
+    previous = job_runner.cancel(job_id)
+    if previous is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    logger.info("Cancel requested for job %s (was %s)", job_id, previous)
+    return job_runner.store.get(job_id)
+
+# ======================================================
+# GENERATE TEST CASES FOR A WHOLE SPRINT (SERVER-SENT EVENTS)
+# ======================================================
+@app.post("/generate/batch")
+async def generate_batch(req: BatchGenerateRequest) -> StreamingResponse:
+    """
+    Generate tests for many stories against one UI/E2E repo.
+    Streams one "story" event per Jira URL as it completes, then "done".
+    """
+    logger.info("NEW BATCH GENERATION REQUEST | %s stories | UI Repo: %s", len(req.jiraUrls), req.uiRepo)
+
+    async def events():
+        succeeded = 0
+        results = TestGenerationAgent().run_batch(req.dict())
+        try:
+            async for result in results:
+                if result.get("status") == "SUCCESS":
+                    succeeded += 1
+                logger.info("Batch story %s completed with status: %s", result["jiraUrl"], result.get("status"))
+                yield _sse({"stage": "story", "result": result})
+        finally:
+            await results.aclose()
+
+        logger.info("Batch generation completed: %s/%s succeeded", succeeded, len(req.jiraUrls))
+        yield _sse({"stage": "done", "total": len(req.jiraUrls), "succeeded": succeeded})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _sse(event: dict) -> str:
+    return f"event: {event['stage']}\ndata: {json.dumps(event)}\n\n"
+
 # ======================================================
 # SIMPLE UI (FOR DEMO)
 # ======================================================
@@ -121,7 +280,10 @@ def home():
 <label>E2E Repo (optional)</label>
 <input id="e2eRepo" placeholder="https://github.com/.../tests.git">
 
+<label><input type="checkbox" id="noCache" style="width:auto"> Bypass LLM cache</label>
+
 <button onclick="generate()">Generate Test Cases</button>
+<button onclick="cancelGeneration()">Cancel</button>
 
 <h3>Feature File (Gherkin)</h3>
 <textarea id="feature"></textarea>
@@ -133,36 +295,100 @@ def home():
 <textarea id="validation"></textarea>
 
 <script>
+let controller = null;
+// step definitions stream per scenario, concurrently
+let scenarioSteps = {};
+
+function showScenarioSteps(steps) {
+  steps.value = Object.keys(scenarioSteps).sort((a, b) => a - b)
+    .map(k => scenarioSteps[k]).join("\\n\\n");
+}
+
 async function generate() {
-  document.getElementById("feature").value = "Generating...";
-  document.getElementById("steps").value = "";
-  document.getElementById("validation").value = "";
+  const feature = document.getElementById("feature");
+  const steps = document.getElementById("steps");
+  const validation = document.getElementById("validation");
+
+  feature.value = "Fetching context...";
+  steps.value = "";
+  validation.value = "";
 
   const payload = {
     jiraUrl: document.getElementById("jiraUrl").value,
     uiRepo: document.getElementById("uiRepo").value,
-    e2eRepo: document.getElementById("e2eRepo").value
+    e2eRepo: document.getElementById("e2eRepo").value,
+    noCache: document.getElementById("noCache").checked
   };
 
-  const res = await fetch("/generate", {
+  controller = new AbortController();
+  const res = await fetch("/generate/stream", {
     method: "POST",
     headers: { "Content-Type": "application/json" },
-    body: JSON.stringify(payload)
+    body: JSON.stringify(payload),
+    signal: controller.signal
   });
 
-  const data = await res.json();
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  try {
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
 
-  if (data.generatedArtifacts) {
-    document.getElementById("feature").value =
-      data.generatedArtifacts.feature || "";
+      buffer += decoder.decode(value, { stream: true });
+      const events = buffer.split("\\n\\n");
+      buffer = events.pop();
 
-    document.getElementById("steps").value =
-      data.generatedArtifacts.steps || "";
+      for (const raw of events) {
+        const line = raw.split("\\n").find(l => l.startsWith("data: "));
+        if (line) handleEvent(JSON.parse(line.slice(6)));
+      }
+    }
+  } catch (err) {
+    if (err.name !== "AbortError") throw err;
   }
+}
 
-  if (data.validationReport) {
-    document.getElementById("validation").value =
-      JSON.stringify(data.validationReport, null, 2);
+function cancelGeneration() {
+  if (controller) controller.abort();
+}
+
+function handleEvent(event) {
+  const feature = document.getElementById("feature");
+  const steps = document.getElementById("steps");
+  const validation = document.getElementById("validation");
+
+  if (event.stage === "context") {
+    feature.value = "";
+    scenarioSteps = {};
+  } else if (event.stage === "gherkin") {
+    feature.value += event.token;
+  } else if (event.stage === "selenium") {
+    scenarioSteps[event.scenario] = (scenarioSteps[event.scenario] || "") + event.token;
+    showScenarioSteps(steps);
+  } else if (event.stage === "retry") {
+    scenarioSteps[event.scenario] = "";
+    showScenarioSteps(steps);
+  } else if (event.stage === "repair") {
+    scenarioSteps[event.scenario] = event.steps;
+    showScenarioSteps(steps);
+  } else if (event.stage === "validation") {
+    validation.value = JSON.stringify(event.report, null, 2);
+  } else if (event.stage === "result") {
+    const data = event.result;
+
+    if (data.generatedArtifacts) {
+      feature.value = data.generatedArtifacts.feature || "";
+      steps.value = data.generatedArtifacts.steps || "";
+    }
+
+    if (data.validationReport) {
+      validation.value = JSON.stringify(data.validationReport, null, 2);
+    } else if (data.status === "ERROR") {
+      validation.value = data.message || "Generation failed";
+    }
   }
 }
 </script>
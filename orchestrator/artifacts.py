@@ -0,0 +1,233 @@
+"""
+Memoized pipeline results, keyed by an input fingerprint.
+
+The fingerprint hashes everything that determines a pipeline's output and can
+be read without cloning or scanning: the Jira issue's "updated" timestamp,
+the remote HEAD of the UI and E2E repos (``git ls-remote``), the model, the
+prompt template version and the generation options. A stored result for a
+matching fingerprint is returned as is.
+
+Artifact bodies (feature, steps, validation report) are stored once per
+content hash, so runs that produce identical artifacts share them.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from orchestrator.cache import cache_key
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_STORE_ENABLED = os.getenv("ARTIFACT_STORE_ENABLED", "true").lower() in ("1", "true", "yes")
+ARTIFACT_DB_PATH = os.getenv("ARTIFACT_DB_PATH", "artifacts.sqlite3")
+ARTIFACT_MAX_RUNS = int(os.getenv("ARTIFACT_MAX_RUNS", "5000"))
+# seconds allowed for each ls-remote while fingerprinting
+LS_REMOTE_TIMEOUT = int(os.getenv("LS_REMOTE_TIMEOUT", "10"))
+
+# result fields stored as content-addressed blobs
+ARTIFACTS = ("feature", "steps", "validationReport")
+
+
+def input_fingerprint(**inputs) -> str:
+    return cache_key(**inputs)
+
+
+async def remote_head(repo_url: str):
+    """
+    SHA of repo_url's remote HEAD via ``git ls-remote``, or None. Local paths
+    give None too: their working tree can change without a new commit.
+    """
+    if not repo_url or os.path.exists(repo_url):
+        return None
+
+    try:
+        process = await asyncio.create_subprocess_exec(
+            "git", "ls-remote", repo_url, "HEAD",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env={**os.environ, "GIT_TERMINAL_PROMPT": "0"}
+        )
+    except OSError as e:
+        logger.warning("git ls-remote unavailable: %s", e)
+        return None
+
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), LS_REMOTE_TIMEOUT)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        logger.warning("git ls-remote %s timed out after %ss", repo_url, LS_REMOTE_TIMEOUT)
+        return None
+    except BaseException:
+        process.kill()
+        raise
+
+    if process.returncode != 0:
+        logger.warning("git ls-remote %s failed: %s", repo_url, stderr.decode(errors="replace").strip())
+        return None
+
+    line = stdout.decode().split("\n", 1)[0]
+    return line.split("\t", 1)[0] or None
+
+
+class ArtifactStore:
+    """
+    SQLite store of pipeline results by fingerprint. Each run keeps its
+    result with the ARTIFACTS fields replaced by blob hashes; beyond
+    `max_runs` the least recently used runs and their orphaned blobs go.
+    """
+
+    def __init__(self, path: str = ARTIFACT_DB_PATH, max_runs: int = ARTIFACT_MAX_RUNS):
+        self.path = path
+        self.max_runs = max_runs
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            " hash TEXT PRIMARY KEY,"
+            " content TEXT NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " fingerprint TEXT PRIMARY KEY,"
+            " manifest TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS runs_last_used ON runs(last_used)")
+        self._db.commit()
+
+    def get(self, fingerprint: str):
+        """The stored result for fingerprint, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT manifest, created FROM runs WHERE fingerprint = ?", (fingerprint,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            manifest = json.loads(row[0])
+            result = manifest["result"]
+            for field, digest in manifest["blobs"].items():
+                blob = self._db.execute("SELECT content FROM blobs WHERE hash = ?", (digest,)).fetchone()
+                if blob is None:
+                    logger.warning("Artifact blob %s missing for %s - ignoring the run", digest, fingerprint)
+                    self.misses += 1
+                    return None
+                result = _place(result, field, json.loads(blob[0]))
+
+            self._db.execute(
+                "UPDATE runs SET last_used = ? WHERE fingerprint = ?", (time.time(), fingerprint)
+            )
+            self._db.commit()
+            self.hits += 1
+            return {**result, "memoized": {"fingerprint": fingerprint, "created": row[1]}}
+
+    def put(self, fingerprint: str, result: dict):
+        now = time.time()
+        blobs = {}
+        with self._lock:
+            for field in ARTIFACTS:
+                value = _lookup(result, field)
+                if value is None:
+                    continue
+                content = json.dumps(value, sort_keys=True)
+                digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+                self._db.execute(
+                    "INSERT OR IGNORE INTO blobs (hash, content) VALUES (?, ?)", (digest, content)
+                )
+                blobs[field] = digest
+                result = _place(result, field, None)
+
+            manifest = json.dumps({"result": result, "blobs": blobs})
+            self._db.execute(
+                "INSERT OR REPLACE INTO runs (fingerprint, manifest, created, last_used)"
+                " VALUES (?, ?, ?, ?)",
+                (fingerprint, manifest, now, now)
+            )
+            self._evict()
+            self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            runs = self._db.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+            blobs, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(content)), 0) FROM blobs"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "runs": runs,
+            "blobs": blobs,
+            "blobBytes": size,
+            "maxRuns": self.max_runs,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups, 3) if lookups else None
+        }
+
+    def _evict(self):
+        excess = self._db.execute("SELECT COUNT(*) FROM runs").fetchone()[0] - self.max_runs
+        if excess <= 0:
+            return
+
+        self._db.execute(
+            "DELETE FROM runs WHERE fingerprint IN"
+            " (SELECT fingerprint FROM runs ORDER BY last_used LIMIT ?)", (excess,)
+        )
+        referenced = set()
+        for (manifest,) in self._db.execute("SELECT manifest FROM runs"):
+            referenced.update(json.loads(manifest)["blobs"].values())
+        orphans = [
+            (digest,) for (digest,) in self._db.execute("SELECT hash FROM blobs")
+            if digest not in referenced
+        ]
+        self._db.executemany("DELETE FROM blobs WHERE hash = ?", orphans)
+        logger.info("Artifact store evicted %s runs and %s blobs", excess, len(orphans))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """The process-wide artifact store, or None when disabled."""
+    global _store
+    if not ARTIFACT_STORE_ENABLED:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore()
+        return _store
+
+
+# ---------------- Helper Functions ----------------
+
+def _lookup(result: dict, field: str):
+    # feature and steps live under generatedArtifacts
+    if field in ("feature", "steps"):
+        return (result.get("generatedArtifacts") or {}).get(field)
+    return result.get(field)
+
+
+def _place(result: dict, field: str, value) -> dict:
+    """Copy of result with field set to value (None removes it)."""
+    if field in ("feature", "steps"):
+        artifacts = {k: v for k, v in (result.get("generatedArtifacts") or {}).items() if k != field}
+        if value is not None:
+            artifacts[field] = value
+        return {**result, "generatedArtifacts": artifacts}
+
+    result = {k: v for k, v in result.items() if k != field}
+    if value is not None:
+        result[field] = value
+    return result
@@ -0,0 +1,117 @@
+"""
+Coalescing of identical in-flight generation requests.
+
+Requests for the same story and repos (see pipeline_key) that arrive while a
+pipeline for them is running attach to that pipeline instead of starting
+another: they receive its stage events (replayed from the start) and its
+result. The pipeline is cancelled only when every attached request has gone.
+"""
+import asyncio
+import logging
+import os
+from urllib.parse import urlsplit, urlunsplit
+
+from mcp_common.singleflight import COALESCED
+from orchestrator.agent import SELENIUM_CANDIDATES, TestGenerationAgent
+from orchestrator.llm import MODEL
+
+logger = logging.getLogger(__name__)
+
+
+def pipeline_key(payload: dict) -> tuple:
+    """
+    Normalized (jiraUrl, uiRepo, e2eRepo, model) for payload, plus the
+    options that change the output (candidates, cache bypass).
+    """
+    return (
+        _normalize(payload.get("jiraUrl"), strip_query=True),
+        _normalize(payload.get("uiRepo")),
+        _normalize(payload.get("e2eRepo")),
+        MODEL,
+        payload.get("candidates") or SELENIUM_CANDIDATES,
+        bool(payload.get("noCache")),
+    )
+
+
+class _Flight:
+
+    def __init__(self, payload: dict):
+        self.loop = asyncio.get_running_loop()
+        self.events = []
+        self.listeners = []
+        self.waiters = 0
+        self.agent = TestGenerationAgent(on_event=self._emit)
+        self.task = asyncio.create_task(self.agent.run(payload))
+
+    def _emit(self, event: dict):
+        # called from LLM worker threads
+        self.loop.call_soon_threadsafe(self._dispatch, event)
+
+    def _dispatch(self, event: dict):
+        self.events.append(event)
+        for listener in list(self.listeners):
+            listener(event)
+
+    async def join(self, on_event=None) -> dict:
+        if on_event is not None:
+            for event in self.events:
+                on_event(event)
+            self.listeners.append(on_event)
+
+        self.waiters += 1
+        try:
+            return await asyncio.shield(self.task)
+        finally:
+            self.waiters -= 1
+            if on_event is not None:
+                self.listeners.remove(on_event)
+            if not self.waiters and not self.task.done():
+                logger.info("All requests for the pipeline are gone - cancelling it")
+                self.agent.cancel()
+                self.task.cancel()
+
+
+class PipelineFlights:
+
+    def __init__(self):
+        self._flights = {}
+
+    async def run(self, payload: dict, on_event=None) -> dict:
+        """
+        Result of the pipeline for payload. on_event, if given, receives the
+        pipeline's stage events on the event loop thread.
+        """
+        key = pipeline_key(payload)
+        flight = self._flights.get(key)
+
+        if flight is None:
+            flight = self._flights[key] = _Flight(payload)
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+        else:
+            logger.info("Joining in-flight pipeline for %s", payload.get("jiraUrl"))
+            COALESCED.inc(flight="generate")
+
+        return await flight.join(on_event)
+
+    def _forget(self, key: tuple, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+
+def _normalize(location: str, strip_query: bool = False):
+    if not location:
+        return None
+
+    location = location.strip()
+    parts = urlsplit(location)
+    if not parts.scheme or not parts.netloc:
+        return os.path.normpath(location)
+
+    path = parts.path.rstrip("/")
+    if path.endswith(".git"):
+        path = path[:-4]
+    query = "" if strip_query else parts.query
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ""))
+
+
+flights = PipelineFlights()
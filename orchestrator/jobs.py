@@ -0,0 +1,234 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from orchestrator.agent import TestGenerationAgent
+from orchestrator.logging_setup import new_request_id
+
+logger = logging.getLogger(__name__)
+
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL = 5  # seconds; submissions also wake workers directly
+
+QUEUED = "QUEUED"
+RUNNING = "RUNNING"
+SUCCESS = "SUCCESS"
+ERROR = "ERROR"
+CANCELLED = "CANCELLED"
+
+
+class JobStore:
+    """Durable job queue and result store in a local SQLite file."""
+
+    def __init__(self, path: str = JOB_DB_PATH):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " stage TEXT,"
+            " progress TEXT NOT NULL DEFAULT '[]',"
+            " result TEXT,"
+            " created REAL NOT NULL,"
+            " started REAL,"
+            " finished REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs(status, created)")
+        self._db.commit()
+
+    def submit(self, payload: dict) -> str:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, status, payload, created) VALUES (?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(payload), time.time())
+            )
+            self._db.commit()
+        return job_id
+
+    def claim_next(self):
+        """Atomically move the oldest queued job to RUNNING and return it."""
+        with self._lock:
+            row = self._db.execute(
+                "UPDATE jobs SET status = ?, started = ?, stage = NULL, progress = '[]'"
+                " WHERE id = (SELECT id FROM jobs WHERE status = ? ORDER BY created LIMIT 1)"
+                " RETURNING id, payload",
+                (RUNNING, time.time(), QUEUED)
+            ).fetchone()
+            self._db.commit()
+        return (row["id"], json.loads(row["payload"])) if row else None
+
+    def record_stage(self, job_id: str, stage: str):
+        with self._lock:
+            row = self._db.execute("SELECT progress FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            progress = json.loads(row["progress"])
+            progress.append({"stage": stage, "at": time.time()})
+            self._db.execute(
+                "UPDATE jobs SET stage = ?, progress = ? WHERE id = ?",
+                (stage, json.dumps(progress), job_id)
+            )
+            self._db.commit()
+
+    def finish(self, job_id: str, status: str, result: dict = None):
+        with self._lock:
+            # a job cancelled while running keeps its CANCELLED status
+            self._db.execute(
+                "UPDATE jobs SET status = ?, result = ?, finished = ? WHERE id = ? AND status = ?",
+                (status, json.dumps(result) if result is not None else None, time.time(), job_id, RUNNING)
+            )
+            self._db.commit()
+
+    def cancel(self, job_id: str):
+        """Mark a queued or running job CANCELLED; returns its previous status."""
+        with self._lock:
+            row = self._db.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            if row["status"] in (QUEUED, RUNNING):
+                self._db.execute(
+                    "UPDATE jobs SET status = ?, finished = ? WHERE id = ?",
+                    (CANCELLED, time.time(), job_id)
+                )
+                self._db.commit()
+            return row["status"]
+
+    def requeue_running(self, job_ids=None) -> int:
+        """Return RUNNING jobs (all, or job_ids) to the queue, e.g. after a restart."""
+        with self._lock:
+            if job_ids is None:
+                cursor = self._db.execute(
+                    "UPDATE jobs SET status = ?, started = NULL WHERE status = ?", (QUEUED, RUNNING)
+                )
+            else:
+                cursor = self._db.executemany(
+                    "UPDATE jobs SET status = ?, started = NULL WHERE id = ? AND status = ?",
+                    [(QUEUED, job_id, RUNNING) for job_id in job_ids]
+                )
+            self._db.commit()
+            return cursor.rowcount
+
+    def get(self, job_id: str):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "jobId": row["id"],
+            "status": row["status"],
+            "stage": row["stage"],
+            "progress": json.loads(row["progress"]),
+            "createdAt": row["created"],
+            "startedAt": row["started"],
+            "finishedAt": row["finished"],
+            "result": json.loads(row["result"]) if row["result"] else None
+        }
+
+
+class JobRunner:
+    """
+    Pool of asyncio workers draining the JobStore, one pipeline each.
+
+    submit() and cancel() may be called from any thread (FastAPI runs sync
+    routes in its threadpool); they reach the event loop's objects through
+    call_soon_threadsafe.
+    """
+
+    def __init__(self, store: JobStore, workers: int = JOB_WORKERS):
+        self.store = store
+        self.workers = workers
+        self._loop = None
+        self._wakeup = None
+        self._tasks = []
+        self._running = {}  # job_id -> (agent, task)
+        self._stopping = False
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        requeued = self.store.requeue_running()
+        if requeued:
+            logger.info("Requeued %s jobs interrupted by a restart", requeued)
+        self._tasks = [
+            asyncio.create_task(self._worker(n)) for n in range(self.workers)
+        ]
+        logger.info("Job runner started with %s workers", self.workers)
+
+    async def stop(self):
+        self._stopping = True
+        interrupted = list(self._running)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        # unfinished pipelines resume on the next start
+        self.store.requeue_running(interrupted)
+
+    def submit(self, payload: dict) -> str:
+        job_id = self.store.submit(payload)
+        if self._wakeup:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return job_id
+
+    def cancel(self, job_id: str):
+        previous = self.store.cancel(job_id)
+        running = self._running.get(job_id)
+        if previous == RUNNING and running is not None:
+            agent, task = running
+            agent.cancel()
+            self._loop.call_soon_threadsafe(task.cancel)
+        return previous
+
+    async def _worker(self, n: int):
+        while True:
+            claimed = self.store.claim_next()
+            if claimed is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            job_id, payload = claimed
+            logger.info("Worker %s picked up job %s", n, job_id)
+            await self._run_job(job_id, payload)
+
+    async def _run_job(self, job_id: str, payload: dict):
+        seen = set()
+
+        def on_event(event: dict):
+            # token events arrive per chunk and, with scenarios generated
+            # alongside the Gherkin, interleave; record each stage once
+            if event["stage"] not in seen:
+                seen.add(event["stage"])
+                self.store.record_stage(job_id, event["stage"])
+
+        # log lines of the pipeline carry the job id
+        new_request_id(job_id)
+        agent = TestGenerationAgent(on_event=on_event)
+        task = asyncio.create_task(agent.run(payload))
+        self._running[job_id] = (agent, task)
+
+        try:
+            result = await task
+            status = SUCCESS if result.get("status") == "SUCCESS" else ERROR
+            self.store.finish(job_id, status, result)
+            logger.info("Job %s finished with status %s", job_id, status)
+        except asyncio.CancelledError:
+            if self._stopping:
+                raise
+            # cancelled through DELETE /jobs/{id}; keep the worker alive
+            logger.info("Job %s cancelled", job_id)
+        finally:
+            self._running.pop(job_id, None)
@@ -1,12 +1,25 @@
 import requests
 import json
 import logging
+import copy
+import os
 import time
+from contextlib import closing
+
+from orchestrator.cache import cache_key, get_cache
+from orchestrator.logging_setup import log_artifact
+from orchestrator.metrics import (
+    LLM_CACHE, LLM_CUTOFFS, LLM_ERRORS, LLM_EVAL_SECONDS, LLM_EVAL_TOKENS, LLM_PROMPT_EVAL_SECONDS,
+    LLM_PROMPT_TOKENS
+)
+from orchestrator.ollama import get_client
+from orchestrator.profiles import LLM_MAX_TOKENS, GenerationProfile
 
 logger = logging.getLogger(__name__)
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
 MODEL = "deepseek-coder:6.7b"
+# keep the model (and its KV cache) loaded between the calls of a pipeline
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "10m")
 
 SYSTEM_PROMPT = (
     "You are a senior QA automation engineer. "
@@ -16,50 +29,147 @@ SYSTEM_PROMPT = (
     "If something is missing, you explicitly skip it."
 )
 
-def call_llm(prompt: str) -> str:
-    logger.info(f"Calling LLM (Model: {MODEL})")
-    logger.debug(f"Prompt length: {len(prompt)} characters")
-    
-    # Check Ollama connectivity first
-    logger.debug(f"Verifying Ollama connectivity at {OLLAMA_URL}")
+
+class GenerationCancelled(Exception):
+    """Raised by an on_token callback to abort a streaming generation."""
+
+
+def chat_llm(messages: list, on_token=None, use_cache: bool = True, options: dict = None,
+             profile: GenerationProfile = None):
+    """
+    Run a /api/chat conversation and return (reply, stats).
+
+    stats carries Ollama's prompt_eval_count / eval_count and durations for
+    the call, or {"cached": True} for a response cache hit.
+
+    If on_token is given, the response is streamed and on_token(token) is
+    called for each chunk as it arrives. An exception raised by on_token
+    aborts the generation.
+
+    profile sets the stage's token budget, stop sequences and output
+    format; its reply guard streams the response too and may end it early.
+    Without one, the call is only capped at LLM_MAX_TOKENS. options
+    override the default sampling options (e.g. seed, temperature) and the
+    profile's.
+
+    Responses are cached by model, messages, options and format;
+    use_cache=False bypasses the lookup (the fresh result is still stored).
+    """
+    payload = _apply_profile(_build_chat_payload(messages, stream=False), profile)
+    payload["options"].update(options or {})
+    key = cache_key(
+        model=payload["model"], messages=messages, options=payload["options"], format=payload.get("format")
+    )
+    return _cached(key, use_cache, on_token, lambda: _generate("/api/chat", payload, on_token, _guard(profile)))
+
+
+class ChatSession:
+    """
+    One conversation per pipeline. The system prompt and the shared context
+    (the selector list) open the conversation and never change, so Ollama
+    prefills them once and reuses their KV cache for every later turn.
+    """
+
+    def __init__(self, context: str):
+        self.messages = [{"role": "system", "content": f"{SYSTEM_PROMPT}\n\n{context}"}]
+        self.stats = []
+
+    def ask(self, prompt: str, on_token=None, use_cache: bool = True, stage: str = None,
+            options: dict = None, profile: GenerationProfile = None) -> str:
+        messages = self.messages + [{"role": "user", "content": prompt}]
+        reply, stats = chat_llm(messages, on_token, use_cache, options, profile)
+        _observe(stage or "chat", stats)
+        self.messages = messages + [{"role": "assistant", "content": reply}]
+        self.stats.append({"stage": stage, **stats})
+        return reply
+
+    def fork(self) -> "ChatSession":
+        """A branch of the conversation so far; its calls are recorded in self.stats too."""
+        branch = copy.copy(self)
+        branch.messages = list(self.messages)
+        return branch
+
+
+def _cached(key: str, use_cache: bool, on_token, generate):
+    cache = get_cache()
+
+    if cache is not None and use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            logger.info("LLM cache hit (%s characters)", len(cached))
+            LLM_CACHE.inc(result="hit")
+            if on_token is not None:
+                on_token(cached)
+            return cached, {"cached": True}
+
+    if cache is not None and use_cache:
+        LLM_CACHE.inc(result="miss")
+
     try:
-        health_response = requests.get("http://localhost:11434/api/tags", timeout=5)
-        if health_response.status_code != 200:
-            error_msg = f"Ollama health check failed with status {health_response.status_code}"
+        result, stats = generate()
+    except GenerationCancelled:
+        raise
+    except Exception:
+        LLM_ERRORS.inc()
+        raise
+
+    if cache is not None and _complete(stats):
+        cache.put(key, result)
+    return result, stats
+
+
+def _complete(stats: dict) -> bool:
+    """
+    Whether a reply is whole and safe to cache: not truncated by its token
+    budget, and if the guard ended it, only at a closed code block.
+    """
+    if stats.get("doneReason") == "length":
+        return False
+    return stats.get("cutOff") in (None, "fence")
+
+
+def _generate(path: str, payload: dict, on_token=None, guard=None):
+    if on_token is not None or guard is not None:
+        tokens = []
+        stats = {}
+        payload = {**payload, "stream": True}
+        with closing(_stream(path, payload, stats)) as stream:
+            for token in stream:
+                if on_token is not None:
+                    on_token(token)
+                tokens.append(token)
+                if guard is not None and guard.feed(token):
+                    # closing the stream makes Ollama stop generating
+                    logger.info("LLM reply cut off (%s) after %s chunks", guard.reason, len(tokens))
+                    stats["cutOff"] = guard.reason
+                    break
+
+        result = (guard.text() if stats.get("cutOff") else "".join(tokens)).strip()
+        if not result:
+            error_msg = "LLM returned empty response"
             logger.error(error_msg)
             raise Exception(error_msg)
-        logger.debug("Ollama connectivity verified")
-    except Exception as e:
-        error_msg = f"Failed to connect to Ollama at {OLLAMA_URL}: {str(e)}"
-        logger.error(error_msg)
-        raise Exception(error_msg)
-    
-    payload = {
-        "model": MODEL,
-        "prompt": f"{SYSTEM_PROMPT}\n\n{prompt}",
-        "stream": False,
-        "options": {
-            "temperature": 0.2,
-            "top_p": 0.9
-        }
-    }
+        log_artifact("llm_response", result, path=path)
+        return result, stats
+
+    logger.info("Calling LLM (Model: %s)", MODEL)
+    logger.debug("Prompt length: %d characters", _prompt_size(payload))
     
-    logger.debug(f"Sending request to {OLLAMA_URL}")
-    logger.debug(f"Total prompt size: {len(payload['prompt'])} characters")
+    logger.debug("Sending request to %s on the Ollama pool", path)
     
     start_time = time.time()
     
     try:
         logger.info("Waiting for LLM response (this may take a while for complex prompts)...")
-        response = requests.post(
-            OLLAMA_URL,
+        response = get_client().post(
+            path,
             json=payload,
             timeout=600  # Increased to 10 minutes for complex Selenium generation
         )
         
         elapsed_time = time.time() - start_time
-        logger.debug(f"LLM response received in {elapsed_time:.2f} seconds")
-        logger.debug(f"LLM response status code: {response.status_code}")
+        logger.debug("LLM response received in %.2f seconds", elapsed_time)
+        logger.debug("LLM response status code: %s", response.status_code)
 
         if response.status_code != 200:
             error_msg = f"Ollama LLM error: Status {response.status_code} | {response.text}"
@@ -67,17 +177,19 @@ def call_llm(prompt: str) -> str:
             raise Exception(error_msg)
 
         data = response.json()
-        result = data.get("response", "").strip()
+        result = _chunk_text(data).strip()
         
         if not result:
             error_msg = "LLM returned empty response"
             logger.error(error_msg)
             raise Exception(error_msg)
         
-        logger.info(f"LLM response received successfully ({len(result)} characters in {elapsed_time:.2f}s)")
-        logger.debug(f"Full LLM response:\n{result}")
+        stats = _eval_stats(data)
+        logger.info("LLM response received successfully (%s characters in %.2fs)", len(result), elapsed_time)
+        logger.info("LLM eval stats: %s", stats)
+        log_artifact("llm_response", result, path=path)
         
-        return result
+        return result, stats
         
     except requests.exceptions.Timeout:
         elapsed_time = time.time() - start_time
@@ -85,7 +197,7 @@ def call_llm(prompt: str) -> str:
         logger.error(error_msg)
         raise Exception(error_msg)
     except requests.exceptions.ConnectionError as e:
-        error_msg = f"Connection error to Ollama at {OLLAMA_URL}: {str(e)}"
+        error_msg = f"Connection error to Ollama ({path}): {str(e)}"
         logger.error(error_msg)
         raise Exception(error_msg)
     except requests.exceptions.RequestException as e:
@@ -101,3 +213,121 @@ def call_llm(prompt: str) -> str:
         error_msg = f"Unexpected error in LLM call after {elapsed_time:.2f}s: {str(e)}"
         logger.error(error_msg)
         raise
+
+
+def _stream(path: str, payload: dict, stats: dict = None):
+    """NDJSON token stream for /api/chat; fills stats when done."""
+    logger.info("Streaming LLM response (Model: %s)", MODEL)
+    logger.debug("Prompt length: %d characters", _prompt_size(payload))
+
+    start_time = time.time()
+
+    try:
+        with get_client().post(path, json=payload, timeout=600, stream=True) as response:
+            if response.status_code != 200:
+                error_msg = f"Ollama LLM error: Status {response.status_code} | {response.text}"
+                logger.error(error_msg)
+                raise Exception(error_msg)
+
+            for line in response.iter_lines():
+                if not line:
+                    continue
+
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    error_msg = f"Ollama LLM error: {chunk['error']}"
+                    logger.error(error_msg)
+                    raise Exception(error_msg)
+
+                token = _chunk_text(chunk)
+                if token:
+                    yield token
+
+                if chunk.get("done"):
+                    if stats is not None:
+                        stats.update(_eval_stats(chunk))
+                    break
+
+        logger.info("LLM stream completed in %.2fs", time.time() - start_time)
+        if stats:
+            logger.info("LLM eval stats: %s", stats)
+
+    except requests.exceptions.Timeout:
+        error_msg = "Timeout error: no LLM output for 600 seconds"
+        logger.error(error_msg)
+        raise Exception(error_msg)
+    except requests.exceptions.RequestException as e:
+        error_msg = f"Connection error to Ollama ({path}): {str(e)}"
+        logger.error(error_msg)
+        raise Exception(error_msg)
+    except json.JSONDecodeError as e:
+        error_msg = f"Failed to parse LLM stream chunk: {str(e)}"
+        logger.error(error_msg)
+        raise Exception(error_msg)
+
+
+def _chunk_text(chunk: dict) -> str:
+    # /api/generate puts text in "response", /api/chat in "message.content"
+    if "message" in chunk:
+        return chunk["message"].get("content", "")
+    return chunk.get("response", "")
+
+
+def _observe(stage: str, stats: dict):
+    """Record one call's Ollama eval stats; cache hits have none."""
+    stage = stage.split("[")[0]  # "selenium[2]" -> "selenium"
+    if stats.get("cutOff"):
+        LLM_CUTOFFS.inc(stage=stage, reason=stats["cutOff"])
+    elif stats.get("doneReason") == "length":
+        logger.warning("LLM reply for %s hit its token budget and is truncated", stage)
+        LLM_CUTOFFS.inc(stage=stage, reason="length")
+
+    if stats.get("cached") or "evalCount" not in stats:
+        return
+    LLM_PROMPT_TOKENS.observe(stats["promptEvalCount"], stage=stage)
+    LLM_EVAL_TOKENS.observe(stats["evalCount"], stage=stage)
+    LLM_PROMPT_EVAL_SECONDS.observe(stats["promptEvalMs"] / 1000, stage=stage)
+    LLM_EVAL_SECONDS.observe(stats["evalMs"] / 1000, stage=stage)
+
+
+def _eval_stats(data: dict) -> dict:
+    """Ollama's token counts, with durations converted from ns to ms."""
+    return {
+        "promptEvalCount": data.get("prompt_eval_count", 0),
+        "promptEvalMs": round(data.get("prompt_eval_duration", 0) / 1e6, 1),
+        "evalCount": data.get("eval_count", 0),
+        "evalMs": round(data.get("eval_duration", 0) / 1e6, 1),
+        "totalMs": round(data.get("total_duration", 0) / 1e6, 1),
+        "doneReason": data.get("done_reason")
+    }
+
+
+def _prompt_size(payload: dict) -> int:
+    return sum(len(m["content"]) for m in payload["messages"])
+
+
+def _apply_profile(payload: dict, profile: GenerationProfile) -> dict:
+    if profile is not None:
+        payload["options"].update(profile.options())
+        if profile.output_format is not None:
+            payload["format"] = profile.output_format
+    return payload
+
+
+def _guard(profile: GenerationProfile):
+    # a fresh guard per attempt; it keeps the reply read so far
+    return profile.guard() if profile is not None else None
+
+
+def _build_chat_payload(messages: list, stream: bool) -> dict:
+    return {
+        "model": MODEL,
+        "messages": messages,
+        "stream": stream,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+        "options": {
+            "temperature": 0.2,
+            "top_p": 0.9,
+            "num_predict": LLM_MAX_TOKENS
+        }
+    }
@@ -0,0 +1,168 @@
+"""
+Non-blocking logging for the orchestrator.
+
+Request threads only enqueue records; a QueueListener thread formats them and
+writes the rotating log file and the console. Every record carries the id of
+the request (or job) it belongs to. Large payloads - prompts, LLM outputs,
+context dicts - go through log_artifact() to a separate, sampled JSONL sink
+instead of the main log.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import uuid
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.getenv("LOG_FILE", "orchestrator.log")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(50 * 1024 ** 2)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # "json" or "text" for the log file
+
+# artifact sink: disabled unless a file is configured
+ARTIFACT_LOG_FILE = os.getenv("ARTIFACT_LOG_FILE", "")
+ARTIFACT_SAMPLE_RATE = float(os.getenv("ARTIFACT_SAMPLE_RATE", "0.1"))  # fraction of requests
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - [%(request_id)s] - %(message)s"
+
+request_id = contextvars.ContextVar("request_id", default="-")
+_sampled = contextvars.ContextVar("artifact_sampled", default=None)
+
+artifact_logger = logging.getLogger("orchestrator.artifacts")
+artifact_logger.propagate = False
+
+_listeners = []
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps records with the current request id (runs on the caller's thread)."""
+
+    def filter(self, record):
+        record.request_id = request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+
+    def format(self, record):
+        data = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "requestId": getattr(record, "request_id", "-"),
+            "source": f"{record.filename}:{record.lineno}",
+            "message": record.getMessage()
+        }
+        artifact = getattr(record, "artifact", None)
+        if artifact is not None:
+            data["artifact"] = artifact
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+def new_request_id(value: str = None) -> str:
+    """Bind a request id to the current context (and the tasks/threads it starts)."""
+    value = value or uuid.uuid4().hex[:12]
+    request_id.set(value)
+    # decided once per request, so a sampled request keeps all its artifacts
+    _sampled.set(random.random() < ARTIFACT_SAMPLE_RATE)
+    return value
+
+
+def log_artifact(kind: str, content, **meta):
+    """
+    Record a large payload (prompt, LLM output, context) in the artifact
+    sink if the current request is sampled. A no-op when the sink is disabled.
+    """
+    if not ARTIFACT_LOG_FILE:
+        return
+
+    sampled = _sampled.get()
+    if sampled is None:
+        sampled = random.random() < ARTIFACT_SAMPLE_RATE
+    if not sampled:
+        return
+
+    artifact_logger.info(kind, extra={"artifact": {"kind": kind, "content": content, **meta}})
+
+
+def setup_logging():
+    """Route all logging through a queue to background file/console writers."""
+    if _listeners:
+        return
+
+    if LOG_FORMAT == "json":
+        file_formatter = JsonFormatter()
+    else:
+        file_formatter = logging.Formatter(TEXT_FORMAT)
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+    )
+    file_handler.setFormatter(file_formatter)
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    root.handlers = [_queue_handler([file_handler, console_handler])]
+
+    if ARTIFACT_LOG_FILE:
+        artifact_handler = logging.handlers.RotatingFileHandler(
+            ARTIFACT_LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+        )
+        artifact_handler.setFormatter(JsonFormatter())
+        artifact_logger.setLevel(logging.INFO)
+        artifact_logger.handlers = [_queue_handler([artifact_handler])]
+
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Flush queued records and stop the writer threads."""
+    while _listeners:
+        _listeners.pop().stop()
+
+
+def _queue_handler(handlers: list) -> logging.Handler:
+    records = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
+
+    handler = logging.handlers.QueueHandler(records)
+    handler.addFilter(RequestIdFilter())
+    return handler
+
+
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware binding a request id (X-Request-ID, or a new one) to each
+    HTTP request and echoing it in the response headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")
+        value = new_request_id(incoming or None)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-request-id", value.encode("latin-1"))
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_id)
@@ -0,0 +1,47 @@
+"""Orchestrator metrics, served on GET /metrics (see mcp_common.metrics)."""
+from mcp_common.metrics import COUNT_BUCKETS, Counter, Gauge, Histogram
+
+PIPELINES_IN_FLIGHT = Gauge("testgen_pipelines_in_flight", "Generation pipelines currently running")
+PIPELINES = Counter("testgen_pipelines_total", "Finished generation pipelines", ("status",))
+
+STAGE_LATENCY = Histogram(
+    "testgen_stage_duration_seconds",
+    "Pipeline stage latency (fingerprint, context, gherkin, selenium, validation, repair)",
+    ("stage",)
+)
+ARTIFACT_LOOKUPS = Counter(
+    "testgen_artifact_lookups_total", "Memoized result lookups by input fingerprint", ("result",)
+)
+MCP_LATENCY = Histogram("testgen_mcp_request_duration_seconds", "MCP context call latency", ("service",))
+MCP_ERRORS = Counter("testgen_mcp_errors_total", "Failed MCP context calls", ("service",))
+
+SELECTOR_COUNT = Histogram(
+    "testgen_selector_count", "Selectors in the UI context per story", buckets=COUNT_BUCKETS
+)
+PROMPT_SELECTOR_COUNT = Histogram(
+    "testgen_prompt_selector_count", "Selectors sent to the LLM after pruning", buckets=COUNT_BUCKETS
+)
+VALIDATIONS = Counter("testgen_validations_total", "Selector validation results", ("status",))
+CRITIC_RETRIES = Counter("testgen_critic_retries_total", "Critic-triggered LLM retries", ("kind",))
+SELECTOR_REPAIRS = Counter("testgen_selector_repairs_total", "Invalid selectors repaired", ("method",))
+
+LLM_PROMPT_TOKENS = Histogram(
+    "llm_prompt_tokens", "Prompt tokens evaluated per LLM call (prompt_eval_count)", ("stage",), COUNT_BUCKETS
+)
+LLM_EVAL_TOKENS = Histogram(
+    "llm_eval_tokens", "Tokens generated per LLM call (eval_count)", ("stage",), COUNT_BUCKETS
+)
+LLM_PROMPT_EVAL_SECONDS = Histogram(
+    "llm_prompt_eval_duration_seconds", "Prompt evaluation time per LLM call (prompt_eval_duration)", ("stage",)
+)
+LLM_EVAL_SECONDS = Histogram(
+    "llm_eval_duration_seconds", "Generation time per LLM call (eval_duration)", ("stage",)
+)
+LLM_QUEUE_SECONDS = Histogram(
+    "llm_queue_duration_seconds", "Time LLM calls wait for a free slot (LLM_MAX_CONCURRENCY)"
+)
+LLM_CACHE = Counter("llm_cache_lookups_total", "LLM response cache lookups", ("result",))
+LLM_ERRORS = Counter("llm_errors_total", "Failed LLM calls")
+LLM_CUTOFFS = Counter(
+    "llm_cutoffs_total", "LLM replies ended before the model stopped (length, fence, repeat)", ("stage", "reason")
+)
@@ -0,0 +1,460 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from mcp_common.metrics import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+# comma-separated backends, each "url" or "url=max_concurrency";
+# defaults to OLLAMA_BASE_URL alone
+OLLAMA_BACKENDS = os.getenv("OLLAMA_BACKENDS", "")
+OLLAMA_BACKEND_CONCURRENCY = int(os.getenv("OLLAMA_BACKEND_CONCURRENCY", "2"))
+# seconds without a response before the request is also sent to another
+# backend with a free slot; the first to answer wins (0 = no hedging)
+OLLAMA_HEDGE_AFTER = float(os.getenv("OLLAMA_HEDGE_AFTER", "0"))
+
+HEALTH_CHECK_INTERVAL = 10      # seconds between background /api/tags probes
+BREAKER_FAILURE_THRESHOLD = 3   # consecutive failures before failing fast
+BREAKER_COOLDOWN = 30           # seconds before a trial request is let through
+POOL_SIZE = 16
+LATENCY_EWMA_WEIGHT = 0.2       # weight of the newest sample in a backend's latency average
+
+BACKEND_OUTSTANDING = Gauge(
+    "ollama_backend_outstanding_requests", "Requests in flight per Ollama backend", ("backend",)
+)
+BACKEND_LATENCY = Histogram(
+    "ollama_backend_request_duration_seconds", "Ollama request latency per backend", ("backend",)
+)
+BACKEND_ERRORS = Counter("ollama_backend_errors_total", "Failed Ollama requests per backend", ("backend",))
+POOL_WAITING = Gauge("ollama_pool_waiting_requests", "Requests waiting for a free backend slot")
+HEDGES = Counter("ollama_hedged_requests_total", "Hedged Ollama requests by which copy answered first", ("winner",))
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    closed    -> requests flow; consecutive failures are counted
+    open      -> requests fail fast until the cooldown expires
+    half-open -> one trial request; success closes, failure re-opens
+    """
+
+    def __init__(self, threshold: int = BREAKER_FAILURE_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.failures >= self.threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+    def trip(self):
+        with self._lock:
+            self.failures = max(self.failures, self.threshold)
+            self.opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class OllamaClient:
+    """
+    Long-lived Ollama client: one keep-alive connection pool, a background
+    health monitor that caches the server status, and a circuit breaker so
+    callers fail fast while Ollama is down instead of probing per call.
+    """
+
+    def __init__(self, base_url: str = OLLAMA_BASE_URL, health_interval: float = HEALTH_CHECK_INTERVAL):
+        self.base_url = base_url.rstrip("/")
+        self.health_interval = health_interval
+        self.breaker = CircuitBreaker()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.healthy = None
+        self.models = None  # names from /api/tags; None until the first health check
+        self.last_checked = None
+        self.last_error = None
+        self._monitor = None
+        self._monitor_lock = threading.Lock()
+
+    # ---------------- Requests ----------------
+
+    def post(self, path: str, json: dict, timeout: float, stream: bool = False) -> requests.Response:
+        """
+        POST to Ollama through the pooled session.
+
+        Raises CircuitOpenError without touching the network while the
+        breaker is open. Connection errors, timeouts and 5xx responses count
+        as failures.
+        """
+        self.start_monitor()
+
+        if not self.breaker.allow():
+            reason = f" ({self.last_error})" if self.last_error else ""
+            raise CircuitOpenError(f"Ollama at {self.base_url} is unavailable{reason}")
+
+        try:
+            response = self.session.post(f"{self.base_url}{path}", json=json, timeout=timeout, stream=stream)
+        except requests.exceptions.RequestException as e:
+            self.breaker.record_failure()
+            self.last_error = str(e)
+            raise
+
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+            self.last_error = f"HTTP {response.status_code}"
+        else:
+            self.breaker.record_success()
+        return response
+
+    def status(self) -> dict:
+        """Cached health as last seen by the monitor; never probes."""
+        return {
+            "url": self.base_url,
+            "healthy": self.healthy,
+            "lastChecked": self.last_checked,
+            "lastError": self.last_error,
+            "circuit": self.breaker.state,
+            "models": self.models
+        }
+
+    # ---------------- Health Monitor ----------------
+
+    def start_monitor(self):
+        with self._monitor_lock:
+            if self._monitor is None:
+                self._monitor = threading.Thread(
+                    target=self._monitor_loop, name="ollama-health", daemon=True
+                )
+                self._monitor.start()
+
+    def check_health(self) -> bool:
+        try:
+            response = self.session.get(f"{self.base_url}/api/tags", timeout=5)
+            healthy = response.status_code == 200
+            error = None if healthy else f"health check returned HTTP {response.status_code}"
+            if healthy:
+                self.models = [model.get("name") for model in response.json().get("models", [])]
+        except (requests.exceptions.RequestException, ValueError) as e:
+            healthy, error = False, str(e)
+
+        if healthy != self.healthy:
+            log = logger.info if healthy else logger.error
+            log(f"Ollama at {self.base_url} is {'UP' if healthy else 'DOWN'}{': ' + error if error else ''}")
+
+        self.healthy = healthy
+        self.last_checked = time.time()
+        if healthy:
+            self.breaker.record_success()
+        else:
+            self.last_error = error
+            self.breaker.trip()
+        return healthy
+
+    def _monitor_loop(self):
+        while True:
+            self.check_health()
+            time.sleep(self.health_interval)
+
+
+class _Backend:
+
+    def __init__(self, url: str, max_concurrency: int):
+        self.client = OllamaClient(url)
+        self.url = self.client.base_url
+        self.max_concurrency = max_concurrency
+        self.outstanding = 0
+        self.requests = 0
+        self.errors = 0
+        self.latency = None  # EWMA seconds
+
+    def available(self) -> bool:
+        """Not ejected: its breaker lets requests (or a trial) through."""
+        return self.client.breaker.state != "open"
+
+    def serves(self, model: str) -> bool:
+        # unknown until the first health check; Ollama answers 404 if wrong
+        return not model or self.client.models is None or model in self.client.models
+
+    def status(self) -> dict:
+        return {
+            **self.client.status(),
+            "outstanding": self.outstanding,
+            "maxConcurrency": self.max_concurrency,
+            "requests": self.requests,
+            "errors": self.errors,
+            "latencySeconds": round(self.latency, 3) if self.latency is not None else None
+        }
+
+
+class _PooledResponse:
+    """A streaming backend response; the backend's slot is freed when it is closed."""
+
+    def __init__(self, response: requests.Response, release):
+        self._response = response
+        self._release = release
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._response.close()
+        release, self._release = self._release, None
+        if release is not None:
+            release()
+
+
+class OllamaPool:
+    """
+    Several Ollama servers behind one post(). Each request goes to the
+    backend with the fewest outstanding requests that has the payload's
+    model loaded and a free slot (at most max_concurrency in flight per
+    backend); callers wait while every backend is full. Backends whose
+    circuit is open are skipped until their health check passes again, and a
+    request that cannot reach its backend is retried on another.
+
+    With hedge_after > 0, a streaming request with no first chunk after that
+    many seconds is also sent to another backend with a free slot, and the
+    first to respond is used; closing the other stream aborts its generation.
+    Hedging targets slow prefill / queueing, not long outputs. Non-streaming
+    requests are never hedged: the losing copy could not be stopped and would
+    hold its backend until it finished generating.
+    """
+
+    def __init__(self, backends: list, hedge_after: float = OLLAMA_HEDGE_AFTER):
+        self.backends = [_Backend(url, max_concurrency) for url, max_concurrency in backends]
+        self.hedge_after = hedge_after
+        self.waiting = 0
+        self._slots = threading.Condition()
+        self._executor = None
+        if hedge_after > 0:
+            self._executor = ThreadPoolExecutor(max_workers=2 * self.capacity, thread_name_prefix="ollama-hedge")
+
+    @property
+    def capacity(self) -> int:
+        """Requests the pool runs at once: the sum of the backends' caps."""
+        return sum(backend.max_concurrency for backend in self.backends)
+
+    # ---------------- Requests ----------------
+
+    def post(self, path: str, json: dict, timeout: float, stream: bool = False) -> requests.Response:
+        """
+        POST to the least loaded backend serving json["model"].
+
+        Raises CircuitOpenError when every such backend is ejected. The
+        returned response must be closed when stream=True.
+        """
+        for backend in self.backends:
+            backend.client.start_monitor()
+
+        model = json.get("model")
+        tried = set()
+        while True:
+            backend = self._acquire(model, tried)
+            tried.add(backend.url)
+            try:
+                if self._executor is None or not stream:
+                    return self._send(backend, path, json, timeout, stream)
+                return self._hedged(backend, model, path, json, timeout, stream)
+            except (CircuitOpenError, requests.exceptions.ConnectionError) as e:
+                # nothing was generated: another backend can take it
+                if not self._candidates(model, tried):
+                    raise
+                logger.warning("Ollama at %s failed (%s) - retrying on another backend", backend.url, e)
+
+    def status(self) -> dict:
+        with self._slots:
+            backends = [backend.status() for backend in self.backends]
+            waiting = self.waiting
+        return {
+            "healthy": any(backend["healthy"] for backend in backends),
+            "waiting": waiting,
+            "hedgeAfter": self.hedge_after,
+            "backends": backends
+        }
+
+    # ---------------- Scheduling ----------------
+
+    def _candidates(self, model: str, exclude: set = ()) -> list:
+        return [
+            backend for backend in self.backends
+            if backend.url not in exclude and backend.available() and backend.serves(model)
+        ]
+
+    def _acquire(self, model: str, exclude: set = (), block: bool = True):
+        """Reserve a slot on the least loaded eligible backend."""
+        with self._slots:
+            queued = False
+            try:
+                while True:
+                    candidates = self._candidates(model, exclude)
+                    if not candidates:
+                        if not block:
+                            return None
+                        raise CircuitOpenError(self._unavailable(model))
+
+                    free = [backend for backend in candidates if backend.outstanding < backend.max_concurrency]
+                    if free:
+                        backend = min(free, key=lambda b: (
+                            b.outstanding / b.max_concurrency, b.latency or 0.0, b.requests
+                        ))
+                        backend.outstanding += 1
+                        backend.requests += 1
+                        BACKEND_OUTSTANDING.set(backend.outstanding, backend=backend.url)
+                        return backend
+
+                    if not block:
+                        return None
+                    if not queued:
+                        queued = True
+                        self.waiting += 1
+                        POOL_WAITING.inc()
+                    # re-check periodically: ejected backends may come back
+                    self._slots.wait(timeout=1)
+            finally:
+                if queued:
+                    self.waiting -= 1
+                    POOL_WAITING.dec()
+
+    def _release(self, backend: _Backend, elapsed: float = None):
+        with self._slots:
+            backend.outstanding -= 1
+            BACKEND_OUTSTANDING.set(backend.outstanding, backend=backend.url)
+            if elapsed is None:
+                backend.errors += 1
+                BACKEND_ERRORS.inc(backend=backend.url)
+            else:
+                backend.latency = elapsed if backend.latency is None else (
+                    LATENCY_EWMA_WEIGHT * elapsed + (1 - LATENCY_EWMA_WEIGHT) * backend.latency
+                )
+                BACKEND_LATENCY.observe(elapsed, backend=backend.url)
+            self._slots.notify()
+
+    def _send(self, backend: _Backend, path: str, json: dict, timeout: float, stream: bool):
+        """One request on a backend whose slot is already reserved."""
+        start = time.monotonic()
+        try:
+            response = backend.client.post(path, json=json, timeout=timeout, stream=stream)
+        except Exception:
+            self._release(backend)
+            raise
+
+        if response.status_code >= 500:
+            self._release(backend)
+            return response
+        if not stream:
+            self._release(backend, time.monotonic() - start)
+            return response
+        return _PooledResponse(response, lambda: self._release(backend, time.monotonic() - start))
+
+    def _hedged(self, backend: _Backend, model: str, path: str, json: dict, timeout: float, stream: bool):
+        primary = self._executor.submit(self._send, backend, path, json, timeout, stream)
+        done, _ = wait([primary], timeout=self.hedge_after)
+        if done:
+            return primary.result()
+
+        # only hedge into spare capacity, never queue for it
+        spare = self._acquire(model, {backend.url}, block=False)
+        if spare is None:
+            return primary.result()
+
+        logger.info("Ollama at %s slow after %ss - hedging on %s", backend.url, self.hedge_after, spare.url)
+        hedge = self._executor.submit(self._send, spare, path, json, timeout, stream)
+        attempts = {primary: "primary", hedge: "hedge"}
+
+        pending = set(attempts)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((f for f in done if not f.exception() and f.result().status_code < 500), None)
+            if winner is not None:
+                HEDGES.inc(winner=attempts[winner])
+                for loser in attempts:
+                    if loser is not winner:
+                        # closing the losing stream aborts its generation and frees its slot
+                        loser.add_done_callback(_close_response)
+                return winner.result()
+
+        # both failed: surface the primary's outcome
+        return primary.result()
+
+    def _unavailable(self, model: str) -> str:
+        if not any(backend.serves(model) for backend in self.backends):
+            return f"No Ollama backend has model {model} loaded"
+        errors = "; ".join(
+            f"{backend.url}: {backend.client.last_error}" for backend in self.backends
+            if backend.client.last_error
+        )
+        return f"All Ollama backends are unavailable{f' ({errors})' if errors else ''}"
+
+
+def _close_response(future):
+    if not future.exception():
+        future.result().close()
+
+
+def _parse_backends(spec: str) -> list:
+    backends = []
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        url, _, limit = entry.partition("=")
+        backends.append((url.strip(), int(limit) if limit else OLLAMA_BACKEND_CONCURRENCY))
+    return backends
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> OllamaPool:
+    """The process-wide Ollama backend pool (OLLAMA_BACKENDS, else OLLAMA_BASE_URL)."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OllamaPool(_parse_backends(OLLAMA_BACKENDS or OLLAMA_BASE_URL))
+        return _client
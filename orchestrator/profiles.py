@@ -0,0 +1,170 @@
+"""
+Per-stage generation profiles.
+
+Each LLM stage gets its own Ollama options instead of generating until the
+model decides to stop: a num_predict token budget sized to the work (the
+story's scenarios, the steps to implement, the selectors in the prompt),
+stop sequences for the commentary models tend to append after the code, and
+optionally a JSON schema ``format`` for replies that are parsed rather than
+shown. A ReplyGuard reads the streamed reply alongside and ends it early
+once the code block is closed or the model starts looping.
+"""
+import json
+import math
+import os
+import re
+
+from mcp_bdd.scenarios import FENCE
+
+# hard cap for any single call; stage budgets never exceed it
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "2048"))
+# multiplier for the stage budgets below, for models that write more verbosely
+LLM_TOKEN_BUDGET_SCALE = float(os.getenv("LLM_TOKEN_BUDGET_SCALE", "1.0"))
+# selector fixes reply as {"line": ...} (Ollama structured outputs)
+STRUCTURED_REPAIR = os.getenv("STRUCTURED_REPAIR", "true").lower() == "true"
+# cut a reply once its last lines are one block repeated this often (0 = off)
+RUNAWAY_LINES = int(os.getenv("RUNAWAY_LINES", "12"))
+
+# budget = base + per scenario / step + per selector, in tokens
+GHERKIN_BASE_TOKENS = 96
+GHERKIN_TOKENS_PER_SCENARIO = 128
+GHERKIN_MIN_SCENARIOS = 3
+SELENIUM_BASE_TOKENS = 160
+SELENIUM_TOKENS_PER_STEP = 128
+TOKENS_PER_SELECTOR = 2
+REPAIR_TOKENS = 128
+RUNAWAY_MAX_PERIOD = 4  # longest repeated block (lines) the guard looks for
+
+# commentary that starts on a line of its own after the artifact
+PROSE_STOPS = (
+    "\nExplanation", "\n**Explanation", "\nNote:", "\n**Note", "\nThis code", "\nIn this code", "\nThe above"
+)
+GHERKIN_STOPS = PROSE_STOPS + ("\n```java", "\nStep Definitions", "\n**Step Definitions")
+
+REPAIR_FORMAT = {
+    "type": "object",
+    "properties": {"line": {"type": "string"}},
+    "required": ["line"]
+}
+
+CRITERIA_LINE = re.compile(r'^\s*(?:[-*•]|\d+[.)]|AC\s*\d*\s*:|Given\b|Scenario\b)', re.IGNORECASE | re.MULTILINE)
+
+
+class GenerationProfile:
+    """Ollama options, output format and reply guard for one LLM stage."""
+
+    def __init__(self, num_predict: int, stop: tuple = PROSE_STOPS, output_format: dict = None,
+                 fenced: bool = True):
+        self.num_predict = num_predict
+        self.stop = stop
+        self.output_format = output_format
+        self.fenced = fenced
+
+    def options(self) -> dict:
+        return {"num_predict": self.num_predict, "stop": list(self.stop)}
+
+    def guard(self) -> "ReplyGuard":
+        return ReplyGuard(self.fenced)
+
+
+class ReplyGuard:
+    """
+    Reads a streamed reply line by line; feed() returns True once the rest
+    of the reply should not be generated: a fenced code block has closed
+    (whatever follows is commentary), or the last lines are one block of up
+    to RUNAWAY_MAX_PERIOD lines repeated over RUNAWAY_LINES lines. text() is
+    the reply to keep and reason says why it was cut ("fence", "repeat").
+    """
+
+    def __init__(self, fenced: bool = True, runaway_lines: int = RUNAWAY_LINES):
+        self.fenced = fenced
+        self.runaway_lines = runaway_lines
+        self.reason = None
+        self._text = ""
+        self._end = None
+        self._checked = 0
+        self._fences = 0
+        self._lines = []  # recent non-blank lines as (start offset, line)
+
+    def feed(self, token: str) -> bool:
+        self._text += token
+        while self.reason is None:
+            newline = self._text.find("\n", self._checked)
+            if newline < 0:
+                break
+            start, self._checked = self._checked, newline + 1
+            self._line(start, self._text[start:newline])
+        return self.reason is not None
+
+    def text(self) -> str:
+        return self._text[:self._end]
+
+    def _line(self, start: int, line: str):
+        if self.fenced and FENCE.match(line):
+            self._fences += 1
+            # the opening fence may follow a line of preamble; the closing one ends the code
+            if self._fences == 2:
+                self._cut("fence", self._checked)
+            return
+
+        if not line.strip() or not self.runaway_lines:
+            return
+        self._lines.append((start, line))
+        del self._lines[:-self.runaway_lines - RUNAWAY_MAX_PERIOD]
+
+        lines = [text for _, text in self._lines[-self.runaway_lines:]]
+        if len(lines) < self.runaway_lines:
+            return
+        for period in range(1, RUNAWAY_MAX_PERIOD + 1):
+            if all(lines[i] == lines[i - period] for i in range(period, len(lines))):
+                # keep the first copy of the block
+                self._cut("repeat", self._lines[-self.runaway_lines + period][0])
+                return
+
+    def _cut(self, reason: str, end: int):
+        self.reason = reason
+        self._end = end
+
+
+def gherkin_profile(jira: dict, selectors: int) -> GenerationProfile:
+    """Budget for the feature: the scenarios the story's criteria suggest, and the selectors they may use."""
+    scenarios = max(GHERKIN_MIN_SCENARIOS, estimate_scenarios(jira))
+    tokens = GHERKIN_BASE_TOKENS + GHERKIN_TOKENS_PER_SCENARIO * scenarios + TOKENS_PER_SELECTOR * selectors
+    return GenerationProfile(_budget(tokens), GHERKIN_STOPS)
+
+
+def selenium_profile(steps: int, selectors: int) -> GenerationProfile:
+    """Budget for one scenario's step definitions."""
+    tokens = SELENIUM_BASE_TOKENS + SELENIUM_TOKENS_PER_STEP * max(1, steps) + TOKENS_PER_SELECTOR * selectors
+    return GenerationProfile(_budget(tokens))
+
+
+def repair_profile() -> GenerationProfile:
+    """A single corrected line; JSON when STRUCTURED_REPAIR is on."""
+    if STRUCTURED_REPAIR:
+        return GenerationProfile(REPAIR_TOKENS, (), REPAIR_FORMAT, fenced=False)
+    return GenerationProfile(REPAIR_TOKENS)
+
+
+def estimate_scenarios(jira: dict) -> int:
+    """Acceptance-criteria-like lines (bullets, numbered items, Given ...) in the story."""
+    return len(CRITERIA_LINE.findall(str(jira.get("description") or "")))
+
+
+def reply_line(reply: str):
+    """The corrected line from a selector fix reply (JSON or plain), or None."""
+    try:
+        data = json.loads(reply)
+    except ValueError:
+        data = None
+    if isinstance(data, dict):
+        line = str(data.get("line") or "").strip()
+        return line or None
+    return next(
+        (line.strip() for line in reply.split("\n") if line.strip() and not FENCE.match(line)),
+        None
+    )
+
+
+def _budget(tokens: int) -> int:
+    return min(LLM_MAX_TOKENS, math.ceil(tokens * LLM_TOKEN_BUDGET_SCALE))
@@ -0,0 +1,220 @@
+"""
+Relevance-ranked selector pruning.
+
+The UI context can hold thousands of selectors; sending all of them makes
+prompt prefill dominate inference time. SelectorRetriever ranks selectors
+against the Jira story with BM25 over an in-memory inverted index (selector
+key, CSS selector and source file path) and keeps the best ones that fit a
+token budget.
+"""
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+
+SELECTOR_TOKEN_BUDGET = int(os.getenv("SELECTOR_TOKEN_BUDGET", "1500"))  # 0 = no pruning
+SELECTOR_TOP_K = int(os.getenv("SELECTOR_TOP_K", "200"))
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+CHARS_PER_TOKEN = 4   # rough estimate; good enough for budgeting
+INDEX_CACHE_SIZE = 8  # UI contexts (repo@commit) kept indexed
+
+WORD_PATTERN = re.compile(r"[A-Za-z0-9]+")
+CAMEL_PATTERN = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+# generic controls most stories use without naming them; kept ahead of the
+# unmatched rest when the budget has room after the story's matches
+ALWAYS_INCLUDE_TERMS = frozenset(
+    "submit save cancel confirm continue next back close ok login logout signin "
+    "nav navbar menu home header footer search".split()
+)
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can for from has have i in is it its of on or "
+    "so that the this to was will with want user should when then given "
+    "able need needs".split()
+)
+
+
+def tokenize(text: str) -> list:
+    """Lowercased word tokens; camelCase, kebab-case and snake_case are split."""
+    tokens = []
+    for word in WORD_PATTERN.findall(text or ""):
+        parts = CAMEL_PATTERN.findall(word)
+        for part in [word] + (parts if len(parts) > 1 else []):
+            token = _stem(part.lower())
+            if len(token) > 1 and token not in STOPWORDS:
+                tokens.append(token)
+    return tokens
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def _stem(token: str) -> str:
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+class BM25Index:
+    """BM25 inverted index over {selector_key: css_selector} entries."""
+
+    def __init__(self, elements: dict, sources: dict = None):
+        sources = sources or {}
+        self.keys = list(elements)
+        self.elements = elements
+        self.postings = {}  # term -> [(doc, term frequency)]
+        self.lengths = []
+
+        for doc, key in enumerate(self.keys):
+            terms = Counter(tokenize(f"{key} {elements[key]} {sources.get(key, '')}"))
+            self.lengths.append(sum(terms.values()))
+            for term, tf in terms.items():
+                self.postings.setdefault(term, []).append((doc, tf))
+
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+    def search(self, query: str) -> list:
+        """Selector keys matching query, best first."""
+        n = len(self.keys)
+        scores = {}
+
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc, tf in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[doc] / self.avg_length)
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        ranked = sorted(scores, key=lambda doc: (-scores[doc], doc))
+        return [self.keys[doc] for doc in ranked]
+
+
+class SelectorRetriever:
+    """Picks the selectors worth sending to the LLM for one story."""
+
+    def __init__(self, token_budget: int = SELECTOR_TOKEN_BUDGET, top_k: int = SELECTOR_TOP_K):
+        self.token_budget = token_budget
+        self.top_k = top_k
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def select(self, jira_ctx: dict, ui_ctx: dict):
+        """
+        Return (elements, report): the pruned {key: selector} dict and a
+        summary of how much of the selector block was cut.
+        """
+        elements = ui_ctx.get("elements") or {}
+        full_tokens = estimate_tokens(str(elements))
+
+        if not self.token_budget or full_tokens <= self.token_budget:
+            return elements, _report(elements, elements, full_tokens, full_tokens)
+
+        query = f"{jira_ctx.get('summary', '')} {jira_ctx.get('description', '')}"
+        ranked = self._index(ui_ctx).search(query)
+        # matches first, then generic controls, then the rest in repo order:
+        # a story rarely names the submit button or nav links it needs
+        generic = [key for key in elements if _is_generic(key, elements[key])]
+        seen = set(ranked)
+        for key in generic + list(elements):
+            if key not in seen:
+                seen.add(key)
+                ranked.append(key)
+
+        selected = {}
+        used = 2  # braces
+        for key in ranked:
+            if len(selected) >= self.top_k:
+                break
+            cost = estimate_tokens(f"{key!r}: {elements[key]!r}, ")
+            if used + cost > self.token_budget:
+                continue  # a shorter one may still fit
+            selected[key] = elements[key]
+            used += cost
+
+        return selected, _report(elements, selected, full_tokens, estimate_tokens(str(selected)))
+
+    def _index(self, ui_ctx: dict) -> BM25Index:
+        commit = ui_ctx.get("commit")
+        if not commit:
+            return BM25Index(ui_ctx["elements"], ui_ctx.get("sources"))
+
+        key = (ui_ctx.get("repo"), commit)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+                return index
+
+        index = BM25Index(ui_ctx["elements"], ui_ctx.get("sources"))
+        with self._lock:
+            self._indexes[key] = index
+            while len(self._indexes) > INDEX_CACHE_SIZE:
+                self._indexes.popitem(last=False)
+        return index
+
+
+def _is_generic(key: str, selector: str) -> bool:
+    return not ALWAYS_INCLUDE_TERMS.isdisjoint(tokenize(f"{key} {selector}"))
+
+
+def _report(elements: dict, selected: dict, full_tokens: int, pruned_tokens: int) -> dict:
+    return {
+        "totalSelectors": len(elements),
+        "keptSelectors": len(selected),
+        "fullTokens": full_tokens,
+        "prunedTokens": pruned_tokens,
+        "reduction": round(1 - pruned_tokens / full_tokens, 3) if full_tokens else 0.0
+    }
+
+
+class PruningStats:
+    """Running totals: prompt-size reduction and validation outcomes."""
+
+    def __init__(self):
+        self.stories = 0
+        self.pruned_stories = 0
+        self.full_tokens = 0
+        self.pruned_tokens = 0
+        self.validation_passed = 0
+        self.pruned_validation_passed = 0
+        self._lock = threading.Lock()
+
+    def record(self, report: dict, validation_status: str):
+        pruned = report["keptSelectors"] < report["totalSelectors"]
+        passed = validation_status == "PASS"
+        with self._lock:
+            self.stories += 1
+            self.full_tokens += report["fullTokens"]
+            self.pruned_tokens += report["prunedTokens"]
+            self.validation_passed += passed
+            if pruned:
+                self.pruned_stories += 1
+                self.pruned_validation_passed += passed
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "tokenBudget": SELECTOR_TOKEN_BUDGET,
+                "topK": SELECTOR_TOP_K,
+                "stories": self.stories,
+                "prunedStories": self.pruned_stories,
+                "fullTokens": self.full_tokens,
+                "prunedTokens": self.pruned_tokens,
+                "reduction": round(1 - self.pruned_tokens / self.full_tokens, 3) if self.full_tokens else None,
+                "validationPassRate": round(self.validation_passed / self.stories, 3) if self.stories else None,
+                "prunedValidationPassRate": (
+                    round(self.pruned_validation_passed / self.pruned_stories, 3)
+                    if self.pruned_stories else None
+                )
+            }
+
+
+retriever = SelectorRetriever()
+pruning_stats = PruningStats()
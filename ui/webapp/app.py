@@ -30,7 +30,10 @@ async def home():
 <label>E2E Repo</label>
 <input id="e2e">
 
+<label><input type="checkbox" id="nocache" style="width:auto"> Bypass LLM cache</label>
+
 <button onclick="generate()">Generate</button>
+<button onclick="cancelGeneration()">Cancel</button>
 <pre id="output" style="display:none;"></pre>
 
 
@@ -48,37 +51,107 @@ async def home():
 </div>
 
 <script>
+let controller = null;
+// step definitions stream per scenario, concurrently
+let scenarioSteps = {};
+
+function showScenarioSteps() {
+  document.getElementById("steps").value = Object.keys(scenarioSteps).sort((a, b) => a - b)
+    .map(k => scenarioSteps[k]).join("\\n\\n");
+}
+
 async function generate() {
   const out = document.getElementById("output");
   out.style.display = "block";
-  out.textContent = "Generating...";
+  out.textContent = "Fetching context...";
+
+  document.getElementById("block").style.display = "block";
+  document.getElementById("feature").value = "";
+  document.getElementById("steps").value = "";
+  document.getElementById("validation").value = "";
 
   const payload = {
     jiraUrl: document.getElementById("jira").value,
     uiRepo: document.getElementById("ui").value,
-    e2eRepo: document.getElementById("e2e").value
+    e2eRepo: document.getElementById("e2e").value,
+    noCache: document.getElementById("nocache").checked
   };
 
-const res = await fetch("http://localhost:8000/generate", {
+controller = new AbortController();
+const res = await fetch("http://localhost:8000/generate/stream", {
   method: "POST",
   headers: { "Content-Type": "application/json" },
-  body: JSON.stringify(payload)
+  body: JSON.stringify(payload),
+  signal: controller.signal
 });
 
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  try {
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+
+      buffer += decoder.decode(value, { stream: true });
+      const events = buffer.split("\\n\\n");
+      buffer = events.pop();
+
+      for (const raw of events) {
+        const line = raw.split("\\n").find(l => l.startsWith("data: "));
+        if (line) handleEvent(JSON.parse(line.slice(6)));
+      }
+    }
+  } catch (err) {
+    if (err.name !== "AbortError") throw err;
+    out.textContent = "Cancelled";
+  }
+}
 
-  const data = await res.json();
-  out.style.display = "none";
-
-  document.getElementById("block").style.display = "block";
+function cancelGeneration() {
+  if (controller) controller.abort();
+}
 
-  if (data.generatedArtifacts) {
-    document.getElementById("feature").value = data.generatedArtifacts.feature || "";
-    document.getElementById("steps").value   = data.generatedArtifacts.steps || "";
-  }
+function handleEvent(event) {
+  const out = document.getElementById("output");
 
-  if (data.validationReport) {
+  if (event.stage === "context") {
+    out.textContent = "Generating Gherkin...";
+    scenarioSteps = {};
+  } else if (event.stage === "gherkin") {
+    document.getElementById("feature").value += event.token;
+  } else if (event.stage === "selenium") {
+    out.textContent = "Generating step definitions...";
+    scenarioSteps[event.scenario] = (scenarioSteps[event.scenario] || "") + event.token;
+    showScenarioSteps();
+  } else if (event.stage === "retry") {
+    out.textContent = "Retrying step definitions for scenario " + event.scenario + "...";
+    scenarioSteps[event.scenario] = "";
+    showScenarioSteps();
+  } else if (event.stage === "repair") {
+    out.textContent = "Repairing selectors...";
+    scenarioSteps[event.scenario] = event.steps;
+    showScenarioSteps();
+  } else if (event.stage === "validation") {
     document.getElementById("validation").value =
-      JSON.stringify(data.validationReport, null, 2);
+      JSON.stringify(event.report, null, 2);
+  } else if (event.stage === "result") {
+    const data = event.result;
+    out.style.display = "none";
+
+    if (data.generatedArtifacts) {
+      document.getElementById("feature").value = data.generatedArtifacts.feature || "";
+      document.getElementById("steps").value   = data.generatedArtifacts.steps || "";
+    }
+
+    if (data.validationReport) {
+      document.getElementById("validation").value =
+        JSON.stringify(data.validationReport, null, 2);
+    } else if (data.status === "ERROR") {
+      out.style.display = "block";
+      out.textContent = data.message || "Generation failed";
+    }
   }
 }
 </script>